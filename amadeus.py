@@ -0,0 +1,130 @@
+# Amadeus flight API client: one pooled keep-alive session per process and an
+# OAuth token cached until shortly before it expires.
+import os, time, threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+
+BASE_URL      = os.environ.get("AMADEUS_BASE_URL", "https://test.api.amadeus.com")
+CLIENT_ID     = os.environ.get("AMADEUS_CLIENT_ID", "idd7hl95bnBrW4AR2gvyKwskc6GiKTep")
+CLIENT_SECRET = os.environ.get("AMADEUS_CLIENT_SECRET", "Wf6Lm0qOAxzhDavO")
+TIMEOUT       = (5, 30)   # connect, read (seconds)
+TOKEN_MARGIN  = 60        # refresh this many seconds before expires_in runs out
+# Self-Service quota: 10 TPS on test, 40 TPS on production
+RATE          = float(os.environ.get("AMADEUS_RATE", 10))
+BURST         = int(os.environ.get("AMADEUS_BURST", 2))
+
+def make_session(pool=10, retries=3, backoff=0.5):
+    retry = Retry(total=retries, backoff_factor=backoff,
+                  status_forcelist=(429,500,502,503,504),
+                  allowed_methods=frozenset({"GET","POST"}),
+                  respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=retry)
+    s = requests.Session()
+    s.mount("https://", adapter); s.mount("http://", adapter)
+    return s
+
+class TokenBucket:
+    def __init__(self, rate=RATE, burst=BURST):
+        self.rate, self.burst = rate, burst
+        self._tokens, self._last = float(burst), time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens+(now-self._last)*self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1-self._tokens)/self.rate
+            time.sleep(delay)
+
+class Client:
+    def __init__(self, base_url=BASE_URL, client_id=CLIENT_ID, client_secret=CLIENT_SECRET,
+                 session=None, timeout=TIMEOUT, limiter=None):
+        self.base_url = base_url.rstrip("/")
+        self.client_id, self.client_secret = client_id, client_secret
+        self.session = session or make_session()
+        self.timeout = timeout
+        self.limiter = limiter or TokenBucket()
+        self._lock = threading.Lock()
+        self._token, self._expires = None, 0.0
+
+    def get_token(self, force=False):
+        if not force and self._token and time.monotonic() < self._expires:
+            return self._token
+        with self._lock:
+            # another session may have refreshed while we waited for the lock
+            if not force and self._token and time.monotonic() < self._expires:
+                return self._token
+            try:
+                with metrics.timed("amadeus.get_token"):
+                    r = self.session.post(
+                        f"{self.base_url}/v1/security/oauth2/token",
+                        data={"grant_type":"client_credentials",
+                              "client_id":self.client_id,
+                              "client_secret":self.client_secret},
+                        timeout=self.timeout)
+                js = r.json() if r.status_code==200 else {}
+            except (requests.RequestException, ValueError):
+                js = {}
+            tok = js.get("access_token")
+            if not tok:
+                self._token, self._expires = None, 0.0
+                return None
+            ttl = float(js.get("expires_in", 1799))
+            self._token = tok
+            self._expires = time.monotonic() + max(ttl-TOKEN_MARGIN, ttl/2)
+            return tok
+
+    def invalidate(self):
+        with self._lock:
+            self._token, self._expires = None, 0.0
+
+    def get(self, path, params):
+        for attempt in (0,1):
+            tok = self.get_token(force=attempt==1)
+            if not tok: return None
+            self.limiter.acquire()
+            try:
+                r = self.session.get(f"{self.base_url}{path}",
+                                     headers={"Authorization":f"Bearer {tok}"},
+                                     params=params, timeout=self.timeout)
+            except requests.RequestException:
+                return None
+            if r.status_code!=401: return r
+        return r
+
+    @metrics.timed("amadeus.search_flights")
+    def search_flights(self, o, d, dt, cls, adults=1, max=10):
+        r = self.get("/v2/shopping/flight-offers",
+                     {"originLocationCode":o,
+                      "destinationLocationCode":d,
+                      "departureDate":dt,
+                      "adults":adults,
+                      "travelClass":cls,
+                      "max":max})
+        if r is None or r.status_code!=200: return []
+        try: return r.json().get("data",[])
+        except ValueError: return []
+
+# --- process-wide default client (shared by every Streamlit session) ---
+_client = None
+_client_lock = threading.Lock()
+
+def client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None: _client = Client()
+    return _client
+
+def get_token():
+    return client().get_token()
+
+def search_flights(o,d,dt,cls):
+    return client().search_flights(o,d,dt,cls)
@@ -0,0 +1,131 @@
+# Excel backups of the records table, run by a background scheduler instead of
+# inline with rendering. Rows are streamed from SQLite in chunks into
+# xlsxwriter's constant-memory mode; only rows past the last watermark are
+# exported, with a full snapshot every FULL_EVERY days.
+#
+# The watermark is the highest record id backed up, so incrementals carry new rows
+# only: an edit to or the deletion of an older row first shows up in the next full
+# snapshot. Restoring to a given day means its latest full plus the incrementals after it.
+import os, re, json, time, logging, threading
+from datetime import date
+import xlsxwriter
+import records_db, metrics
+
+BACKUP_DIR  = "backups"
+CHUNK       = 5000
+FULL_EVERY  = 7        # days between full snapshots
+KEEP_FULL   = 8        # full snapshots kept (incrementals older than the oldest kept full go too)
+INTERVAL    = 3600     # scheduler wake-up, seconds
+MAX_WIDTH   = 60
+
+_log = logging.getLogger(__name__)
+
+_FILE_RE = re.compile(r"travel_records_(\d{4}-\d{2}-\d{2})(_incr_\d+-\d+)?\.xlsx$")
+
+def _state_path(backup_dir):
+    return os.path.join(backup_dir, ".watermark.json")
+
+def load_state(backup_dir=BACKUP_DIR):
+    try:
+        with open(_state_path(backup_dir)) as f: return json.load(f)
+    except (OSError, ValueError):
+        return {"last_id":0, "last_full":None, "last_run":None}
+
+def save_state(state, backup_dir=BACKUP_DIR):
+    tmp = _state_path(backup_dir)+".tmp"
+    with open(tmp,"w") as f: json.dump(state, f)
+    os.replace(tmp, _state_path(backup_dir))
+
+def write_xlsx(cur, dest, chunk=CHUNK):
+    # cur: executed cursor; rows are written as they are fetched, memory stays flat
+    cols = [d[0] for d in cur.description]
+    tmp = dest+".part"
+    wb = xlsxwriter.Workbook(tmp, {"constant_memory":True, "strings_to_numbers":False})
+    ws = wb.add_worksheet("Records")
+    fmt = wb.add_format({
+        "bold":True, "text_wrap":True, "valign":"center",
+        "fg_color":"#DC2626","color":"white","border":1
+    })
+    widths = [len(c) for c in cols]
+    for i,col in enumerate(cols):
+        ws.write(0, i, col, fmt)
+    r, last_id = 1, None
+    while True:
+        rows = cur.fetchmany(chunk)
+        if not rows: break
+        for row in rows:
+            ws.write_row(r, 0, row)
+            for i,v in enumerate(row):
+                if v is not None:
+                    n = len(str(v))
+                    if n>widths[i]: widths[i] = n
+            r += 1
+        last_id = rows[-1][0]
+    for i,w in enumerate(widths):
+        ws.set_column(i, i, min(w, MAX_WIDTH)+2)
+    wb.close()
+    os.replace(tmp, dest)
+    return r-1, last_id
+
+@metrics.timed("backup.excel")
+def backup_excel(db=records_db.DB_PATH, backup_dir=BACKUP_DIR, full=None, today=None):
+    os.makedirs(backup_dir, exist_ok=True)
+    today = today or date.today()
+    state = load_state(backup_dir)
+    if full is None:
+        lf = state.get("last_full")
+        full = not lf or (today-date.fromisoformat(lf)).days>=FULL_EVERY
+    conn = records_db.connect(db)
+    try:
+        records_db.migrate(conn)
+        since = 0 if full else state.get("last_id",0)
+        if not full and (conn.execute("SELECT MAX(id) FROM records").fetchone()[0] or 0) <= since:
+            return None   # nothing past the watermark: no file, state unchanged
+        cur = conn.execute("SELECT * FROM records WHERE id>? ORDER BY id", (since,))
+        if full:
+            dest = os.path.join(backup_dir, f"travel_records_{today.isoformat()}.xlsx")
+            n, last_id = write_xlsx(cur, dest)
+        else:
+            dest = os.path.join(backup_dir, f"travel_records_{today.isoformat()}_incr_{since+1}-.xlsx")
+            n, last_id = write_xlsx(cur, dest)
+            if n:
+                final = dest.replace("-.xlsx", f"-{last_id}.xlsx"); os.replace(dest, final); dest = final
+            else:
+                os.remove(dest); dest = None
+    finally:
+        conn.close()
+    state.update(last_run=today.isoformat(), last_id=last_id or state.get("last_id",0))
+    if full: state["last_full"] = today.isoformat()
+    save_state(state, backup_dir)
+    prune(backup_dir, KEEP_FULL)
+    return dest
+
+def prune(backup_dir=BACKUP_DIR, keep_full=KEEP_FULL):
+    fulls, incrs = [], []
+    for f in os.listdir(backup_dir):
+        m = _FILE_RE.match(f)
+        if m: (incrs if m.group(2) else fulls).append((m.group(1), f))
+    fulls.sort()
+    if len(fulls) <= keep_full: return
+    for _,f in fulls[:-keep_full]:
+        os.remove(os.path.join(backup_dir, f))
+    oldest = fulls[-keep_full][0]
+    for d,f in incrs:
+        if d < oldest: os.remove(os.path.join(backup_dir, f))
+
+# --- scheduler: one daemon thread per process ---
+_started = set()
+_lock = threading.Lock()
+
+def _loop(db, backup_dir, interval):
+    while True:
+        try: backup_excel(db, backup_dir)
+        except Exception: _log.exception("scheduled backup of %s failed", db)
+        time.sleep(interval)
+
+def start_scheduler(db=records_db.DB_PATH, backup_dir=BACKUP_DIR, interval=INTERVAL):
+    with _lock:
+        if (db, backup_dir) in _started: return
+        _started.add((db, backup_dir))
+        threading.Thread(target=_loop, args=(db, backup_dir, interval),
+                         name="records-backup", daemon=True).start()
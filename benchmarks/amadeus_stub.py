@@ -0,0 +1,57 @@
+# Local stand-in for the Amadeus endpoints used by amadeus.py (OAuth token and
+# flight-offers search), serving synth.offer() payloads with an optional delay.
+# Tests script failures: Handler.fail holds status codes the next searches get.
+#   python benchmarks/amadeus_stub.py [port] [delay_s]   then AMADEUS_BASE_URL=http://127.0.0.1:<port>
+import sys, json, time, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import synth
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    hits  = {"token":0, "search":0}
+    fail  = []   # e.g. [401] or [503, 502]: answered, in order, before the next real search
+    auth  = []   # Authorization header of every search, in order
+
+    def log_message(self, *a): pass
+
+    def _send(self, code, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.hits["token"] += 1
+        self._send(200, {"access_token":f"stub-token-{self.hits['token']}", "expires_in":1799})
+
+    def do_GET(self):
+        u = urlparse(self.path); q = {k:v[0] for k,v in parse_qs(u.query).items()}
+        if u.path!="/v2/shopping/flight-offers":
+            return self._send(404, {"errors":[{"detail":"not found"}]})
+        self.hits["search"] += 1
+        self.auth.append(self.headers.get("Authorization"))
+        if self.fail:
+            return self._send(self.fail.pop(0), {"errors":[{"detail":"scripted failure"}]})
+        if self.delay: time.sleep(self.delay)
+        self._send(200, {"data":synth.offers(int(q.get("max",10)), q["originLocationCode"],
+                                             q["destinationLocationCode"], q["departureDate"])})
+
+def start(delay=0.0, port=0):
+    # serves in a daemon thread; returns (base_url, server)
+    Handler.delay = delay
+    Handler.hits.update(token=0, search=0); Handler.fail.clear(); Handler.auth.clear()
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=srv.serve_forever, name="amadeus-stub", daemon=True).start()
+    return f"http://127.0.0.1:{srv.server_port}", srv
+
+if __name__=="__main__":
+    url, srv = start(float(sys.argv[2]) if len(sys.argv)>2 else 0.0, int(sys.argv[1]) if len(sys.argv)>1 else 8765)
+    print(f"Amadeus stub on {url}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
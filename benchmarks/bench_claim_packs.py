@@ -0,0 +1,48 @@
+# Claim-pack batch benchmark: 200 synthetic travelers, each with a few PDF
+# receipts, built serially and on the process pool.
+#   python benchmarks/bench_claim_packs.py [n_travelers] [workers]
+import os, sys, io, time, shutil, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fpdf import FPDF
+import claim_pack, receipts
+
+def fake_receipt(i):
+    pdf = FPDF(); pdf.add_page(); pdf.set_font("Arial","",12)
+    pdf.cell(0, 10, f"Receipt #{i} - Taxi fare 42.00 CHF")
+    f = io.BytesIO(pdf.output(dest="S").encode("latin-1")); f.name = f"receipt_{i}.pdf"
+    return f
+
+def make_packs(n, store):
+    packs = []
+    for t in range(n):
+        rc = []
+        for k in range(3):
+            sha, size = receipts.store_file(fake_receipt(t*3+k), store)
+            rc.append({"sha256":sha, "name":f"receipt_{t*3+k}.pdf", "size":size})
+        packs.append({
+            "name":f"Traveler {t}", "ta":f"TA-TR-25-{t:03d}",
+            "authorization":{"Project":"NARD","Fund":"CHE150","Activity":"A1","Budget":"B1",
+                             "Manager":"M. Manager","Focal Point":"F. Point","Office":"Geneva"},
+            "missions":[{"Country":"Lebanon","City":"Greater Beirut","Days":4,"Total DSA":160.0}]*2,
+            "expenses":[{"Submission":"2025-05-01","Category":"Taxi Fare","Description":"Airport",
+                         "Currency":"CHF","Amount":42.0,"CHF":42.0}]*5,
+            "receipts":rc})
+    return packs
+
+def run(n=200, workers=None):
+    tmp = tempfile.mkdtemp(); store = os.path.join(tmp, "rc")
+    try:
+        packs = make_packs(n, store)
+        res = {}
+        for label, w in (("serial",1), ("pool",workers or os.cpu_count())):
+            out = os.path.join(tmp, label)
+            t = time.perf_counter()
+            for _ in claim_pack.build_packs(packs, out, workers=w, store=store): pass
+            res[label] = time.perf_counter()-t
+            print(f"{label:>6}: {n} packs in {res[label]:.2f}s ({n/res[label]:.0f} packs/s, workers={w})")
+        return res
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__=="__main__":
+    run(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,65 @@
+# Cold-start benchmark: each step runs in a fresh interpreter, so nothing is
+# warm in sys.modules. Reports the import time of streamlit, the time to render
+# the login form and the first page after login, and which heavy modules got
+# loaded on the way. Exits non-zero when the login form breaks its budget.
+#   python benchmarks/bench_startup.py [runs]
+import os, sys, json, shutil, tempfile, subprocess, statistics
+
+ROOT   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET = 1.0   # seconds from a cold interpreter to the login form
+# numpy is left out: st.image imports it to draw the logo on the login form
+HEAVY  = ["pandas","fpdf","PyPDF2","st_aggrid","requests","xlrd","xlsxwriter","pyarrow"]
+# state the app writes as it runs (prefixes: -wal/-shm, rotated logs): never linked
+# in, so a probe starts from none of it
+RUNTIME = ("travel_records.db", "flight_cache.db", "metrics.jsonl", "exchange_rates.user.csv")
+
+_PROBE = r"""
+import sys, time, json
+t0 = time.perf_counter()
+import streamlit
+t_import = time.perf_counter()-t0
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+at = AppTest.from_file(%(app)r, default_timeout=120)
+if %(auth)r: at.session_state["auth"] = True
+t1 = time.perf_counter(); at.run(); t_render = time.perf_counter()-t1
+print(json.dumps({"import":t_import, "render":t_render, "total":t_import+t_render,
+                  "errors":[str(e.value) for e in at.exception],
+                  "heavy":[m for m in %(heavy)r if m in sys.modules and m not in before]}))
+"""
+
+def probe(auth=False):
+    # runs in a scratch directory linked to the repo files, so the databases and
+    # backups the first page creates don't land in the working tree; the runtime
+    # files are left out and their paths, even if set in the environment, point there
+    tmp = tempfile.mkdtemp()
+    try:
+        for f in os.listdir(ROOT):
+            if os.path.isfile(os.path.join(ROOT, f)) and not f.startswith(".") and not f.startswith(RUNTIME):
+                os.symlink(os.path.join(ROOT, f), os.path.join(tmp, f))
+        env = dict(os.environ, TRAVEL_DB=os.path.join(tmp, "travel_records.db"),
+                   METRICS_LOG=os.path.join(tmp, "metrics.jsonl"), FLIGHT_CACHE_DB=os.path.join(tmp, "flight_cache.db"),
+                   FX_USER_RATES=os.path.join(tmp, "exchange_rates.user.csv"), RECEIPT_DIR=os.path.join(tmp, "receipts"))
+        out = subprocess.run([sys.executable, "-c", _PROBE % {"app":os.path.join(tmp, "toolbox_mena_v2.py"),
+                                                              "auth":auth, "heavy":HEAVY}],
+                             cwd=tmp, env=env, capture_output=True, text=True, check=True).stdout
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return json.loads(out.strip().splitlines()[-1])
+
+def run(runs=3):
+    res = {}
+    for label, auth in (("login",False), ("first page",True)):
+        ps = [probe(auth) for _ in range(runs)]
+        med = {k: statistics.median(p[k] for p in ps) for k in ("import","render","total")}
+        res[label] = dict(med, heavy=ps[-1]["heavy"], errors=ps[-1]["errors"])
+        print(f"{label:>10}: streamlit import {med['import']:.2f}s + render {med['render']:.2f}s"
+              f" = {med['total']:.2f}s (median of {runs}); heavy modules: {', '.join(ps[-1]['heavy']) or 'none'}")
+        for e in ps[-1]["errors"]: print(f"{'':>12}error: {e}")
+    ok = res["login"]["total"] <= BUDGET and not res["login"]["heavy"]
+    print(f"login budget {BUDGET:.1f}s: {'ok' if ok else 'EXCEEDED'}")
+    return res, ok
+
+if __name__=="__main__":
+    _, ok = run(*(int(a) for a in sys.argv[1:2]))
+    sys.exit(0 if ok else 1)
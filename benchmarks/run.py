@@ -0,0 +1,180 @@
+# Headless benchmark suite for the hot paths, no Streamlit server involved.
+# Synthetic data comes from synth.py, Amadeus from the local stub. Each case is
+# timed best-of-N and compared with baseline.json; a case slower than
+# baseline x threshold (and by more than NOISE_S) is a regression, exit code 1.
+#   python benchmarks/run.py --size 1k                 # run and compare
+#   python benchmarks/run.py --size 100k --save        # record a new baseline
+#   python benchmarks/run.py --only records. --repeat 5
+# Baselines are kept for 1k, 100k and 1M. The cold-start (bench_startup) and
+# claim-pack (bench_claim_packs) scripts also run here as startup.* and claim_packs.*.
+import os, sys, json, time, shutil, argparse, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(HERE, ".data")   # generated databases, reused between runs
+BASELINE  = os.path.join(HERE, "baseline.json")
+THRESHOLD = 1.30
+NOISE_S   = 0.005
+
+import amadeus_stub
+STUB_URL, _ = amadeus_stub.start()
+os.environ.update(AMADEUS_BASE_URL=STUB_URL, AMADEUS_RATE="1000", AMADEUS_BURST="50",
+                  FLIGHT_CACHE_DB=os.path.join(tempfile.mkdtemp(), "flight_cache.db"),
+                  METRICS_LOG="")
+sys.path.insert(0, os.path.dirname(HERE))
+
+import synth, bench_startup, bench_claim_packs
+import records_db, records_io, backup, dashboard, exports, dsa_rates, currency, co2, iata, claim_pack
+from dsa_engine import compute_dsa
+from flight_search import offers_table, filter_table, search_trip
+from flight_cache import cache
+
+# --- cases: name -> (setup(ctx), run(ctx)); setup is untimed, run is timed ---
+def _db(ctx):
+    os.makedirs(DATA, exist_ok=True)
+    ctx["db"] = os.path.join(DATA, f"records_{ctx['label']}.db")
+    ctx["conn"] = synth.fill_db(ctx["db"], ctx["n"])
+
+def _backup_dir(ctx):
+    _db(ctx); ctx["bdir"] = tempfile.mkdtemp()
+
+def _incremental_reset(c):
+    # watermark 1000 rows behind the end: each run exports the same tail
+    last = c["conn"].execute("SELECT MAX(id) FROM records").fetchone()[0]
+    backup.save_state({"last_id":max(last-1000,0), "last_full":time.strftime("%Y-%m-%d"), "last_run":None}, c["bdir"])
+
+def _incremental(ctx):
+    _backup_dir(ctx); _incremental_reset(ctx)
+
+def _pages(conn, n_pages, **f):
+    after = None
+    for _ in range(n_pages):
+        _, _, after = records_db.page_records(conn, "Departure ↓", after, 50, **f)
+        if after is None: break
+
+def _import_file(ctx):
+    import pandas as pd
+    ctx["bdir"] = tempfile.mkdtemp()
+    ctx["csv"] = os.path.join(ctx["bdir"], "records.csv")
+    pd.DataFrame(synth.record_rows(min(ctx["n"], 100_000)), columns=records_db.RECORD_COLS).to_csv(ctx["csv"], index=False)
+
+def _import_fresh(c):
+    # into an empty database each time: inserts, not upsert updates
+    db = os.path.join(c["bdir"], f"import_{time.perf_counter_ns()}.db")
+    records_io.import_file(c["csv"], db)
+
+def _trips(ctx):
+    rows = list(synth.record_rows(min(ctx["n"], 100_000)))
+    ctx["trips"] = ([r[12] for r in rows], [r[15] for r in rows], [r[16] for r in rows])
+
+def _mission_frame(ctx):
+    ctx["idx"] = dsa_rates.load_index(); ctx["missions"] = synth.missions(min(ctx["n"], 100_000))
+
+def _expense_frame(ctx):
+    import pandas as pd
+    ctx["df"] = pd.DataFrame(synth.expenses(min(ctx["n"], 50_000)))
+
+def _offers(ctx):
+    ctx["offers"] = synth.offers(min(ctx["n"], 50_000))
+    ctx["table"] = offers_table(ctx["offers"])
+
+def _typed(ctx):
+    # what gets typed into the airport boxes: code and city prefixes, typos, metro areas.
+    # A fixed sample of 256 airports, so the workload doesn't grow with airports.csv
+    ap = co2.airports().sample(256, random_state=0)
+    words = list(ap.index)+list(ap["city"])+["par","lon","genva","new y","beyrouth"]
+    ctx["typed"] = [w[:k] for w in words for k in (1, 2, 3, len(w))]
+
+def _packs(ctx):
+    # claim packs don't grow with the records table: 20 travelers at 1k, 200 above
+    ctx["bdir"] = tempfile.mkdtemp(); ctx["store"] = os.path.join(ctx["bdir"], "rc")
+    ctx["packs"] = bench_claim_packs.make_packs(20 if ctx["n"]<=1000 else 200, ctx["store"])
+
+def _build_packs(c, workers):
+    for _ in claim_pack.build_packs(c["packs"], os.path.join(c["bdir"], "out"), workers, c["store"]): pass
+
+def _fresh_cache(ctx):
+    ctx["legs"] = [("GVA","BEY","2026-11-02"), ("BEY","CAI","2026-11-05"), ("CAI","GVA","2026-11-09")]
+
+CASES = {
+    "backup.full":            (_backup_dir,  lambda c: backup.backup_excel(c["db"], c["bdir"], full=True)),
+    "backup.incremental":     (_incremental, lambda c: (_incremental_reset(c), backup.backup_excel(c["db"], c["bdir"], full=False))),
+    "records.count_filtered": (_db, lambda c: records_db.count_records(c["conn"], project="NARD", dep_from="2024-01-01")),
+    "records.page_first":     (_db, lambda c: records_db.page_records(c["conn"], "Departure ↓", None, 50, project="NARD")),
+    "records.page_20_deep":   (_db, lambda c: _pages(c["conn"], 20, project="NARD")),
+    "records.traveler_prefix":(_db, lambda c: records_db.page_records(c["conn"], "Traveler A→Z", None, 50, traveler="Sa")),
+    "records.ta_prefix":      (_db, lambda c: records_db.page_records(c["conn"], "Departure ↓", None, 50, ta="ta-sa-24")),
+    "records.traveler_walk":  (_db, lambda c: records_db.page_records(c["conn"], "Departure ↓", None, 50, traveler="Sa")),
+    "records.search_count":   (_db, lambda c: records_db.count_records(c["conn"], q="haddad")),
+    "records.search_ranked":  (_db, lambda c: records_db.page_records(c["conn"], records_db.BEST_MATCH, None, 50, q="haddad 4")),
+    "records.import":         (_import_file, _import_fresh),
+    "dashboard.all":          (_db, lambda c: [f(c["conn"]) for f in (dashboard.totals, dashboard.spend_by_month,
+                                    dashboard.spend_by_project, dashboard.trips_per_traveler, dashboard.avg_fare_by_class)]),
+    "export.query_xlsx":      (_db, lambda c: exports.query_file(c["conn"], *records_db.filtered_query(project="NARD"), "xlsx").close()),
+    "export.query_csv":       (_db, lambda c: exports.query_file(c["conn"], *records_db.filtered_query(project="NARD"), "csv").close()),
+    "export.frame_xlsx":      (_expense_frame, lambda c: exports.serialize(c["df"], "xlsx")),
+    "export.frame_csv":       (_expense_frame, lambda c: exports.serialize(c["df"], "csv")),
+    "dsa.compute":            (_mission_frame, lambda c: compute_dsa(c["missions"], c["idx"])),
+    "co2.emissions":          (_trips, lambda c: co2.emissions(*c["trips"])),
+    "currency.to_chf":        (_expense_frame, lambda c: currency.to_chf(c["df"]["Amount"], c["df"]["Currency"], c["df"]["Submission"])),
+    "offers.table":           (_offers, lambda c: offers_table(c["offers"])),
+    "offers.filter":          (_offers, lambda c: filter_table(c["table"], True, True, True)),
+    "iata.suggest":           (_typed, lambda c: [iata.suggest(t) for t in c["typed"]]),
+    "iata.resolve":           (_typed, lambda c: [iata.resolve(t, True) for t in c["typed"]]),
+    "claim_packs.serial":     (_packs, lambda c: _build_packs(c, 1)),
+    "claim_packs.pool":       (_packs, lambda c: _build_packs(c, None)),
+    # wall clock of a fresh interpreter up to the rendered page (bench_startup.probe),
+    # the same at every --size; bench_startup.py on its own also checks the login budget
+    "startup.login":          (lambda c: None, lambda c: bench_startup.probe(False)),
+    "startup.first_page":     (lambda c: None, lambda c: bench_startup.probe(True)),
+    "amadeus.search_trip_cold":(_fresh_cache, lambda c: (cache().clear(), search_trip(c["legs"], "ECONOMY"))),
+    "amadeus.search_trip_warm":(_fresh_cache, lambda c: search_trip(c["legs"], "ECONOMY")),
+}
+
+def run_case(name, label, n, repeat):
+    setup, fn = CASES[name]
+    ctx = {"label":label, "n":n}
+    setup(ctx)
+    fn(ctx)   # warm-up: caches, imports, first-open costs are not what we track
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(ctx); best = min(best, time.perf_counter()-t)
+    if "bdir" in ctx: shutil.rmtree(ctx["bdir"], ignore_errors=True)
+    return best
+
+def load_baseline():
+    try:
+        with open(BASELINE) as f: return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="hot-path benchmarks")
+    ap.add_argument("--size", choices=list(synth.SIZES), default="1k")
+    ap.add_argument("--only", default="", help="run cases whose name starts with this")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    a = ap.parse_args(argv)
+    base = load_baseline().get(a.size, {})
+    res, regressions = {}, []
+    for name in CASES:
+        if not name.startswith(a.only): continue
+        t = res[name] = run_case(name, a.size, synth.SIZES[a.size], a.repeat)
+        ref = base.get(name)
+        verdict = ""
+        if ref:
+            verdict = f"{t/ref:5.2f}x baseline"
+            if t > ref*a.threshold and t-ref > NOISE_S:
+                verdict += "  REGRESSION"; regressions.append(name)
+        print(f"{name:<26} {t*1000:10.1f} ms  {verdict}", flush=True)
+    if a.save:
+        data = load_baseline(); data.setdefault(a.size, {}).update({k:round(v,5) for k,v in res.items()})
+        with open(BASELINE, "w") as f: json.dump(data, f, indent=1, sort_keys=True)
+        print(f"baseline saved for {a.size}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) over {a.threshold:.2f}x: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
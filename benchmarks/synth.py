@@ -0,0 +1,98 @@
+# Synthetic data for the benchmarks: travel records in the records_db schema,
+# TA/mission/expense lists shaped like the app's session state, and Amadeus
+# flight-offer payloads. Everything is seeded, so runs are comparable.
+import os, sys, random
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+import records_db
+
+SIZES     = {"1k":1_000, "100k":100_000, "1M":1_000_000}
+AIRPORTS  = ["GVA","ZRH","BEY","CAI","AMM","TUN","IST","DXB","DOH","CMN","ALG","BGW","FRA","CDG"]
+PROJECTS  = ["NARD","CHE150","MENA01","LEB22","EGY07","TUN03","JOR11","IRQ05"]
+CLASSES   = ["ECONOMY","ECONOMY","ECONOMY","BUSINESS","FIRST"]
+COUNTRIES = [("Lebanon","Greater Beirut"),("Egypt","Cairo"),("Jordan","Amman"),("Tunisia","Tunis")]
+
+def _names(rng, n):
+    first = ["Amal","Omar","Lina","Karim","Sara","Youssef","Nour","Hadi","Rania","Sami","Dina","Fadi"]
+    last  = ["Haddad","Mansour","Khoury","Saleh","Nasser","Aziz","Farah","Hamdan","Rahal","Issa"]
+    return [f"{rng.choice(first)} {rng.choice(last)} {i%97}" for i in range(n)]
+
+def record_rows(n, seed=1):
+    # tuples in RECORD_COLS order
+    rng = random.Random(seed)
+    travelers = _names(rng, max(n//20, 10))
+    base = date(2022,1,1)
+    for i in range(n):
+        tr = travelers[i % len(travelers)]
+        dep = base + timedelta(days=rng.randrange(1400)); ret = dep + timedelta(days=rng.randrange(1,15))
+        o, d = rng.sample(AIRPORTS, 2)
+        fare = round(rng.uniform(150, 2500), 2); chg = round(rng.choice([0,0,0,50,120]), 2)
+        yield (tr, "Officer", f"TA-{tr[:2].upper()}-{dep.year%100:02d}-{i:07d}",
+               rng.choice(PROJECTS), "CHE150", f"A{rng.randrange(9)}", f"BL{rng.randrange(30)}",
+               fare, chg, fare+chg, f"AP{i:09d}", f"{rng.randrange(10**12, 10**13)}",
+               f"{o}-{d}-{o}", dep.isoformat(), ret.isoformat(), rng.choice(CLASSES),
+               rng.choice(["One-way","Round-trip","Multi-destination"]), round(rng.uniform(.1,3),3),
+               (ret-dep).days+1, "MTR", "", f"{dep.isoformat()}T09:00:00")
+
+def fill_db(path, n, seed=1, chunk=50_000):
+    # bulk load bypassing the writer thread; summary triggers run as in production
+    conn = records_db.connect(path); records_db.migrate(conn)
+    have = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    if have < n:
+        sql = (f"INSERT INTO records ({','.join(records_db.RECORD_COLS)}) "
+               f"VALUES ({','.join('?'*len(records_db.RECORD_COLS))})")
+        rows, it = [], record_rows(n-have, seed+have)
+        for r in it:
+            rows.append(r)
+            if len(rows) >= chunk:
+                with conn: conn.executemany(sql, rows)
+                rows = []
+        if rows:
+            with conn: conn.executemany(sql, rows)
+    return conn
+
+def ta_list(n, seed=2):
+    rng = random.Random(seed)
+    return [{"Name":nm, "TA":f"TA-{nm[:3].upper()}-26-{i:03d}", "Project":rng.choice(PROJECTS),
+             "Fund":"CHE150", "Activity":"A1", "Budget":"B1", "Manager":"M. Manager",
+             "Focal Point":"F. Point", "Office":"Geneva"} for i,nm in enumerate(_names(rng, n))]
+
+def missions(n, seed=3):
+    # MISSION_COLS frame with the mix of time formats the bulk importer accepts
+    rng = random.Random(seed)
+    rows = []
+    for i,nm in enumerate(_names(rng, n)):
+        c, a = rng.choice(COUNTRIES); dep = date(2026,1,1)+timedelta(days=rng.randrange(300))
+        rows.append({"Name":nm, "TA":f"TA-{i:06d}", "Country":c, "City":a,
+                     "Dep Date":dep.isoformat(), "Dep Time":f"{rng.randrange(24):02d}:{rng.choice([0,15,30,45]):02d}",
+                     "Ret Date":(dep+timedelta(days=rng.randrange(0,10))).isoformat(),
+                     "Ret Time":f"{rng.randrange(24):02d}:{rng.choice([0,30]):02d}",
+                     "Lunch Ded":rng.randrange(2), "Dinner Ded":rng.randrange(2), "Full Ded":0})
+    return pd.DataFrame(rows)
+
+def expenses(n, seed=4):
+    rng = random.Random(seed)
+    cats = {"Consultancy fee":"60100","Taxi Fare":"62000","Room fees":"63000","Other":"60990"}
+    rows = []
+    for i,nm in enumerate(_names(rng, n)):
+        cat = rng.choice(list(cats)); cur = rng.choice(["CHF","EUR","USD"]); amt = round(rng.uniform(5,900),2)
+        rows.append({"Traveler":nm, "TA Number":f"TA-{i:06d}", "Submission":date(2026,10,1)+timedelta(days=rng.randrange(14)),
+                     "Office":"Geneva", "Category":cat, "Code":cats[cat], "Description":"synthetic",
+                     "Project":rng.choice(PROJECTS), "Fund":"CHE150", "Activity":"A1", "Budget Line":"B1",
+                     "Currency":cur, "Amount":amt, "Rate":1.0, "CHF":amt, "Files":""})
+    return rows
+
+def offer(i, o, d, dt):
+    # one flight-offers item as the Amadeus v2 API returns it; odd ids connect via IST
+    segs = [{"departure":{"iataCode":o, "at":f"{dt}T08:00:00"},
+             "arrival":{"iataCode":"IST" if i%2 else d, "at":f"{dt}T11:00:00"}}]
+    if i%2:
+        segs.append({"departure":{"iataCode":"IST", "at":f"{dt}T12:00:00"},
+                     "arrival":{"iataCode":d, "at":f"{dt}T14:00:00"}})
+    return {"id":str(i), "itineraries":[{"segments":segs}], "price":{"total":f"{300+i*17.5:.2f}"},
+            "pricingOptions":{"refundable":i%3==0},
+            "travelerPricings":[{"fareDetailsBySegment":[{"includedCheckedBags":{"quantity":i%2}}]}]}
+
+def offers(n, o="GVA", d="BEY", dt="2026-11-02"):
+    return [offer(i, o, d, dt) for i in range(n)]
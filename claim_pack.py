@@ -0,0 +1,147 @@
+# Claim packs: TA summary, DSA declaration and expense sheet rendered with FPDF
+# on a shared page template, followed by the traveler's receipts, merged with
+# PdfMerger and written straight to disk. Batches run on a process pool.
+import os, io, tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fpdf import FPDF
+from PyPDF2 import PdfMerger
+import receipts
+
+LOGO   = "hd_logo.png"
+TITLES = {"ta":"Travel Authorization", "dsa":"DSA Declaration", "exp":"Expense Sheet"}
+IMAGE_EXT = (".jpg",".jpeg",".png")
+
+def _txt(v):
+    # core PDF fonts are latin-1 only
+    return ("" if v is None else str(v)).encode("latin-1","replace").decode("latin-1")
+
+def _pdf_bytes(pdf):
+    return pdf.output(dest="S").encode("latin-1")
+
+# --- page template: logo, title band and footer drawn by header()/footer() on every
+# page; the flattened logo is prepared once per process ---
+_logo = []
+
+def _logo_file():
+    # FPDF 1.7 can't read RGBA PNGs; flatten the logo to a JPEG once
+    if _logo: return _logo[0]
+    out = None
+    if os.path.exists(LOGO):
+        try:
+            from PIL import Image
+            out = os.path.join(tempfile.gettempdir(), f"claim_logo_{os.getpid()}.jpg")
+            im = Image.open(LOGO).convert("RGBA"); bg = Image.new("RGB", im.size, "white")
+            bg.paste(im, mask=im.split()[3]); bg.save(out, "JPEG", quality=90)
+        except Exception:
+            out = None
+    _logo.append(out)
+    return out
+
+class PackPage(FPDF):
+    def __init__(self, kind):
+        super().__init__(); self.kind = kind; self.logo = _logo_file()
+        self.set_auto_page_break(True, 20)
+
+    def header(self):
+        if self.logo: self.image(self.logo, 10, 8, 40)
+        self.set_fill_color(220,38,38); self.rect(0, 30, 210, 12, "F")
+        self.set_text_color(255,255,255); self.set_font("Arial","B",14)
+        self.set_xy(10, 32); self.cell(0, 8, TITLES[self.kind])
+        self.set_text_color(0,0,0); self.set_xy(10, 48)
+
+    def footer(self):
+        self.set_text_color(128,128,128); self.set_font("Arial","",8)
+        self.set_xy(10, 285); self.cell(0, 5, "MENA Team Logistics Toolbox - (c) All rights reserved MTR", 0, 0, "C")
+        self.set_text_color(0,0,0)
+
+# --- content pages ---
+def _table(pdf, cols, rows, widths):
+    pdf.set_font("Arial","B",9); pdf.set_fill_color(240,240,240)
+    for c,w in zip(cols,widths): pdf.cell(w, 7, _txt(c), 1, 0, "C", True)
+    pdf.ln(); pdf.set_font("Arial","",9)
+    for r in rows:
+        for c,w in zip(cols,widths): pdf.cell(w, 6, _txt(r.get(c,""))[:40], 1)
+        pdf.ln()
+
+def _content(kind, pack):
+    pdf = PackPage(kind); pdf.add_page()
+    pdf.set_font("Arial","",10)
+    pdf.cell(0, 6, _txt(f"Traveler: {pack.get('name','')}    TA: {pack.get('ta','')}"), 0, 1)
+    pdf.ln(3)
+    if kind=="ta":
+        for k,v in (pack.get("authorization") or {}).items():
+            pdf.set_font("Arial","B",10); pdf.cell(45, 7, _txt(k))
+            pdf.set_font("Arial","",10);  pdf.cell(0, 7, _txt(v), 0, 1)
+    elif kind=="dsa":
+        ms = pack.get("missions", [])
+        _table(pdf, ["Country","City","Days","Total DSA"], ms, [60,70,20,40])
+        pdf.ln(2); pdf.set_font("Arial","B",10)
+        pdf.cell(0, 7, f"Total DSA: {sum(float(m.get('Total DSA') or 0) for m in ms):,.2f} CHF", 0, 1, "R")
+    else:
+        es = pack.get("expenses", [])
+        _table(pdf, ["Submission","Category","Description","Currency","Amount","CHF"], es, [25,35,60,20,25,25])
+        pdf.ln(2); pdf.set_font("Arial","B",10)
+        pdf.cell(0, 7, f"Total: {sum(float(e.get('CHF') or 0) for e in es):,.2f} CHF", 0, 1, "R")
+    return io.BytesIO(_pdf_bytes(pdf))
+
+def _images_pdf(paths):
+    pdf = FPDF()
+    for p in paths:
+        pdf.add_page()
+        try: pdf.image(p, 10, 10, 190)
+        except Exception:
+            pdf.set_font("Arial","",10); pdf.cell(0, 10, _txt(f"Receipt could not be embedded: {os.path.basename(p)}"))
+    return io.BytesIO(_pdf_bytes(pdf))
+
+def group_packs(tas, missions, expenses):
+    # one pack per TA number found in authorizations, missions or expenses
+    packs = {}
+    def pack(ta, name):
+        p = packs.setdefault(ta, {"ta":ta, "name":name or "", "authorization":{}, "missions":[], "expenses":[]})
+        if name and not p["name"]: p["name"] = name
+        return p
+    for t in tas:
+        if t.get("TA"): pack(t["TA"], t.get("Name"))["authorization"] = dict(t)
+    for m in missions:
+        if m.get("TA"): pack(m["TA"], m.get("Name"))["missions"].append(m)
+    for e in expenses:
+        if e.get("TA Number"): pack(e["TA Number"], e.get("Traveler"))["expenses"].append(e)
+    return list(packs.values())
+
+def build_pack(pack, out_dir, store=receipts.STORE_DIR):
+    # pack: {"name","ta","authorization":{...},"missions":[...],"expenses":[...],
+    #        "receipts":[{"sha256","name"}...]}; returns the written path
+    m = PdfMerger()
+    for kind in ("ta","dsa","exp"): m.append(_content(kind, pack))
+    images, skipped, seen = [], [], set()
+    for r in pack.get("receipts", []):
+        # one row per link: a file attached to two rows of the TA is merged once
+        if r["sha256"] in seen: continue
+        seen.add(r["sha256"])
+        path, name = receipts.path_for(r["sha256"], store), r.get("name","").lower()
+        if not os.path.exists(path): skipped.append(r.get("name")); continue
+        if name.endswith(".pdf"):
+            try: m.append(path)
+            except Exception: skipped.append(r.get("name"))
+        elif name.endswith(IMAGE_EXT): images.append(path)
+        else: skipped.append(r.get("name"))   # .msg/.eml stay in the receipt store
+    if images: m.append(_images_pdf(images))
+    os.makedirs(out_dir, exist_ok=True)
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in (pack.get("ta") or pack.get("name") or "pack"))
+    dest = os.path.join(out_dir, f"claim_pack_{safe}.pdf")
+    with open(dest+".part","wb") as f: m.write(f)
+    m.close(); os.replace(dest+".part", dest)
+    return dest
+
+def build_packs(packs, out_dir, workers=None, store=receipts.STORE_DIR):
+    # yields (done, total, path) as packs finish; workers=1 builds in-process
+    total = len(packs)
+    if workers==1 or total<=1:
+        for i,p in enumerate(packs,1): yield i, total, build_pack(p, out_dir, store)
+        return
+    # spawn: forking a threaded server process is not safe
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=mp.get_context("spawn")) as ex:
+        futs = [ex.submit(build_pack, p, out_dir, store) for p in packs]
+        for i,f in enumerate(as_completed(futs),1):
+            yield i, total, f.result()
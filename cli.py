@@ -0,0 +1,185 @@
+# Command-line entry point for batch jobs, run off-hours (cron / Task Scheduler)
+# instead of inside user reruns. Nothing here imports Streamlit.
+#   python cli.py backup [--full]
+#   python cli.py dsa missions.xlsx dsa_out.xlsx [--workers 4]
+#   python cli.py export records.csv [--project NARD --from 2025-01-01]
+#   python cli.py import records.xlsx
+#   python cli.py dedupe [--dry-run]
+#   python cli.py co2 [--all]
+#   python cli.py prewarm --route GVA-BEY --route BEY-GVA --days 14
+#   python cli.py nightly [--routes routes.txt]
+import os, sys, shutil, argparse
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+def _pool(workers):
+    # spawn: workers start clean, whatever the parent has open
+    return ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+
+def _write_frame(df, out):
+    import exports
+    fmt = os.path.splitext(out)[1].lstrip(".").lower() or "csv"
+    data = exports.serialize(df, fmt)   # an unknown format fails before the file is created
+    with open(out, "wb") as f: f.write(data)
+
+# --- backup ---
+def cmd_backup(a):
+    import backup
+    dest = backup.backup_excel(a.db, a.dir, full=True if a.full else None)
+    print(dest or "nothing new to back up")
+
+# --- bulk DSA recompute: the mission file is split across worker processes ---
+def _dsa_part(df, idx):
+    from dsa_engine import compute_dsa
+    return compute_dsa(df, idx)
+
+def cmd_dsa(a):
+    import pandas as pd, dsa_rates
+    from dsa_engine import read_missions, compute_dsa
+    # the rate index is loaded once here and handed to the workers
+    idx = dsa_rates.load_index()
+    if idx is None: raise ValueError(f'no DSA rate workbook ("{dsa_rates.DSA_GLOB}") in {os.getcwd()}')
+    df = read_missions(a.input)
+    workers = a.workers or os.cpu_count() or 1
+    if workers>1 and len(df)>=2*a.chunk:
+        parts = [df.iloc[i:i+a.chunk] for i in range(0, len(df), a.chunk)]
+        with _pool(workers) as ex:
+            res = pd.concat(ex.map(_dsa_part, parts, [idx]*len(parts)), ignore_index=True)
+    else:
+        res = compute_dsa(df, idx)
+    _write_frame(res, a.output)
+    missing = int((~res["Rate found"]).sum())
+    print(f"{len(res)} mission(s), total DSA {res['Total DSA'].sum():,.2f} CHF"
+          + (f", {missing} without a rate" if missing else "") + f" -> {a.output}")
+
+# --- records export / import ---
+def cmd_export(a):
+    import records_db, exports
+    conn = records_db.init_db(a.db)
+    sql, params = records_db.filtered_query(traveler=a.traveler, ta=a.ta, project=a.project,
+                                            dep_from=a.dep_from, dep_to=a.dep_to)
+    fmt = os.path.splitext(a.output)[1].lstrip(".").lower()
+    with exports.query_file(conn, sql, params, fmt, records_db.column_types(conn)) as src, open(a.output, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    print(f"-> {a.output}")
+
+def _progress(done, total):
+    print(f"\r{done:,}/{total:,} rows", end="", file=sys.stderr, flush=True)
+
+def cmd_import(a):
+    import records_io
+    cols = dict(m.split("=",1) for m in a.map or [])
+    n, added = records_io.import_file(a.input, a.db, a.chunk or records_io.CHUNK, cols, _progress, a.restart)
+    print(f"\n{n} row(s) imported: {added} new, {n-added} updated", file=sys.stderr)
+
+def cmd_dedupe(a):
+    import records_db
+    conn = records_db.init_db(a.db)
+    if a.dry_run:
+        print(f"{records_db.ticket_dupes(conn)} older duplicate ticket/invoice row(s) would be moved to records_dupes_removed")
+        return
+    n = records_db.dedupe_tickets(conn)
+    print(f"{n} older duplicate ticket/invoice row(s) moved to records_dupes_removed" if n
+          else "no duplicate ticket/invoice rows")
+
+# --- CO2 backfill over the stored history ---
+def cmd_co2(a):
+    import co2
+    seen, done = co2.backfill(a.db, recompute=a.all, progress=_progress)
+    print(f"\n{seen} trip(s) read, CO2 set on {done}" + (f", {seen-done} with unknown airports" if seen-done else ""),
+          file=sys.stderr)
+
+# --- fare pre-warming: fills the shared flight cache for the coming days ---
+def _routes(a):
+    routes = list(a.route or [])
+    if a.routes:
+        with open(a.routes) as f:
+            routes += [ln.strip() for ln in f if ln.strip() and not ln.startswith("#")]
+    return [tuple(r.upper().split("-")[:2]) for r in routes]
+
+def prewarm(routes, days, cls="ECONOMY", start=None):
+    # one process: the Amadeus rate limit is per process, more processes would
+    # only trip the quota; the flight_search thread pool runs the calls in parallel
+    from flight_search import stream_calendar
+    start = start or date.today()+timedelta(1)
+    queries = [(o, d, start+timedelta(k)) for o,d in routes for k in range(days)]
+    n = 0
+    for _,_,_,part in stream_calendar(queries, cls):
+        n += len(part)
+    return len(queries), n
+
+def cmd_prewarm(a):
+    q, n = prewarm(_routes(a), a.days, a.cls)
+    print(f"{q} route-date(s) warmed, {n} offer(s) cached")
+
+# --- nightly: backup, CO2 backfill and pre-warming side by side in separate processes ---
+def cmd_nightly(a):
+    import backup, co2
+    routes = _routes(a)
+    with _pool(3) as ex:
+        fc = ex.submit(co2.backfill, a.db)
+        fw = ex.submit(prewarm, routes, a.days, a.cls) if routes else None
+        fb = ex.submit(backup.backup_excel, a.db, a.dir)
+        print("co2: %d trip(s) read, %d set" % fc.result())
+        print("backup:", fb.result() or "nothing new")
+        if fw: print("prewarm: %d route-date(s), %d offer(s)" % fw.result())
+
+def main(argv=None):
+    import records_db, backup
+    ap = argparse.ArgumentParser(prog="cli.py", description="MENA toolbox batch jobs")
+    ap.add_argument("--db", default=records_db.DB_PATH, help="travel records database")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("backup", help="Excel backup of the records table")
+    p.add_argument("--full", action="store_true", help="full snapshot instead of incremental")
+    p.add_argument("--dir", default=backup.BACKUP_DIR)
+    p.set_defaults(fn=cmd_backup)
+
+    p = sub.add_parser("dsa", help="recompute DSA for a missions file")
+    p.add_argument("input"); p.add_argument("output", help=".csv, .xlsx or .parquet")
+    p.add_argument("--workers", type=int, default=0, help="processes (default: CPU count)")
+    p.add_argument("--chunk", type=int, default=50_000, help="missions per worker task")
+    p.set_defaults(fn=cmd_dsa)
+
+    p = sub.add_parser("export", help="export records, filtered")
+    p.add_argument("output", help=".csv, .xlsx or .parquet")
+    for f in ("traveler","ta","project"): p.add_argument(f"--{f}")
+    p.add_argument("--from", dest="dep_from"); p.add_argument("--to", dest="dep_to")
+    p.set_defaults(fn=cmd_export)
+
+    p = sub.add_parser("import", help="import records from CSV/xlsx, upserting on ticket/invoice")
+    p.add_argument("input")
+    p.add_argument("--map", action="append", help='"File header=record_column", repeatable')
+    p.add_argument("--chunk", type=int, help="rows per transaction")
+    p.add_argument("--restart", action="store_true", help="ignore a previous partial run")
+    p.set_defaults(fn=cmd_import)
+
+    p = sub.add_parser("dedupe", help="keep the newest row of each ticket/invoice pair, so imports can upsert")
+    p.add_argument("--dry-run", action="store_true", help="only count the rows that would be moved")
+    p.set_defaults(fn=cmd_dedupe)
+
+    p = sub.add_parser("co2", help="compute CO2 for trips that have none")
+    p.add_argument("--all", action="store_true", help="recompute every trip (new factors or airports)")
+    p.set_defaults(fn=cmd_co2)
+
+    for name, fn, hlp in (("prewarm", cmd_prewarm, "pre-fetch fares into the flight cache"),
+                          ("nightly", cmd_nightly, "backup + CO2 backfill + fare pre-warming")):
+        p = sub.add_parser(name, help=hlp)
+        p.add_argument("--route", action="append", help="ORIGIN-DEST, repeatable")
+        p.add_argument("--routes", help="file with one ORIGIN-DEST per line")
+        p.add_argument("--days", type=int, default=14)
+        p.add_argument("--class", dest="cls", default="ECONOMY")
+        if name=="nightly": p.add_argument("--dir", default=backup.BACKUP_DIR)
+        p.set_defaults(fn=fn)
+
+    a = ap.parse_args(argv)
+    try:
+        a.fn(a)
+    except (ValueError, OSError) as e:   # no rate workbook, missing columns, unknown format, unreadable file
+        print(f"cli.py {a.cmd}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# Flight CO2 for travel records. Itineraries ("GVA-BEY-GVA") are split into legs,
+# legs get great-circle distances from the bundled airports.csv and a per
+# passenger-km factor by haul and cabin class; all legs of a batch of trips go
+# through one set of NumPy operations. Factors are the UK government (BEIS, now
+# DESNZ) 2022 GHG conversion factors for business travel by air: CO2e *with*
+# radiative forcing, applied to great-circle distance plus their 8% uplift. When
+# moving to a later year's tables, update FACTORS and the year here together.
+import os, re, threading
+import numpy as np
+import pandas as pd
+import records_db
+
+AIRPORT_FILE  = "airports.csv"
+UPLIFT        = 1.08     # routing / stacking on top of the great-circle distance
+EARTH_KM      = 6371.0
+SHORT_HAUL_KM = 3700     # international legs up to this are short haul
+CHUNK         = 20000
+
+# kg CO2e per passenger-km, 2022, with RF: (domestic, short haul, long haul)
+FACTORS = {
+    "ECONOMY":         (0.24587, 0.15102, 0.14787),
+    "PREMIUM_ECONOMY": (0.24587, 0.15102, 0.23659),
+    "BUSINESS":        (0.24587, 0.22652, 0.42882),
+    "FIRST":           (0.24587, 0.22652, 0.59147),
+}
+DEFAULT_CLASS = "ECONOMY"   # unknown or empty class
+
+_lock  = threading.Lock()
+_cache = {}   # path -> (stamp, airports)
+
+def _load(path):
+    df = pd.read_csv(path, dtype={"iata":str, "country":str}, keep_default_na=False)
+    df["iata"] = df["iata"].str.strip().str.upper()
+    return df.drop_duplicates("iata").set_index("iata")
+
+def airports(path=AIRPORT_FILE):
+    # IATA-indexed frame: name, city, subd (state/region), country, lat, lon, metro (city
+    # code of multi-airport cities, see iata.py); reloaded when the file changes.
+    # Source and licence of the airport list: airports.LICENSE
+    s = os.stat(path); stamp = (s.st_mtime_ns, s.st_size)
+    hit = _cache.get(path)
+    if hit and hit[0]==stamp: return hit[1]
+    with _lock:
+        _cache[path] = (stamp, _load(path))
+        return _cache[path][1]
+
+# --- itineraries ---
+_SEP = re.compile(r"\s*([-/,;])\s*")
+
+def legs(itinerary, trip_type=None):
+    # "GVA-BEY-GVA" -> [("GVA","BEY"), ("BEY","GVA")]. Split on the separators only:
+    # "-" or "/" chains legs, "," or ";" breaks the chain (open jaw: "GVA-BEY, CAI-GVA");
+    # a round trip written one way gets its return legs. Whatever stands between them is
+    # kept as typed, so "GVA-BEY via IST" has a "BEY VIA IST" end that emissions rejects
+    out, prev = [], None
+    for tok in _SEP.split(itinerary.strip() if isinstance(itinerary, str) else ""):
+        if tok in (",", ";"): prev = None; continue
+        if tok in ("-", "/", ""): continue
+        tok = tok.upper()
+        if prev and tok!=prev: out.append((prev, tok))
+        prev = tok
+    if len(out)==1 and trip_type and "round" in str(trip_type).lower():
+        out.append(out[0][::-1])
+    return out
+
+def unknown(itinerary):
+    # leg ends of one itinerary that aren't codes in airports.csv, in order
+    ap = airports().index
+    ends = dict.fromkeys(e for leg in legs(itinerary) for e in leg)
+    return [e for e in ends if e not in ap]
+
+def _class_codes(classes):
+    names = list(FACTORS)
+    norm = pd.Series(classes, dtype=object).fillna("").astype(str).str.strip().str.upper()
+    norm = norm.str.replace(r"[\s-]+", "_", regex=True)   # "Premium Economy" -> PREMIUM_ECONOMY
+    codes = pd.Categorical(norm, categories=names).codes
+    return np.where(codes<0, names.index(DEFAULT_CLASS), codes)
+
+def emissions(itineraries, classes, trip_types=None):
+    # tonnes CO2e per trip, NaN where the itinerary has no legs or a leg end that isn't
+    # a code in airports.csv (a typo, a word, a code the file lacks)
+    n = len(itineraries)
+    trip_types = [None]*n if trip_types is None else trip_types
+    row, org, dst = [], [], []
+    for i, (it, tt) in enumerate(zip(itineraries, trip_types)):
+        for o, d in legs(it, tt):
+            row.append(i); org.append(o); dst.append(d)
+    if not row: return np.full(n, np.nan)
+    ap = airports()
+    oi, di = ap.index.get_indexer(org), ap.index.get_indexer(dst)
+    ok = (oi>=0) & (di>=0)
+    lat, lon = np.radians(ap["lat"].to_numpy(float)), np.radians(ap["lon"].to_numpy(float))
+    ctry = pd.factorize(ap["country"])[0]
+    oi, di = oi[ok], di[ok]
+    # haversine over all resolved legs at once
+    a = (np.sin((lat[di]-lat[oi])/2)**2
+         + np.cos(lat[oi])*np.cos(lat[di])*np.sin((lon[di]-lon[oi])/2)**2)
+    km = 2*EARTH_KM*np.arcsin(np.sqrt(a))
+    band = np.where(ctry[oi]==ctry[di], 0, np.where(km<=SHORT_HAUL_KM, 1, 2))
+    row = np.asarray(row)
+    cls = _class_codes(classes)[row[ok]]
+    kg = km*UPLIFT*np.array(list(FACTORS.values()))[cls, band]
+    total = np.bincount(row[ok], weights=kg, minlength=n)/1000
+    bad = np.bincount(row[~ok], minlength=n)>0
+    has = np.bincount(row, minlength=n)>0
+    return np.where(has & ~bad, total.round(3), np.nan)
+
+def trip_co2(itinerary, travel_class=None, trip_type=None):
+    # one trip (Save Trip); None when it can't be computed
+    t = emissions([itinerary], [travel_class], [trip_type])[0]
+    return None if np.isnan(t) else float(t)
+
+# --- backfill: the stored history, in id order and chunks ---
+def backfill(db=records_db.DB_PATH, chunk=CHUNK, recompute=False, progress=None):
+    # fills co2_tons where it is NULL (every row with recompute); returns (rows seen, rows set).
+    # Each chunk commits on its own, so an interrupted run just continues next time.
+    conn = records_db.connect(db); records_db.migrate(conn)
+    cond = "" if recompute else " AND co2_tons IS NULL"
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM records WHERE 1{cond}").fetchone()[0]
+        last, seen, done = 0, 0, 0
+        while True:
+            rows = conn.execute(f"SELECT id, itinerary, travel_class, trip_type FROM records"
+                                f" WHERE id>?{cond} ORDER BY id LIMIT ?", (last, chunk)).fetchall()
+            if not rows: break
+            ids, its, cls, tts = zip(*rows)
+            t = emissions(its, cls, tts)
+            ok = ~np.isnan(t)
+            with conn:
+                conn.executemany("UPDATE records SET co2_tons=? WHERE id=?",
+                                 zip(t[ok].tolist(), np.asarray(ids)[ok].tolist()))
+            last, seen, done = ids[-1], seen+len(rows), done+int(ok.sum())
+            if progress: progress(seen, total)
+    finally:
+        conn.close()
+    return seen, done
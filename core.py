@@ -0,0 +1,57 @@
+# Business rules the app and the CLI share, with no Streamlit dependency: TA
+# numbers, trip records and day counts, expense and meeting cost totals in CHF.
+# The heavier engines have their own modules (records_db, backup, dsa_engine,
+# flight_search, currency).
+from datetime import datetime
+import numpy as np
+import currency
+
+# expense category -> account code
+ACCOUNT_CODES = {"Consultancy fee":"60100", "Taxi Fare":"62000", "Room fees":"63000", "Other":"60990"}
+
+def calculate_days(dep, ret):
+    # calendar days of a trip, both ends included; one day when the return is unknown
+    try: return max((ret-dep).days+1,1) if ret else 1
+    except: return 1
+
+def ta_number(name, tas, year=None):
+    # TA-<initial + 2 letters>-<yy>-<nnn>, nnn counting the TAs already saved for that name
+    parts = name.split()
+    if not parts: return ""
+    code = parts[0][0].upper() + (parts[1][:2].upper() if len(parts)>1 else parts[0][1:3].upper())
+    yy = (year or datetime.now().year) % 100
+    n = sum(1 for t in tas if t.get("Name")==name) + 1
+    return f"TA-{code}-{yy:02d}-{n:03d}"
+
+def trip_record(traveler, position, ta, itinerary, dep, ret, travel_class, fare, now=None):
+    # a records row for Save Trip; co2_tons is None when the itinerary has no known legs
+    from co2 import trip_co2
+    return {"traveler":traveler, "position":position, "ta":ta, "itinerary":itinerary,
+            "departure_date":dep.isoformat(), "return_date":ret.isoformat(),
+            "travel_class":travel_class, "final_fare":fare, "days_travelled":calculate_days(dep, ret),
+            "co2_tons":trip_co2(itinerary, travel_class), "created_at":(now or datetime.now()).isoformat()}
+
+def mission_rows(res):
+    # computed DSA frame (dsa_engine.compute_dsa) -> DSA Declaration mission entries
+    return [{"Name":r.get("Name"), "TA":r.get("TA"), "Country":r["Country"], "City":r["City"],
+             "Days":r["Days"], "Total DSA":r["Total DSA"], "Attachments":0}
+            for r in res.to_dict("records")]
+
+def expense_chf(df):
+    # CHF per expense row: the table rate in force on the submission date, the rate
+    # stored with the row only where none was
+    fx = currency.to_chf(df["Amount"], df["Currency"], df["Submission"])
+    return np.where(np.isnan(fx), df["Amount"]*df["Rate"], fx).round(2)
+
+def participants(text):
+    # one name per line, blank lines dropped
+    return [p.strip() for p in (text or "").splitlines() if p.strip()]
+
+def meeting_total(lines, on=None):
+    # lines: [(amount, currency)] -> (total in CHF, sorted codes with no rate in force);
+    # amounts without a rate are left out of the total
+    if not lines: return 0.0, []
+    amts, curs = zip(*lines)
+    chf = currency.to_chf(amts, curs, on)
+    missing = sorted({c for c,v in zip(curs, chf) if np.isnan(v)})
+    return float(np.nansum(chf)), missing
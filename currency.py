@@ -0,0 +1,127 @@
+# Currency conversion to CHF. ISO codes come from currencies.xls, rates from
+# exchange_rates.csv (Code, Rate = CHF per unit, Effective date), the shipped seed,
+# which is never written: add_rate appends to exchange_rates.user.csv, a local file
+# layered on top (its rows win on the same code and date). Files are read once and
+# reloaded when their mtime/size changes. Whole columns of amounts are converted
+# with a single as-of merge on the effective date.
+import os, threading
+from datetime import date
+import numpy as np
+import pandas as pd
+
+CURRENCY_FILE = "currencies.xls"
+RATE_FILE     = os.environ.get("FX_RATES", "exchange_rates.csv")
+USER_RATES    = os.environ.get("FX_USER_RATES", "exchange_rates.user.csv")
+BASE          = "CHF"
+COMMON        = ["CHF","EUR","USD"]   # listed first in every currency picker
+
+_lock  = threading.Lock()
+_cache = {}   # (kind, path) -> (stamp, value)
+
+def _stamp(path):
+    s = os.stat(path)
+    return (s.st_mtime_ns, s.st_size)
+
+def _cached(kind, path, load):
+    stamp = _stamp(path) if os.path.exists(path) else None
+    hit = _cache.get((kind, path))
+    if hit and hit[0]==stamp: return hit[1]
+    with _lock:
+        hit = _cache.get((kind, path))
+        if hit and hit[0]==stamp: return hit[1]
+        val = load(path) if stamp else load(None)
+        _cache[(kind, path)] = (stamp, val)
+        return val
+
+def _load_currencies(path):
+    fallback = pd.DataFrame({"Code":COMMON, "Country/Region":"", "Currency Name":""})
+    if path is None: return fallback
+    try:
+        df = pd.read_excel(path, sheet_name="Active")
+    except ImportError:
+        return fallback   # .xls needs xlrd; the startup check reports it
+    df["Code"] = df["Code"].astype(str).str.strip().str.upper()
+    return df.drop_duplicates("Code").reset_index(drop=True)
+
+def _load_rates(path):
+    base = pd.DataFrame({"Code":[BASE], "Rate":[1.0], "Effective":[pd.Timestamp("1900-01-01")]})
+    if path is None: return base
+    df = pd.read_csv(path, dtype={"Code":str})
+    df["Code"] = df["Code"].str.strip().str.upper()
+    df["Rate"] = pd.to_numeric(df["Rate"], errors="coerce")
+    df["Effective"] = pd.to_datetime(df["Effective"], errors="coerce")
+    df = df.dropna(subset=["Code","Rate","Effective"])
+    df = pd.concat([base, df[df["Code"]!=BASE]], ignore_index=True)
+    df["Effective"] = df["Effective"].astype("datetime64[ns]")
+    return df.sort_values("Effective", kind="stable").reset_index(drop=True)
+
+def currencies(path=CURRENCY_FILE):
+    return _cached("codes", path, _load_currencies)
+
+def rate_table(path=RATE_FILE, user_path=USER_RATES):
+    # Code, Rate, Effective; sorted by Effective, CHF always present at 1.0
+    seed, added = _cached("rates", path, _load_rates), _cached("rates", user_path, _load_rates)
+    hit = _cache.get(("layered", path, user_path))
+    if hit and hit[0][0] is seed and hit[0][1] is added: return hit[1]
+    df = (pd.concat([seed, added], ignore_index=True)
+            .drop_duplicates(["Code","Effective"], keep="last")
+            .sort_values("Effective", kind="stable").reset_index(drop=True))
+    _cache[("layered", path, user_path)] = ((seed, added), df)
+    return df
+
+def add_rate(code, rate, effective, path=USER_RATES):
+    # append one rate row; the file is rewritten to a temp file and swapped in, so a
+    # reader never sees half a line. The new mtime makes rate_table() reload it
+    code = str(code).strip().upper()
+    row = f"{code},{float(rate)!r},{pd.Timestamp(effective).date().isoformat()}\n"
+    with _lock:
+        old = ""
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f: old = f.read()
+        if not old.strip(): old = "Code,Rate,Effective\n"
+        elif not old.endswith("\n"): old += "\n"
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8", newline="") as f: f.write(old+row)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp): os.remove(tmp)
+            raise
+        _cache.pop(("rates", path), None)   # same-size rewrite within the mtime tick
+
+def options(rated_only=True):
+    # codes for pickers: CHF/EUR/USD first, then every active code that has a rate
+    known = set(rate_table()["Code"]) if rated_only else set(currencies()["Code"])
+    rest = sorted(c for c in currencies()["Code"] if c in known and c not in COMMON)
+    return COMMON + rest
+
+def rate(code, on=None):
+    # (rate, effective date) in force on `on` (default today), (nan, None) if none
+    rt = rate_table()
+    rt = rt[(rt["Code"]==str(code).upper()) & (rt["Effective"]<=pd.Timestamp(on or date.today()))]
+    if rt.empty: return float("nan"), None
+    last = rt.iloc[-1]
+    return float(last["Rate"]), last["Effective"].date()
+
+def to_chf(amounts, codes, dates=None):
+    # amounts/codes/dates: equal-length columns (or a scalar date); returns a float
+    # array in the input order, NaN where no rate is in force
+    amounts = np.asarray(pd.to_numeric(pd.Series(amounts), errors="coerce"), dtype=float)
+    n = len(amounts)
+    if n==0: return amounts
+    if dates is None or np.ndim(dates)==0:
+        dates = [dates or date.today()]*n
+    # columns repeat a handful of codes and dates: look up each (code, date) pair once
+    c_codes, c_uniq = pd.factorize(pd.Series(codes))
+    d_codes, d_uniq = pd.factorize(pd.Series(dates))
+    c_uniq = np.array([str(c).strip().upper() for c in c_uniq] + [""], dtype=object)
+    d_uniq = (pd.to_datetime(pd.Series([*d_uniq, None]), errors="coerce")
+                .fillna(pd.Timestamp(date.today())).astype("datetime64[ns]").to_numpy())
+    c_codes, d_codes = c_codes % len(c_uniq), d_codes % len(d_uniq)   # -1 (missing) -> sentinel
+    pairs, inv = np.unique(c_codes.astype(np.int64)*len(d_uniq) + d_codes, return_inverse=True)
+    ci, di = np.divmod(pairs, len(d_uniq))
+    left = pd.DataFrame({"pos":np.arange(len(pairs)), "Code":c_uniq[ci], "Date":d_uniq[di]}
+                        ).sort_values("Date", kind="stable")
+    m = pd.merge_asof(left, rate_table(), left_on="Date", right_on="Effective", by="Code")
+    rates = np.empty(len(pairs)); rates[m["pos"].to_numpy()] = m["Rate"].to_numpy(dtype=float)
+    return amounts*rates[inv.ravel()]
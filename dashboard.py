@@ -0,0 +1,40 @@
+# Travel dashboard: reads the trigger-maintained summary tables from records_db,
+# a few hundred pre-aggregated rows instead of the full records history.
+import pandas as pd
+import metrics
+
+@metrics.timed("dashboard.totals")
+def totals(conn):
+    trips, spend, days = conn.execute(
+        "SELECT COALESCE(SUM(trips),0), COALESCE(SUM(spend),0), COALESCE(SUM(days),0) FROM sum_project_month").fetchone()
+    return {"trips":trips, "spend":spend, "days":days}
+
+@metrics.timed("dashboard.spend_by_month")
+def spend_by_month(conn, project=None):
+    sql = "SELECT month AS Month, SUM(spend) AS Spend, SUM(trips) AS Trips FROM sum_project_month"
+    p = []
+    if project: sql += " WHERE project=?"; p.append(project)
+    return pd.read_sql_query(sql+" GROUP BY month ORDER BY month", conn, params=p)
+
+@metrics.timed("dashboard.spend_by_project")
+def spend_by_project(conn):
+    return pd.read_sql_query("""
+      SELECT project AS Project, fund AS Fund, SUM(trips) AS Trips, SUM(spend) AS Spend, SUM(days) AS Days
+      FROM sum_project_month GROUP BY project, fund ORDER BY Spend DESC""", conn)
+
+@metrics.timed("dashboard.trips_per_traveler")
+def trips_per_traveler(conn, limit=20):
+    return pd.read_sql_query("""
+      SELECT traveler AS Traveler, trips AS Trips, spend AS Spend, days AS "Days travelled"
+      FROM sum_traveler WHERE trips>0 ORDER BY trips DESC, traveler LIMIT ?""", conn, params=[limit])
+
+@metrics.timed("dashboard.avg_fare_by_class")
+def avg_fare_by_class(conn):
+    return pd.read_sql_query("""
+      SELECT travel_class AS Class, trips AS Trips,
+             CASE WHEN fares>0 THEN ROUND(fare_total/fares,2) END AS "Avg fare (CHF)"
+      FROM sum_class WHERE trips>0 ORDER BY travel_class""", conn)
+
+@metrics.timed("dashboard.projects")
+def projects(conn):
+    return [r[0] for r in conn.execute("SELECT DISTINCT project FROM sum_project_month WHERE trips>0 ORDER BY 1")]
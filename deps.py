@@ -0,0 +1,27 @@
+# Startup dependency check: every third-party module the app uses, looked up
+# with find_spec (nothing gets imported) and reported at startup instead of
+# being pip-installed while a page loads.
+import importlib.util
+from functools import lru_cache
+
+# (module, pip package, feature that needs it, required for the app to start)
+DEPS = [
+    ("pandas",      "pandas",          "tables, DSA, records",           True),
+    ("numpy",       "numpy",           "DSA and currency engines",       True),
+    ("openpyxl",    "openpyxl",        "DSA rate workbook, xlsx imports", False),
+    ("xlrd",        "xlrd>=2.0.1",     "currency list (currencies.xls)", False),
+    ("xlsxwriter",  "xlsxwriter",      "Excel exports and backups",      False),
+    ("requests",    "requests",        "Amadeus flight lookup",          False),
+    ("st_aggrid",   "streamlit-aggrid","flight results grid",            False),
+    ("fpdf",        "fpdf",            "claim packs",                    False),
+    ("PyPDF2",      "PyPDF2",          "claim packs",                    False),
+    ("pyarrow",     "pyarrow",         "Parquet exports",                False),
+]
+
+@lru_cache(maxsize=1)
+def missing():
+    # [(module, pip package, feature, required)] not installed; checked once per process
+    return [d for d in DEPS if importlib.util.find_spec(d[0]) is None]
+
+def available(module):
+    return all(m!=module for m,*_ in missing())
@@ -0,0 +1,76 @@
+# Pure DSA calculation: the Save Mission rules applied to a whole DataFrame of
+# missions at once (time buckets with np.select, rates via one merge).
+import numpy as np
+import pandas as pd
+import dsa_rates
+
+MISSION_COLS = ["Name","TA","Country","City","Dep Date","Dep Time","Ret Date","Ret Time",
+                "Lunch Ded","Dinner Ded","Full Ded"]
+
+_rate_frames = {}
+
+def rate_table(idx):
+    # Country/Area/Full_DSA/Lunch_Only/Dinner_Only frame, built once per rate index
+    key = (idx.source, idx.stamp)
+    if key not in _rate_frames:
+        keys = list(idx.rates)
+        vals = np.array(list(idx.rates.values()), dtype=float).reshape(-1,3)
+        _rate_frames.clear()
+        _rate_frames[key] = pd.DataFrame({
+            "Country":[k[0] for k in keys], "City":[k[1] for k in keys],
+            "Full_DSA":vals[:,0], "Lunch_Only":vals[:,1], "Dinner_Only":vals[:,2]})
+    return _rate_frames[key]
+
+def _to_min(v):
+    if hasattr(v, "hour"): return v.hour*60 + v.minute
+    h, m = str(v).strip().split(" ")[-1].split(":")[:2]
+    return int(h)*60 + int(m)
+
+def _minutes(s):
+    # minutes after midnight from time objects, "08:30"/"08:30:00" strings or datetimes;
+    # a day has at most 1440 distinct values, so only the uniques are parsed
+    codes, uniq = pd.factorize(s)
+    mins = np.array([_to_min(u) for u in uniq] + [np.nan], dtype=float)
+    return mins[codes]
+
+def _dates(s):
+    # calendar days: a datetime cell's time of day is dropped so day counts stay whole
+    codes, uniq = pd.factorize(s)
+    return pd.to_datetime(pd.Series([*uniq, None])).dt.normalize().to_numpy()[codes]
+
+def compute_dsa(missions, idx=None):
+    idx = idx or dsa_rates.load_index()
+    if idx is None: raise ValueError(f'no DSA rate workbook ("{dsa_rates.DSA_GLOB}") found')
+    df = missions.copy()
+    for c in ("Lunch Ded","Dinner Ded","Full Ded"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0) if c in df else 0
+    df = df.merge(rate_table(idx), on=["Country","City"], how="left")
+    full, lun, din = (df[c].to_numpy() for c in ("Full_DSA","Lunch_Only","Dinner_Only"))
+    dep, ret = _minutes(df["Dep Time"]), _minutes(df["Ret Time"])
+    # departure before 10:00 is a full day, up to 14:00 dinner only
+    d_dep = np.select([dep<600, dep<=840], [full, din], 0.0)
+    # return after 19:00 is a full day, from 13:00 lunch only
+    d_ret = np.select([ret>1140, ret>=780], [full, lun], 0.0)
+    days = (_dates(df["Ret Date"]) - _dates(df["Dep Date"]))/np.timedelta64(1,"D") + 1
+    mid = np.maximum(days-2, 0)
+    ded = df["Lunch Ded"].to_numpy()*lun + df["Dinner Ded"].to_numpy()*din + df["Full Ded"].to_numpy()*full
+    df["Days"] = pd.array(days, dtype="Int64")
+    df["Total DSA"] = d_dep + d_ret + mid*full - ded
+    df["Rate found"] = ~np.isnan(full)
+    return df
+
+def mission_dsa(country, city, dep_d, dep_t, ret_d, ret_t, ded_lunch=0, ded_dinner=0, ded_full=0, idx=None):
+    # single mission through the same rules; returns (days, total)
+    row = compute_dsa(pd.DataFrame([{
+        "Country":country, "City":city, "Dep Date":dep_d, "Dep Time":dep_t,
+        "Ret Date":ret_d, "Ret Time":ret_t,
+        "Lunch Ded":ded_lunch, "Dinner Ded":ded_dinner, "Full Ded":ded_full}]), idx).iloc[0]
+    return int(row["Days"]), float(row["Total DSA"])
+
+def read_missions(f):
+    # bulk import: CSV or xlsx with MISSION_COLS headers
+    name = getattr(f, "name", str(f)).lower()
+    df = pd.read_csv(f) if name.endswith(".csv") else pd.read_excel(f)
+    missing = [c for c in MISSION_COLS[:8] if c not in df.columns]
+    if missing: raise ValueError(f"missing column(s): {', '.join(missing)}")
+    return df
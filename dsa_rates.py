@@ -0,0 +1,77 @@
+# DSA rate index: the per-diem workbook is parsed once, compiled to a pickle
+# sidecar next to it and kept in memory, keyed on the file's mtime/size.
+import os, glob, pickle, threading
+from collections import namedtuple
+import pandas as pd
+import metrics
+
+DSA_GLOB  = "Perdiem DSA * par pays.xlsx"
+DSA_SHEET = "Feuil1"
+# CHF block of the workbook (the USD block comes first, hence the ".1" suffix)
+DSA_COLS  = ['Country','Area','Full DSA.1','Lunch only.1','Dinner only.1']
+
+# countries: sorted list, areas: country -> sorted list, rates: (country, area) -> (full, lunch, dinner)
+DsaIndex = namedtuple("DsaIndex", "source stamp countries areas rates")
+
+_lock  = threading.Lock()
+_cache = {}
+
+def find_rate_file(folder="."):
+    # newest year wins, so dropping "Perdiem DSA 2026 par pays.xlsx" next to the old one switches over
+    files = sorted(glob.glob(os.path.join(folder, DSA_GLOB)))
+    return files[-1] if files else None
+
+def _stamp(path):
+    s = os.stat(path)
+    return (s.st_mtime_ns, s.st_size)
+
+def _sidecar(path):
+    d, f = os.path.split(path)
+    return os.path.join(d, f".{os.path.splitext(f)[0]}.dsaidx")
+
+def compile_index(path):
+    with metrics.timed("dsa.read_excel"):
+        tmp = pd.read_excel(path, sheet_name=DSA_SHEET, skiprows=4)
+    tmp = tmp[DSA_COLS].dropna(subset=['Country'])
+    areas, rates = {}, {}
+    for c,a,full,lun,din in tmp.itertuples(index=False):
+        areas.setdefault(c, []).append(a)
+        rates[(c,a)] = (float(full), float(lun), float(din))
+    areas = {c: sorted(v) for c,v in sorted(areas.items())}
+    return DsaIndex(path, _stamp(path), list(areas), areas, rates)
+
+def _read_sidecar(path, stamp):
+    try:
+        with open(_sidecar(path), "rb") as f:
+            idx = pickle.load(f)
+        return idx if idx.stamp == stamp else None
+    except Exception:
+        return None
+
+def _write_sidecar(idx):
+    dest = _sidecar(idx.source); tmp = f"{dest}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(idx, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, dest)
+    except OSError:
+        if os.path.exists(tmp): os.remove(tmp)
+
+def load_index(path=None):
+    path = path or find_rate_file()
+    if not path or not os.path.exists(path): return None
+    stamp = _stamp(path)
+    idx = _cache.get(path)
+    if idx and idx.stamp == stamp: return idx
+    with _lock:
+        idx = _cache.get(path)
+        if idx and idx.stamp == stamp: return idx
+        idx = _read_sidecar(path, stamp)
+        if idx is None:
+            idx = compile_index(path)
+            _write_sidecar(idx)
+        _cache[path] = idx
+        return idx
+
+def get_rates(idx, country, area):
+    return idx.rates[(country, area)]
@@ -0,0 +1,106 @@
+# Export service behind every download button: files are built only when a
+# button is clicked, memoized on a hash of the data, and large SQL exports are
+# streamed to a temporary file in chunks instead of being built in memory.
+import os, hashlib, importlib.util, tempfile, threading
+from collections import OrderedDict
+from io import BytesIO
+import pandas as pd
+import backup, metrics
+
+MIME = {
+    "xlsx":    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv":     "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+MEMO_BYTES = 64*1024*1024   # total size of memoized exports kept per process
+CHUNK      = 5000
+
+def formats():
+    # parquet only when pyarrow is installed
+    return [f for f in MIME if f!="parquet" or importlib.util.find_spec("pyarrow")]
+
+def frame_hash(df):
+    h = hashlib.sha1(repr((list(df.columns), [str(t) for t in df.dtypes])).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def serialize(df, fmt):
+    # one frame to file bytes, not memoized: one-off files (cli.py) and the buttons below
+    with metrics.timed(f"export.{fmt}", rows=len(df)):
+        return _write(df, fmt)
+
+def _write(df, fmt):
+    buf = BytesIO()
+    if fmt=="xlsx":
+        with pd.ExcelWriter(buf, engine="xlsxwriter") as w:
+            df.to_excel(w, index=False)
+    elif fmt=="csv":
+        buf.write(df.to_csv(index=False).encode("utf-8-sig"))   # BOM so Excel opens accents right
+    elif fmt=="parquet":
+        df.to_parquet(buf, index=False)
+    else:
+        raise ValueError(f"unknown export format: {fmt}")
+    return buf.getvalue()
+
+_memo = OrderedDict()   # (hash, fmt) -> bytes
+_memo_size = 0
+_lock = threading.Lock()
+
+def frame_bytes(df, fmt="xlsx"):
+    global _memo_size
+    key = (frame_hash(df), fmt)
+    with _lock:
+        if key in _memo:
+            _memo.move_to_end(key); return _memo[key]
+    data = serialize(df, fmt)
+    with _lock:
+        if key not in _memo:
+            _memo[key] = data; _memo_size += len(data)
+            while _memo_size > MEMO_BYTES and len(_memo) > 1:
+                _, old = _memo.popitem(last=False); _memo_size -= len(old)
+    return data
+
+_ARROW = {"TEXT":"string", "REAL":"float64", "INTEGER":"int64"}
+
+def temp_path(suffix=""):
+    fd, path = tempfile.mkstemp(suffix=suffix); os.close(fd)
+    return path
+
+def open_temp(path):
+    # a finished temp file opened read-only: a BufferedReader, one of the file types
+    # st.download_button takes. The name goes at once; the data when the file is closed
+    f = open(path, "rb")
+    try: os.remove(path)
+    except OSError: pass   # Windows won't remove an open file; it stays in the temp dir
+    return f
+
+def query_file(conn, sql, params=(), fmt="xlsx", types=None, chunk=CHUNK):
+    # streams a query result to a temp file chunk by chunk and returns it open;
+    # types ({column: declared SQLite type}) pins the parquet schema across chunks
+    with metrics.timed(f"export.query.{fmt}"):
+        return _query_file(conn, sql, params, fmt, types, chunk)
+
+def _query_file(conn, sql, params, fmt, types, chunk):
+    if fmt not in MIME: raise ValueError(f"unknown export format: {fmt}")
+    path = temp_path("."+fmt)
+    try:
+        if fmt=="xlsx":
+            backup.write_xlsx(conn.execute(sql, params), path, chunk)
+        elif fmt=="csv":
+            with open(path, "wb") as out:
+                out.write(b"\xef\xbb\xbf")
+                for i,part in enumerate(pd.read_sql_query(sql, conn, params=params, chunksize=chunk)):
+                    out.write(part.to_csv(index=False, header=i==0).encode("utf-8"))
+        elif fmt=="parquet":
+            import pyarrow as pa, pyarrow.parquet as pq
+            writer = None
+            with open(path, "wb") as out:
+                for part in pd.read_sql_query(sql, conn, params=params, chunksize=chunk):
+                    if writer is None:
+                        schema = pa.schema([(c, _ARROW.get((types or {}).get(c,"TEXT"),"string")) for c in part.columns])
+                        writer = pq.ParquetWriter(out, schema)
+                    writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+                if writer: writer.close()
+        return open_temp(path)
+    except BaseException:
+        os.remove(path); raise
@@ -0,0 +1,99 @@
+# Flight-offer response cache shared by all sessions of the server process:
+# an in-memory LRU in front of a small SQLite file, so it survives restarts.
+import os, json, time, sqlite3, threading
+from collections import OrderedDict
+import amadeus
+
+CACHE_DB    = os.environ.get("FLIGHT_CACHE_DB", "flight_cache.db")
+TTL         = int(os.environ.get("FLIGHT_CACHE_TTL", 15*60))   # seconds
+MAX_ENTRIES = int(os.environ.get("FLIGHT_CACHE_MAX", 500))
+
+def make_key(o, d, dt, cls, adults=1, max=10):
+    return "|".join(map(str, (o.strip().upper(), d.strip().upper(), dt, cls, adults, max)))
+
+class FlightCache:
+    def __init__(self, path=CACHE_DB, ttl=TTL, max_entries=MAX_ENTRIES):
+        self.ttl, self.max_entries = ttl, max_entries
+        self._mem = OrderedDict()    # key -> (fetched_at, offers)
+        self._used = {}              # key -> last_used not yet written to disk (see _flush_used)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+          CREATE TABLE IF NOT EXISTS offers (
+            key TEXT PRIMARY KEY, fetched_at REAL, last_used REAL, payload TEXT
+          )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_offers_used ON offers(last_used)")
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is None:
+                row = self._db.execute("SELECT fetched_at, payload FROM offers WHERE key=?", (key,)).fetchone()
+                if row: hit = (row[0], json.loads(row[1]))
+            if hit is None: return None
+            if now-hit[0] > self.ttl:
+                self._mem.pop(key, None); self._used.pop(key, None)
+                self._db.execute("DELETE FROM offers WHERE key=?", (key,)); self._db.commit()
+                return None
+            self._mem[key] = hit; self._mem.move_to_end(key)
+            self._trim_mem()
+            self._used[key] = now   # a hit never touches the disk; put() writes these back
+            return hit[1], now-hit[0]
+
+    def put(self, key, offers):
+        now = time.time()
+        with self._lock:
+            self._mem[key] = (now, offers); self._mem.move_to_end(key)
+            self._trim_mem()
+            self._flush_used()
+            self._db.execute("INSERT OR REPLACE INTO offers VALUES (?,?,?,?)",
+                             (key, now, now, json.dumps(offers)))
+            # expire stale rows and keep only the most recently used ones on disk
+            self._db.execute("DELETE FROM offers WHERE fetched_at<?", (now-self.ttl,))
+            self._db.execute("""DELETE FROM offers WHERE key NOT IN
+                                (SELECT key FROM offers ORDER BY last_used DESC LIMIT ?)""",
+                             (self.max_entries,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear(); self._used.clear()
+            self._db.execute("DELETE FROM offers"); self._db.commit()
+
+    def _flush_used(self):
+        # last_used of the hits since the previous put, in one statement, so the
+        # on-disk LRU order is right when put() evicts
+        if self._used:
+            self._db.executemany("UPDATE offers SET last_used=? WHERE key=?",
+                                 [(t, k) for k, t in self._used.items()])
+            self._used.clear()
+
+    def _trim_mem(self):
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None: _cache = FlightCache()
+    return _cache
+
+def cached_search(o, d, dt, cls, adults=1, max=10):
+    # returns (offers, age in seconds); age is None for a live response
+    key = make_key(o, d, dt, cls, adults, max)
+    hit = cache().get(key)
+    if hit is not None: return hit
+    offers = amadeus.client().search_flights(o, d, dt, cls, adults=adults, max=max)
+    if offers: cache().put(key, offers)   # empty results are usually errors, don't pin them
+    return offers, None
+
+# --- offer field helpers ---
+def bag_count(f):
+    return f["travelerPricings"][0]["fareDetailsBySegment"][0]\
+              .get("includedCheckedBags",{}).get("quantity",0)
@@ -0,0 +1,120 @@
+# Trip search engine: every leg of a one-way / round-trip / multi-destination
+# trip is searched concurrently on a bounded pool, with a per-leg deadline.
+import os, time
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, TimeoutError as FuturesTimeout
+import numpy as np
+import pandas as pd
+import amadeus
+from flight_cache import cached_search, bag_count
+
+MAX_WORKERS = int(os.environ.get("FLIGHT_SEARCH_WORKERS", 8))
+LEG_TIMEOUT = float(os.environ.get("FLIGHT_LEG_TIMEOUT", 20))   # seconds
+
+# shared by all sessions; a leg already running when its deadline passes finishes
+# here and lands in the offer cache, so the next click picks it up. Legs still
+# queued are cancelled, so they don't hold up other sessions' searches
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="flight-leg")
+
+def plan_legs(trip_type, o, d, dt1, dt2=None, segments=None):
+    if trip_type=="Multi-destination":
+        return [(so,sd,str(sdt)) for so,sd,sdt in (segments or []) if so and sd]
+    legs = [(o,d,str(dt1))] if o and d else []
+    if trip_type=="Round-trip" and legs and dt2:
+        legs.append((d,o,str(dt2)))
+    return legs
+
+def _cancel(futs):
+    # queued legs are dropped; running ones can't be interrupted and finish into the cache
+    for f in futs:
+        if not f.done(): f.cancel()
+
+def _codes(x):
+    return [x] if isinstance(x, str) else list(x)
+
+def _pairs(o, d):
+    # a leg end may be several airports (a metro area, see iata.resolve): every pair
+    return [(a,b) for a in _codes(o) for b in _codes(d) if a!=b]
+
+def search_trip(legs, cls, timeout=LEG_TIMEOUT):
+    # latency is bound by the slowest leg (capped at timeout), not the sum of legs;
+    # the airport pairs of a metro leg are searched side by side and merged
+    t0 = time.monotonic()
+    futs = [[_pool.submit(cached_search, a, b, dt, cls) for a,b in _pairs(o,d)] for o,d,dt in legs]
+    _, late = wait([f for fs in futs for f in fs], timeout=timeout)
+    _cancel(late)
+    results = []
+    for i,((o,d,dt),fs) in enumerate(zip(legs,futs),1):
+        res = {"leg":i, "from":"/".join(_codes(o)), "to":"/".join(_codes(d)), "date":dt,
+               "offers":[], "age":None, "status":"ok"}
+        ok = [f for f in fs if f not in late and f.exception() is None]
+        ages = []
+        for f in ok:
+            offers, age = f.result(); res["offers"] += offers; ages.append(age)
+        if ages and None not in ages:   # live if any pair was, else the oldest cache entry
+            res["age"] = max(ages)
+        if any(f in late for f in fs):
+            res["status"] = "timeout"
+        elif not ok:
+            res["status"] = "error"
+        results.append(res)
+    return results, time.monotonic()-t0
+
+# --- columnar offer table: the JSON is walked once, filters/cheapest are vectorized ---
+OFFER_COLS = ["Option","From","To","Depart","Arrive","Price (CHF)","Refundable","Bags","Stops"]
+
+def offers_table(offers, **tags):
+    segs = [f["itineraries"][0]["segments"] for f in offers]
+    df = pd.DataFrame({
+        "Option":      np.arange(1, len(offers)+1),
+        "From":        [s[0]["departure"]["iataCode"] for s in segs],
+        "To":          [s[-1]["arrival"]["iataCode"] for s in segs],
+        "Depart":      [s[0]["departure"]["at"] for s in segs],
+        "Arrive":      [s[-1]["arrival"]["at"] for s in segs],
+        "Price (CHF)": np.array([f["price"]["total"] for f in offers], dtype=float),
+        "Refundable":  np.array([bool(f["pricingOptions"].get("refundable",False)) for f in offers], dtype=bool),
+        "Bags":        np.array([bag_count(f) for f in offers], dtype=int),
+        "Stops":       np.array([len(s)-1 for s in segs], dtype=int)}, columns=OFFER_COLS)
+    for i,(k,v) in enumerate(tags.items()):
+        df.insert(i, k, v)
+    return df
+
+def filter_table(df, direct=False, refundable=False, bags=False):
+    m = np.ones(len(df), dtype=bool)
+    if direct:     m &= df["Stops"].to_numpy()==0
+    if refundable: m &= df["Refundable"].to_numpy()
+    if bags:       m &= df["Bags"].to_numpy()>0
+    return df[m]
+
+def cheapest_total(df, n_legs):
+    # cheapest combination across legs, None when a leg has nothing left
+    best = df.groupby("Leg")["Price (CHF)"].min()
+    return float(best.sum()) if len(best)==n_legs and n_legs else None
+
+# --- fare calendar: a date window per route, scheduled through the API rate limiter ---
+def calendar_queries(o, d, center, span, return_after=None):
+    days = [center+timedelta(k) for k in range(-span, span+1)]
+    days = [x for x in days if x>=date.today()]
+    q = [(a,b,x) for a,b in _pairs(o,d) for x in days]
+    if return_after is not None:
+        q += [(b,a,x+timedelta(return_after)) for a,b in _pairs(o,d) for x in days]
+    return [(qo,qd,str(x)) for qo,qd,x in q]
+
+def stream_calendar(queries, cls, timeout=LEG_TIMEOUT):
+    # yields (origin, destination, date, offers table) as each date completes;
+    # the client's token bucket keeps the burst within the Amadeus quota
+    futs = {_pool.submit(cached_search, o, d, dt, cls):(o,d,dt) for o,d,dt in queries}
+    try:
+        for fut in as_completed(futs, timeout=timeout+len(futs)/amadeus.RATE):
+            o,d,dt = futs[fut]
+            offers = fut.result()[0] if fut.exception() is None else []
+            yield o, d, dt, offers_table(offers, Route=f"{o}→{d}", Date=dt)
+    except FuturesTimeout:
+        return
+    finally:   # timed out, or the caller stopped reading (closed generator, rerun)
+        _cancel(futs)
+
+def fare_grid(df):
+    # Route × Date grid of the cheapest fare
+    if df.empty: return pd.DataFrame()
+    return df.groupby(["Route","Date"])["Price (CHF)"].min().unstack("Date").sort_index(axis=1)
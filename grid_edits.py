@@ -0,0 +1,148 @@
+# Delta write-back for st.data_editor grids. The editor keeps only what the user
+# changed under its key: {"edited_rows": {pos: {col: value}}, "added_rows":
+# [{col: value}], "deleted_rows": [pos]}, positions counted in the rows it was
+# given. Saving turns that into a few grouped, parameterized statements (or
+# in-place list updates for session-state tables), so the cost follows the
+# number of edits, not the size of the table.
+#
+# Concurrency is optimistic: an UPDATE or DELETE only matches if the cells it
+# touches still hold the values the grid was loaded with; if any row changed
+# underneath, the whole save is rolled back and Conflict names the rows.
+import re, sqlite3
+from datetime import date, datetime
+
+class Conflict(sqlite3.DatabaseError):
+    # a DatabaseError so the records writer thread fails just this save, not its batch
+    def __init__(self, keys):
+        super().__init__(f"{len(keys)} row(s) changed since they were loaded: {', '.join(map(str, keys))}")
+        self.keys = keys
+
+def count(state):
+    state = state or {}
+    return (len(state.get("edited_rows") or {}) + len(state.get("added_rows") or [])
+            + len(state.get("deleted_rows") or []))
+
+def _coerce(v, like):
+    # the editor state is JSON: dates come back as ISO strings, whole floats as ints
+    if v is None or like is None or isinstance(v, type(like)): return v
+    if isinstance(like, datetime) and isinstance(v, str): return datetime.fromisoformat(v)
+    if isinstance(like, date) and isinstance(v, str): return date.fromisoformat(v[:10])
+    if isinstance(like, float) and isinstance(v, (int, float)): return float(v)
+    return v
+
+def duplicates(err, state):
+    # (columns, [values]) behind a "UNIQUE constraint failed: t.a, t.b" error, the values
+    # taken from the added and edited rows that set those columns; ([], []) otherwise
+    m = re.search(r"UNIQUE constraint failed: (.+)", str(err))
+    if not m: return [], []
+    cols = [c.strip().split(".")[-1] for c in m.group(1).split(",")]
+    rows = [*(state.get("added_rows") or []), *(state.get("edited_rows") or {}).values()]
+    vals = {" / ".join(str(r.get(c, "…")) for c in cols) for r in rows
+            if any(r.get(c) not in (None, "") for c in cols)}
+    return cols, sorted(vals)
+
+# --- SQLite tables ---
+def statements(table, key, shown, state, editable):
+    # shown: the rows (dicts, key included) exactly as loaded into the grid.
+    # Returns [(sql, [params, ...], [keys, ...])], one entry per distinct statement.
+    groups = {}
+    def add(sql, params, k):
+        g = groups.setdefault(sql, ([], [])); g[0].append(params); g[1].append(k)
+    gone = set(state.get("deleted_rows") or [])
+    for pos, change in sorted((state.get("edited_rows") or {}).items(), key=lambda x: int(x[0])):
+        if int(pos) in gone: continue
+        old = shown[int(pos)]
+        cols = [c for c in change if c in editable]
+        if not cols: continue
+        sets = ", ".join(f"{c}=?" for c in cols)
+        same = "".join(f" AND {c} IS ?" for c in cols)
+        add(f"UPDATE {table} SET {sets} WHERE {key}=?{same}",
+            [_coerce(change[c], old[c]) for c in cols]+[old[key]]+[old[c] for c in cols], old[key])
+    for pos in sorted(state.get("deleted_rows") or []):
+        old = shown[pos]
+        cols = [c for c in editable if c in old]
+        add(f"DELETE FROM {table} WHERE {key}=?"+"".join(f" AND {c} IS ?" for c in cols),
+            [old[key]]+[old[c] for c in cols], old[key])
+    for row in state.get("added_rows") or []:
+        cols = [c for c in editable if row.get(c) is not None]
+        if not cols: continue
+        add(f"INSERT INTO {table} ({','.join(cols)}) VALUES ({','.join('?'*len(cols))})",
+            [row[c] for c in cols], None)
+    return [(sql, params, keys) for sql, (params, keys) in groups.items()]
+
+def apply(conn, table, key, shown, state, editable):
+    # all or nothing; returns the number of rows written, raises Conflict (nothing written).
+    # A savepoint, not BEGIN: inside the records writer's batch transaction (which the
+    # writer opens itself) it nests; on a connection with no transaction open it is one.
+    stmts = statements(table, key, shown, state, editable)
+    if not stmts: return 0
+    n = 0
+    conn.execute("SAVEPOINT grid_edits")
+    try:
+        for sql, params, _ in stmts:
+            cur = conn.executemany(sql, params)
+            if cur.rowcount < len(params): raise Conflict([])
+            n += cur.rowcount
+    except BaseException as e:
+        conn.execute("ROLLBACK TO grid_edits"); conn.execute("RELEASE grid_edits")
+        if isinstance(e, Conflict):
+            # back to the loaded state: find the rows whose checked cells no longer match
+            stale = []
+            for sql, params, keys in stmts:
+                if sql.startswith("INSERT"): continue
+                where = sql[sql.index(" WHERE ")+7:]
+                for p, k in zip(params, keys):
+                    if not conn.execute(f"SELECT 1 FROM {table} WHERE {where}", p[-where.count("?"):]).fetchone():
+                        stale.append(k)
+            raise Conflict(stale) from None
+        raise
+    conn.execute("RELEASE grid_edits")
+    return n
+
+# --- session-state tables (lists of dicts) ---
+def apply_list(items, state, editable=None):
+    # same deltas on a list in place; deletions last so edited positions stay valid
+    like = items[0] if items else {}
+    for pos, change in (state.get("edited_rows") or {}).items():
+        row = items[int(pos)]
+        for c, v in change.items():
+            if editable is None or c in editable: row[c] = _coerce(v, row.get(c))
+    for row in state.get("added_rows") or []:
+        items.append({c: _coerce(row.get(c), like.get(c)) for c in (like or row)})
+    for pos in sorted(state.get("deleted_rows") or [], reverse=True):
+        del items[pos]
+    return items
+
+# --- edits kept while the editor isn't drawn ---
+# Streamlit drops an editor's state on a rerun that doesn't draw it (another tab). The
+# app keeps the edits so far as a state over the rows as loaded and draws them applied
+# (view); the new editor's own state counts from that view and merge folds it back in.
+def view(df, state):
+    # the loaded frame with state applied, as the editor shows it
+    import pandas as pd
+    df = df.copy()
+    for pos, change in (state.get("edited_rows") or {}).items():
+        for c, v in change.items():
+            if c in df.columns:
+                j = df.columns.get_loc(c); df.iat[int(pos), j] = _coerce(v, df.iat[int(pos), j])
+    df = df.drop(df.index[sorted(state.get("deleted_rows") or [])])
+    added = state.get("added_rows") or []
+    if added: df = pd.concat([df, pd.DataFrame(added, columns=df.columns)], ignore_index=True)
+    return df
+
+def merge(n, base, state):
+    # base: edits over n loaded rows; state: edits made on view(rows, base).
+    # Returns both as one state over the loaded rows
+    gone = set(base.get("deleted_rows") or [])
+    added = [dict(r) for r in base.get("added_rows") or []]
+    shown = [("row", i) for i in range(n) if i not in gone] + [("added", j) for j in range(len(added))]
+    edited = {int(p): dict(c) for p, c in (base.get("edited_rows") or {}).items()}
+    dropped = set()
+    for pos, change in (state.get("edited_rows") or {}).items():
+        kind, i = shown[int(pos)]
+        (edited.setdefault(i, {}) if kind=="row" else added[i]).update(change)
+    for pos in state.get("deleted_rows") or []:
+        kind, i = shown[pos]
+        (gone if kind=="row" else dropped).add(i)
+    added = [r for j, r in enumerate(added) if j not in dropped] + list(state.get("added_rows") or [])
+    return {"edited_rows": edited, "added_rows": added, "deleted_rows": sorted(gone)}
@@ -0,0 +1,109 @@
+# Offline airport lookup for the flight search, from the bundled airports.csv
+# (the file co2.py computes distances with: every airport with an IATA code).
+# Codes, metro codes, city and airport names are kept as one sorted list of
+# lowercase keys, so autocomplete is a binary search and a typo or a city name is
+# caught before anything is sent to Amadeus: a code that isn't listed is no airport.
+# A metro code (PAR) or a city name (Paris) stands for all of that city's airports.
+import bisect, difflib, re, threading, unicodedata
+import co2
+
+_lock  = threading.Lock()
+_cache = {}   # path -> (airports frame it was built from, index)
+
+def _norm(s):
+    # lowercase, accents dropped: "Zürich" and "zurich" are the same key
+    s = unicodedata.normalize("NFKD", str(s))
+    return "".join(c for c in s if not unicodedata.combining(c)).lower().strip()
+
+class Index:
+    # kinds rank the matches: code, metro code, city, word of the airport name
+    CODE, METRO, CITY, NAME = range(4)
+
+    def __init__(self, ap):
+        self.label, self.groups, self.group_of, self.cities, entries = {}, {}, {}, {}, []
+        cols = [ap[c] for c in ("name", "city", "subd", "country", "metro")]
+        for code, name, town, subd, country, metro in zip(ap.index, *cols):
+            self.label[code] = f"{code} · {name}, {town} ({country})" if town else f"{code} · {name} ({country})"
+            entries.append((code.lower(), self.CODE, code))
+            # airports of one city: its metro code where the file has one; an airport
+            # the file gives no city stands alone
+            city = metro or (f"{town}|{subd}|{country}" if town else code)
+            self.groups.setdefault(city, []).append(code); self.group_of[code] = city
+            if town:
+                self.cities.setdefault(_norm(town), set()).add(city)
+                entries.append((_norm(town), self.CITY, code))
+            entries += [(w, self.NAME, code) for w in re.findall(r"\w+", _norm(name)) if len(w)>2]
+        for city, codes in self.groups.items():
+            if len(codes)>1 and len(city)==3 and city not in self.label:
+                ap_city = ap.loc[codes[0], "city"]
+                self.label[city] = f"{city} · all {ap_city} airports ({', '.join(codes)})"
+                entries += [(city.lower(), self.METRO, city), (_norm(ap_city), self.METRO, city)]
+        # one sorted key list per kind: the best suggestions come from the first kinds,
+        # so a one-letter prefix doesn't rank thousands of names
+        entries.sort()
+        self.kind_keys  = [[e[0] for e in entries if e[1]==k] for k in range(4)]
+        self.kind_codes = [[e[2] for e in entries if e[1]==k] for k in range(4)]
+
+    def _spans(self, p):
+        return [(k, bisect.bisect_left(keys, p), bisect.bisect_left(keys, p+"\uffff"))
+                for k, keys in enumerate(self.kind_keys)]
+
+    def suggest(self, text, limit=8):
+        # [(code, label)] for keys starting with text: codes before cities before names.
+        # Nothing found: the prefix is shortened, so "genva" still offers Geneva, with
+        # the keys closest to what was typed first
+        typed = p = _norm(text)
+        while p:
+            spans = self._spans(p)
+            if any(hi>lo for _, lo, hi in spans) or len(p)<=3: break
+            p = p[:-1]
+        if not p: return []
+        out, seen = [], set()
+        for kind, lo, hi in spans:
+            keys, codes = self.kind_keys[kind], self.kind_codes[kind]
+            if p!=typed:
+                hits = sorted(range(lo, hi), key=lambda i: (-difflib.SequenceMatcher(None, typed, keys[i]).ratio(), codes[i]))
+            elif kind==self.CODE:   # the key is the code: already in order
+                hits = range(lo, hi)
+            else:
+                hits = sorted(range(lo, hi), key=lambda i: (keys[i]!=p, codes[i]))
+            for i in hits:
+                c = codes[i]
+                if c not in seen:
+                    seen.add(c); out.append((c, self.label[c]))
+                    if len(out)==limit: return out
+        return out
+
+    def resolve(self, text, metro=False):
+        # airport codes for a code, metro code or city name; None if unknown.
+        # metro=True widens an airport code to every airport of its city. A city name
+        # shared by several places resolves only where one of them has a metro code
+        p = _norm(text); code = p.upper()
+        if code in self.group_of:   # an airport, even where the city code is the same (IST)
+            return tuple(self.groups[self.group_of[code]]) if metro else (code,)
+        if code in self.label:      # a metro code (PAR)
+            return tuple(self.groups[code])
+        city = self.cities.get(p) or set()
+        if len(city)>1:             # Paris (PAR) over Paris, Texas
+            city = {c for c in city if c in self.label}
+        if len(city)==1:
+            return tuple(self.groups[next(iter(city))])
+        return None
+
+def index(path=co2.AIRPORT_FILE):
+    # rebuilt only when co2.airports reloads the file
+    ap = co2.airports(path)
+    hit = _cache.get(path)
+    if hit and hit[0] is ap: return hit[1]
+    with _lock:
+        _cache[path] = (ap, Index(ap))
+        return _cache[path][1]
+
+def suggest(text, limit=8):
+    return index().suggest(text, limit)
+
+def resolve(text, metro=False):
+    return index().resolve(text, metro)
+
+def label(code):
+    return index().label.get(code, code)
@@ -0,0 +1,117 @@
+# Meetings ledger: meetings keyed by MF #, their authorised and effective cost
+# lines (amounts converted to CHF when saved) and purchase orders, in the records
+# database. Per-meeting and per project/fund totals are kept by triggers
+# (records_db migration 5), so the list and portfolio views read them directly.
+# Writes go through the records writer thread like every other write.
+from datetime import datetime
+import pandas as pd
+import records_db, currency, grid_edits
+
+AUTHORISED = ["Flight Intl","Reimbursement","Audio Equipment","Hotel","Catering",
+              "Ground Transportation","Other"]
+EFFECTIVE  = ["Flights","Hotel","Ground Transportation","DSA","Catering","Audio Equipment","Other"]
+PO_STATUS  = ["Open","In Progress","Closed"]
+EDITABLE   = ["name","location","project","fund","pax"]
+PO_EDITABLE = ["po","order_date","status"]
+
+def _submit(fn, db):
+    return records_db.writer(db).submit(fn)
+
+def _lines(mf, kind, lines):
+    # lines: [(category, currency, qty, unit_amount, amount, details)]; empty amounts are skipped
+    lines = [l for l in lines if l[4]]
+    chf = currency.to_chf([l[4] for l in lines], [l[1] for l in lines]) if lines else []
+    return [(mf, kind, *l[:5], None if c!=c else round(float(c),2), l[5]) for l,c in zip(lines, chf)]
+
+def _replace_lines(conn, mf, kind, rows):
+    # the triggers take the old lines out of the totals and put the new ones in
+    conn.execute("DELETE FROM meeting_lines WHERE mf=? AND kind=?", (mf, kind))
+    conn.executemany("""INSERT INTO meeting_lines (mf, kind, category, currency, qty, unit_amount, amount, chf, details)
+                        VALUES (?,?,?,?,?,?,?,?,?)""", rows)
+
+def save_meeting(meta, participants, pax, lines, db=records_db.DB_PATH):
+    # meeting details (upserted on MF #) and its authorised lines, in one transaction; Future
+    mf, now = meta["MF #"].strip(), datetime.now().isoformat(timespec="seconds")
+    rows = _lines(mf, "authorised", lines)
+    def run(conn):
+        conn.execute("SAVEPOINT save_meeting")
+        try:
+            conn.execute("""INSERT INTO meetings (mf, name, location, project, fund, pax, participants, created_at, updated_at)
+                            VALUES (?,?,?,?,?,?,?,?,?) ON CONFLICT(mf) DO UPDATE SET
+                            name=excluded.name, location=excluded.location, project=excluded.project,
+                            fund=excluded.fund, pax=excluded.pax, participants=excluded.participants,
+                            updated_at=excluded.updated_at""",
+                         (mf, meta.get("Event Name"), meta.get("Location"), meta.get("Project"), meta.get("Fund"),
+                          pax, "\n".join(participants), now, now))
+            _replace_lines(conn, mf, "authorised", rows)
+        except BaseException:
+            conn.execute("ROLLBACK TO save_meeting"); conn.execute("RELEASE save_meeting"); raise
+        conn.execute("RELEASE save_meeting")
+        return len(rows)
+    return _submit(run, db)
+
+def save_effective(mf, lines, db=records_db.DB_PATH):
+    rows = _lines(mf, "effective", lines)
+    def run(conn):
+        conn.execute("SAVEPOINT save_effective")
+        try:
+            conn.execute("UPDATE meetings SET updated_at=? WHERE mf=?", (datetime.now().isoformat(timespec="seconds"), mf))
+            _replace_lines(conn, mf, "effective", rows)
+        except BaseException:
+            conn.execute("ROLLBACK TO save_effective"); conn.execute("RELEASE save_effective"); raise
+        conn.execute("RELEASE save_effective")
+        return len(rows)
+    return _submit(run, db)
+
+def save_po(mf, po, order_date, status, db=records_db.DB_PATH):
+    return records_db.writer(db).submit(
+        """INSERT INTO meeting_pos (mf, po, order_date, status) VALUES (?,?,?,?)
+           ON CONFLICT(mf, po) DO UPDATE SET order_date=excluded.order_date, status=excluded.status""",
+        (mf, po, str(order_date), status))
+
+def save_edits(shown, state, db=records_db.DB_PATH):
+    # Meeting List grid deltas (grid_edits); deleting a meeting drops its lines and POs
+    return _submit(lambda conn: grid_edits.apply(conn, "meetings", "mf", shown, state, EDITABLE), db)
+
+def save_po_edits(shown, state, db=records_db.DB_PATH):
+    return _submit(lambda conn: grid_edits.apply(conn, "meeting_pos", "id", shown, state, PO_EDITABLE), db)
+
+# --- reads ---
+def mf_numbers(conn):
+    return [r[0] for r in conn.execute("SELECT mf FROM meetings ORDER BY updated_at DESC")]
+
+def meeting_rows(conn, project=None):
+    # the Meeting List grid: raw columns plus the variance, newest first
+    sql = """SELECT mf, name, location, project, fund, pax, authorised_chf, effective_chf,
+                    ROUND(effective_chf-authorised_chf, 2) AS variance_chf FROM meetings"""
+    p = []
+    if project: sql += " WHERE project=?"; p.append(project)
+    cur = conn.execute(sql+" ORDER BY updated_at DESC", p)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+def lines(conn, mf, kind):
+    return pd.read_sql_query("""SELECT category AS Category, currency AS Currency, qty AS Qty,
+                                       unit_amount AS "Unit amount", amount AS Amount, chf AS CHF, details AS Details
+                                FROM meeting_lines WHERE mf=? AND kind=? ORDER BY id""", conn, params=[mf, kind])
+
+def unrated(conn, mf):
+    # currencies of lines that had no CHF rate when saved (left out of the totals)
+    return [r[0] for r in conn.execute(
+        "SELECT DISTINCT currency FROM meeting_lines WHERE mf=? AND chf IS NULL ORDER BY 1", (mf,))]
+
+def portfolio(conn):
+    # per project/fund, from the trigger-maintained table: no scan of meetings or lines
+    return pd.read_sql_query("""
+      SELECT project AS Project, fund AS Fund, meetings AS Meetings,
+             ROUND(authorised,2) AS "Authorised (CHF)", ROUND(effective,2) AS "Effective (CHF)",
+             ROUND(effective-authorised,2) AS "Variance (CHF)",
+             CASE WHEN authorised>0 THEN ROUND(100*(effective-authorised)/authorised,1) END AS "Variance %"
+      FROM sum_meeting_fund WHERE meetings>0 ORDER BY project, fund""", conn)
+
+def po_rows(conn, mf=None):
+    sql, p = "SELECT id, mf, po, order_date, status FROM meeting_pos", []
+    if mf: sql += " WHERE mf=?"; p.append(mf)
+    cur = conn.execute(sql+" ORDER BY id DESC", p)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
@@ -0,0 +1,77 @@
+# Hot-path instrumentation: timed() wraps an operation (as a `with` block or a
+# decorator), keeps the last WINDOW durations per operation in memory for
+# p50/p95, and writes one JSON line per timing to METRICS_LOG so runs from
+# different deployments can be compared. Also captures cProfile snapshots.
+import os, io, json, time, socket, marshal, logging, threading, cProfile, pstats
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+WINDOW      = 500                                           # timings kept per operation
+METRICS_LOG = os.environ.get("METRICS_LOG", "metrics.jsonl")  # "" disables the log
+RELEASE     = os.environ.get("APP_RELEASE", "dev")          # tag to compare deployments
+
+_lock    = threading.Lock()
+_samples = {}   # op -> deque of (ts, ms, ok)
+
+def _logger():
+    log = logging.getLogger("toolbox.metrics")
+    if not log.handlers and METRICS_LOG:
+        h = RotatingFileHandler(METRICS_LOG, maxBytes=10*1024*1024, backupCount=3, encoding="utf-8")
+        h.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(h); log.setLevel(logging.INFO); log.propagate = False
+    return log
+
+_log  = _logger()
+_host = socket.gethostname()
+
+def record(op, ms, ok=True, **extra):
+    ts = time.time()
+    with _lock:
+        _samples.setdefault(op, deque(maxlen=WINDOW)).append((ts, ms, ok))
+    if _log.handlers:
+        _log.info(json.dumps({"ts":round(ts,3), "op":op, "ms":round(ms,2), "ok":ok,
+                              "release":RELEASE, "host":_host, "pid":os.getpid(), **extra}, default=str))
+
+@contextmanager
+def timed(op, **extra):
+    t, ok = time.perf_counter(), True
+    try:
+        yield
+    except BaseException as e:
+        # st.stop()/st.rerun() unwind through here too; only real errors count as failures
+        ok = type(e).__name__ in ("StopException","RerunException")
+        raise
+    finally:
+        record(op, (time.perf_counter()-t)*1000, ok, **extra)
+
+def _pct(sorted_ms, q):
+    return sorted_ms[min(len(sorted_ms)-1, int(q*len(sorted_ms)))]
+
+def stats():
+    # one row per operation over its rolling window, slowest p95 first
+    with _lock:
+        snap = {op: list(d) for op,d in _samples.items()}
+    rows = []
+    for op, s in snap.items():
+        ms = sorted(x[1] for x in s)
+        rows.append({"op":op, "n":len(ms), "p50 ms":round(_pct(ms,.5),1), "p95 ms":round(_pct(ms,.95),1),
+                     "max ms":round(ms[-1],1), "last ms":round(s[-1][1],1),
+                     "errors":sum(1 for x in s if not x[2])})
+    return sorted(rows, key=lambda r: -r["p95 ms"])
+
+def reset():
+    with _lock: _samples.clear()
+
+# --- profiling ---
+def start_profile():
+    p = cProfile.Profile(); p.enable()
+    return p
+
+def stop_profile(p, top=60):
+    # returns (.prof bytes, readable with pstats/snakeviz; text report by cumulative time)
+    p.disable()
+    buf = io.StringIO()
+    st = pstats.Stats(p, stream=buf)
+    st.sort_stats("cumulative").print_stats(top)
+    return marshal.dumps(st.stats), buf.getvalue()
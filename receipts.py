@@ -0,0 +1,62 @@
+# Receipt store: uploads are streamed to disk in chunks under their SHA-256
+# (identical files are kept once) and indexed in SQLite by TA number and row.
+# Session state only keeps small handles, never the file bytes.
+import os, hashlib, tempfile, datetime
+import records_db
+
+STORE_DIR = os.environ.get("RECEIPT_DIR", "receipts")
+CHUNK     = 1<<20
+
+def path_for(sha, store=STORE_DIR):
+    return os.path.join(store, sha[:2], sha)
+
+def store_file(f, store=STORE_DIR):
+    # f: any binary file object (e.g. a Streamlit UploadedFile); returns (sha256, size)
+    os.makedirs(store, exist_ok=True)
+    h, size = hashlib.sha256(), 0
+    fd, tmp = tempfile.mkstemp(dir=store, suffix=".part")
+    try:
+        if hasattr(f, "seek"): f.seek(0)
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                b = f.read(CHUNK)
+                if not b: break
+                h.update(b); out.write(b); size += len(b)
+        sha = h.hexdigest(); dest = path_for(sha, store)
+        if os.path.exists(dest):
+            os.remove(tmp)          # already stored once
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+    return sha, size
+
+def add_receipts(files, ta, kind, row_ref, db=records_db.DB_PATH, store=STORE_DIR):
+    # stores and indexes uploads; returns handles {"sha256","name","size"}
+    handles = []
+    for f in files:
+        sha, size = store_file(f, store)
+        handles.append({"sha256":sha, "name":getattr(f,"name",sha), "size":size})
+    link(handles, ta, kind, row_ref, db)
+    return handles
+
+def link(handles, ta, kind, row_ref, db=records_db.DB_PATH):
+    if not handles: return
+    now = datetime.datetime.now().isoformat()
+    records_db.writer(db).submit(
+        "INSERT OR IGNORE INTO receipts (sha256,name,size,ta,kind,row_ref,created_at) VALUES (?,?,?,?,?,?,?)",
+        [(h["sha256"],h["name"],h["size"],ta,kind,row_ref,now) for h in handles], many=True).result(timeout=30)
+
+def list_receipts(conn, ta=None, kind=None, row_ref=None):
+    w, p = [], []
+    for col,val in (("ta",ta),("kind",kind),("row_ref",row_ref)):
+        if val is not None: w.append(f"{col}=?"); p.append(val)
+    sql = "SELECT sha256,name,size,ta,kind,row_ref,created_at FROM receipts"
+    sql += (" WHERE "+" AND ".join(w) if w else "") + " ORDER BY id"
+    cols = ["sha256","name","size","ta","kind","row_ref","created_at"]
+    return [dict(zip(cols,r)) for r in conn.execute(sql, p)]
+
+def open_receipt(sha, store=STORE_DIR):
+    return open(path_for(sha, store), "rb")
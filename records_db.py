@@ -0,0 +1,542 @@
+# Travel records storage: one process-wide WAL connection for reads and a single
+# background writer thread that groups inserts from all sessions into one transaction.
+import logging, os, queue, re, sqlite3, threading
+from concurrent.futures import Future
+import metrics, grid_edits
+
+DB_PATH      = os.environ.get("TRAVEL_DB", "travel_records.db")
+BUSY_TIMEOUT = 5000   # ms
+BATCH_MAX    = 500    # statements per grouped transaction
+
+_log = logging.getLogger(__name__)
+
+RECORD_COLS = [
+    "traveler","position","ta","project","fund","activity",
+    "budget_line","airfare_ticket","change_fare","final_fare",
+    "airplus_invoice","eticket_number","itinerary","departure_date",
+    "return_date","travel_class","trip_type","co2_tons",
+    "days_travelled","booked_by","remarks","created_at"]
+
+SCHEMA = ["""
+  CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    traveler TEXT, position TEXT, ta TEXT,
+    project TEXT, fund TEXT, activity TEXT,
+    budget_line TEXT, airfare_ticket REAL,
+    change_fare REAL, final_fare REAL,
+    airplus_invoice TEXT, eticket_number TEXT,
+    itinerary TEXT, departure_date TEXT,
+    return_date TEXT, travel_class TEXT,
+    trip_type TEXT, co2_tons REAL,
+    days_travelled INTEGER, booked_by TEXT,
+    remarks TEXT, created_at TEXT
+  )""",
+  "CREATE INDEX IF NOT EXISTS ix_records_ta        ON records(ta COLLATE NOCASE)",
+  "CREATE INDEX IF NOT EXISTS ix_records_traveler  ON records(traveler COLLATE NOCASE)",
+  "CREATE INDEX IF NOT EXISTS ix_records_departure ON records(departure_date)",
+  "CREATE INDEX IF NOT EXISTS ix_records_project   ON records(project)",
+]
+
+def connect(db=DB_PATH):
+    conn = sqlite3.connect(db, check_same_thread=False, timeout=BUSY_TIMEOUT/1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# --- pre-aggregated dashboard tables, kept in step with records by triggers ---
+def _days(r):
+    return (f"COALESCE({r}.days_travelled, MAX(CAST(julianday({r}.return_date)"
+            f"-julianday({r}.departure_date) AS INTEGER)+1, 1), 1)")
+
+def _summary_delta(r, sign):
+    # one UPSERT per summary table, adding (sign=+1) or removing (-1) row r
+    return f"""
+      INSERT INTO sum_project_month (project, fund, month, trips, spend, days)
+      VALUES (COALESCE({r}.project,''), COALESCE({r}.fund,''), COALESCE(substr({r}.departure_date,1,7),''),
+              {sign}, {sign}*COALESCE({r}.final_fare,0), {sign}*{_days(r)})
+      ON CONFLICT(project, fund, month) DO UPDATE SET
+        trips=trips+excluded.trips, spend=spend+excluded.spend, days=days+excluded.days;
+      INSERT INTO sum_traveler (traveler, trips, spend, days)
+      VALUES (COALESCE({r}.traveler,''), {sign}, {sign}*COALESCE({r}.final_fare,0), {sign}*{_days(r)})
+      ON CONFLICT(traveler) DO UPDATE SET
+        trips=trips+excluded.trips, spend=spend+excluded.spend, days=days+excluded.days;
+      INSERT INTO sum_class (travel_class, trips, fares, fare_total)
+      VALUES (COALESCE({r}.travel_class,''), {sign}, {sign}*({r}.final_fare IS NOT NULL), {sign}*COALESCE({r}.final_fare,0))
+      ON CONFLICT(travel_class) DO UPDATE SET
+        trips=trips+excluded.trips, fares=fares+excluded.fares, fare_total=fare_total+excluded.fare_total;"""
+
+_SUMMARY_COLS = ["traveler","project","fund","departure_date","return_date",
+                 "final_fare","days_travelled","travel_class"]
+
+_SUMMARY_TRIGGERS = {
+  "trg_records_sum_ins": f"CREATE TRIGGER IF NOT EXISTS trg_records_sum_ins AFTER INSERT ON records BEGIN {_summary_delta('NEW',1)} END",
+  "trg_records_sum_del": f"CREATE TRIGGER IF NOT EXISTS trg_records_sum_del AFTER DELETE ON records BEGIN {_summary_delta('OLD',-1)} END",
+  # only the columns the summaries read: co2 backfills and remark edits skip the upserts
+  "trg_records_sum_upd": f"""CREATE TRIGGER IF NOT EXISTS trg_records_sum_upd
+          AFTER UPDATE OF {','.join(_SUMMARY_COLS)} ON records BEGIN
+          {_summary_delta('OLD',-1)} {_summary_delta('NEW',1)} END""",
+}
+
+def _summary_add(src, sign):
+    # set version of _summary_delta: adds (+1) or removes (-1) every row of the SELECT src
+    return [
+      f"""INSERT INTO sum_project_month (project, fund, month, trips, spend, days)
+          SELECT COALESCE(r.project,''), COALESCE(r.fund,''), COALESCE(substr(r.departure_date,1,7),''),
+                 {sign}*COUNT(*), {sign}*SUM(COALESCE(r.final_fare,0)), {sign}*SUM({_days('r')})
+          FROM ({src}) r WHERE true GROUP BY 1,2,3
+          ON CONFLICT(project, fund, month) DO UPDATE SET
+            trips=trips+excluded.trips, spend=spend+excluded.spend, days=days+excluded.days""",
+      f"""INSERT INTO sum_traveler (traveler, trips, spend, days)
+          SELECT COALESCE(r.traveler,''), {sign}*COUNT(*), {sign}*SUM(COALESCE(r.final_fare,0)), {sign}*SUM({_days('r')})
+          FROM ({src}) r WHERE true GROUP BY 1
+          ON CONFLICT(traveler) DO UPDATE SET
+            trips=trips+excluded.trips, spend=spend+excluded.spend, days=days+excluded.days""",
+      f"""INSERT INTO sum_class (travel_class, trips, fares, fare_total)
+          SELECT COALESCE(r.travel_class,''), {sign}*COUNT(*), {sign}*COUNT(r.final_fare), {sign}*SUM(COALESCE(r.final_fare,0))
+          FROM ({src}) r WHERE true GROUP BY 1
+          ON CONFLICT(travel_class) DO UPDATE SET
+            trips=trips+excluded.trips, fares=fares+excluded.fares, fare_total=fare_total+excluded.fare_total""",
+    ]
+
+_SUMMARY_REBUILD = ["DELETE FROM sum_project_month", "DELETE FROM sum_traveler", "DELETE FROM sum_class",
+  f"""INSERT INTO sum_project_month
+      SELECT COALESCE(project,''), COALESCE(fund,''), COALESCE(substr(departure_date,1,7),''),
+             COUNT(*), SUM(COALESCE(final_fare,0)), SUM({_days('records')})
+      FROM records GROUP BY 1,2,3""",
+  f"""INSERT INTO sum_traveler
+      SELECT COALESCE(traveler,''), COUNT(*), SUM(COALESCE(final_fare,0)), SUM({_days('records')})
+      FROM records GROUP BY 1""",
+  """INSERT INTO sum_class
+      SELECT COALESCE(travel_class,''), COUNT(*), COUNT(final_fare), SUM(COALESCE(final_fare,0))
+      FROM records GROUP BY 1""",
+]
+
+_MEETING_REBUILD = [
+  """UPDATE meetings SET
+       authorised_chf=(SELECT COALESCE(SUM(chf),0) FROM meeting_lines l WHERE l.mf=meetings.mf AND l.kind='authorised'),
+       effective_chf =(SELECT COALESCE(SUM(chf),0) FROM meeting_lines l WHERE l.mf=meetings.mf AND l.kind='effective')""",
+  "DELETE FROM sum_meeting_fund",
+  """INSERT INTO sum_meeting_fund
+      SELECT COALESCE(project,''), COALESCE(fund,''), COUNT(*), SUM(authorised_chf), SUM(effective_chf)
+      FROM meetings GROUP BY 1,2""",
+]
+
+# rows carrying a ticket or invoice number are unique on the pair; trips saved from
+# the app without either (NULL) are left out of the index
+TICKET_KEY = "(eticket_number<>'' OR airplus_invoice<>'')"
+
+# --- meetings ledger (see meetings.py): totals kept by triggers, like the trip summaries ---
+def _line_delta(r, sign):
+    # cost line r added (+1) or removed (-1): its meeting and that meeting's project/fund row
+    a = f"{sign}*(CASE WHEN {r}.kind='authorised' THEN COALESCE({r}.chf,0) ELSE 0 END)"
+    e = f"{sign}*(CASE WHEN {r}.kind='effective' THEN COALESCE({r}.chf,0) ELSE 0 END)"
+    return f"""
+      UPDATE meetings SET authorised_chf=authorised_chf+{a}, effective_chf=effective_chf+{e} WHERE mf={r}.mf;
+      INSERT INTO sum_meeting_fund (project, fund, meetings, authorised, effective)
+      SELECT COALESCE(project,''), COALESCE(fund,''), 0, {a}, {e} FROM meetings WHERE mf={r}.mf
+      ON CONFLICT(project, fund) DO UPDATE SET
+        authorised=authorised+excluded.authorised, effective=effective+excluded.effective;"""
+
+def _meeting_delta(r, sign):
+    # meeting r (with its current totals) counted in (+1) or out of (-1) its project/fund row
+    return f"""
+      INSERT INTO sum_meeting_fund (project, fund, meetings, authorised, effective)
+      VALUES (COALESCE({r}.project,''), COALESCE({r}.fund,''), {sign}, {sign}*{r}.authorised_chf, {sign}*{r}.effective_chf)
+      ON CONFLICT(project, fund) DO UPDATE SET meetings=meetings+excluded.meetings,
+        authorised=authorised+excluded.authorised, effective=effective+excluded.effective;"""
+
+# --- full-text search over records: an external-content FTS5 index on the columns
+# people look trips up by, kept in step by triggers like the summaries ---
+SEARCH_COLS = ["traveler","ta","itinerary","eticket_number","airplus_invoice","remarks"]
+SEARCH_WEIGHTS = (10, 8, 4, 8, 8, 1)   # bm25 weight per column: a name or number beats a remark
+BEST_MATCH = "Best match"
+RANK_MAX   = 20_000   # bm25 scores every match: broader searches are listed newest first
+
+def _fts_row(r, delete=False):
+    cols = ",".join(SEARCH_COLS)
+    vals = ",".join(f"{r}.{c}" for c in SEARCH_COLS)
+    if delete:
+        return f"INSERT INTO records_fts (records_fts, rowid, {cols}) VALUES ('delete', {r}.id, {vals});"
+    return f"INSERT INTO records_fts (rowid, {cols}) VALUES ({r}.id, {vals});"
+
+_FTS_TRIGGERS = {
+  "trg_records_fts_ins": f"CREATE TRIGGER IF NOT EXISTS trg_records_fts_ins AFTER INSERT ON records BEGIN {_fts_row('NEW')} END",
+  "trg_records_fts_del": f"CREATE TRIGGER IF NOT EXISTS trg_records_fts_del AFTER DELETE ON records BEGIN {_fts_row('OLD', True)} END",
+  "trg_records_fts_upd": f"""CREATE TRIGGER IF NOT EXISTS trg_records_fts_upd
+          AFTER UPDATE OF {','.join(SEARCH_COLS)} ON records BEGIN
+          {_fts_row('OLD', True)} {_fts_row('NEW')} END""",
+}
+
+def _fts_add(src, delete=False):
+    # set version of _fts_row for every row of the SELECT src (its columns as stored)
+    cols = ",".join(SEARCH_COLS)
+    if delete:
+        return f"INSERT INTO records_fts (records_fts, rowid, {cols}) SELECT 'delete', id, {cols} FROM ({src})"
+    return f"INSERT INTO records_fts (rowid, {cols}) SELECT id, {cols} FROM ({src})"
+
+# schema changes after the base table; PRAGMA user_version counts the ones applied
+TICKET_INDEX = ("CREATE UNIQUE INDEX IF NOT EXISTS ux_records_ticket "
+                f"ON records(eticket_number, airplus_invoice) WHERE {TICKET_KEY}")
+# every copy of a ticket/invoice pair but the newest
+_TICKET_DUPES = f"""SELECT * FROM records WHERE {TICKET_KEY} AND id NOT IN (
+    SELECT MAX(id) FROM records WHERE {TICKET_KEY} GROUP BY eticket_number, airplus_invoice)"""
+
+MIGRATIONS = [
+  [ # 1: dashboard summaries
+    """CREATE TABLE IF NOT EXISTS sum_project_month (
+         project TEXT, fund TEXT, month TEXT, trips INTEGER, spend REAL, days INTEGER,
+         PRIMARY KEY (project, fund, month))""",
+    """CREATE TABLE IF NOT EXISTS sum_traveler (
+         traveler TEXT PRIMARY KEY, trips INTEGER, spend REAL, days INTEGER)""",
+    """CREATE TABLE IF NOT EXISTS sum_class (
+         travel_class TEXT PRIMARY KEY, trips INTEGER, fares INTEGER, fare_total REAL)""",
+    *_SUMMARY_TRIGGERS.values(),
+    *_SUMMARY_REBUILD,
+  ],
+  [ # 2: receipt index (files live content-addressed on disk, see receipts.py)
+    """CREATE TABLE IF NOT EXISTS receipts (
+         id INTEGER PRIMARY KEY AUTOINCREMENT,
+         sha256 TEXT NOT NULL, name TEXT, size INTEGER,
+         ta TEXT, kind TEXT, row_ref INTEGER, created_at TEXT)""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_receipts_ref ON receipts(sha256, ta, kind, row_ref)",
+    "CREATE INDEX IF NOT EXISTS ix_receipts_ta ON receipts(ta, kind, row_ref)",
+  ],
+  [ # 3: import bookkeeping. The ticket/invoice unique index bulk imports upsert on is
+    # created by migrate, or by dedupe_tickets (`cli.py dedupe`) when older copies of a
+    # pair are still stored; those are moved to records_dupes_removed, never dropped here
+    "CREATE TABLE IF NOT EXISTS records_dupes_removed AS SELECT *, '' AS removed_at FROM records WHERE false",
+    """CREATE TABLE IF NOT EXISTS imports (
+         source TEXT PRIMARY KEY, signature TEXT, rows_done INTEGER,
+         started_at TEXT, finished_at TEXT)""",
+  ],
+  [ # 4: summary update trigger limited to the columns it aggregates
+    "DROP TRIGGER IF EXISTS trg_records_sum_upd",
+    _SUMMARY_TRIGGERS["trg_records_sum_upd"],
+  ],
+  [ # 5: meetings ledger: meetings by MF #, authorised/effective cost lines, POs
+    """CREATE TABLE IF NOT EXISTS meetings (
+         mf TEXT PRIMARY KEY NOT NULL, name TEXT, location TEXT, project TEXT, fund TEXT,
+         pax INTEGER, participants TEXT, created_at TEXT, updated_at TEXT,
+         authorised_chf REAL NOT NULL DEFAULT 0, effective_chf REAL NOT NULL DEFAULT 0)""",
+    "CREATE INDEX IF NOT EXISTS ix_meetings_project ON meetings(project, fund)",
+    """CREATE TABLE IF NOT EXISTS meeting_lines (
+         id INTEGER PRIMARY KEY AUTOINCREMENT, mf TEXT NOT NULL,
+         kind TEXT NOT NULL CHECK (kind IN ('authorised','effective')),
+         category TEXT, currency TEXT, qty REAL, unit_amount REAL, amount REAL,
+         chf REAL, details TEXT)""",
+    "CREATE INDEX IF NOT EXISTS ix_meeting_lines_mf ON meeting_lines(mf, kind)",
+    """CREATE TABLE IF NOT EXISTS meeting_pos (
+         id INTEGER PRIMARY KEY AUTOINCREMENT, mf TEXT NOT NULL, po TEXT NOT NULL,
+         order_date TEXT, status TEXT, UNIQUE (mf, po))""",
+    """CREATE TABLE IF NOT EXISTS sum_meeting_fund (
+         project TEXT, fund TEXT, meetings INTEGER, authorised REAL, effective REAL,
+         PRIMARY KEY (project, fund))""",
+    f"CREATE TRIGGER IF NOT EXISTS trg_mline_ins AFTER INSERT ON meeting_lines BEGIN {_line_delta('NEW',1)} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_mline_del AFTER DELETE ON meeting_lines BEGIN {_line_delta('OLD',-1)} END",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_mline_upd AFTER UPDATE OF mf, kind, chf ON meeting_lines BEGIN
+          {_line_delta('OLD',-1)} {_line_delta('NEW',1)} END""",
+    f"CREATE TRIGGER IF NOT EXISTS trg_meeting_ins AFTER INSERT ON meetings BEGIN {_meeting_delta('NEW',1)} END",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_meeting_del AFTER DELETE ON meetings BEGIN {_meeting_delta('OLD',-1)}
+          DELETE FROM meeting_lines WHERE mf=OLD.mf; DELETE FROM meeting_pos WHERE mf=OLD.mf; END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_meeting_upd AFTER UPDATE OF project, fund ON meetings BEGIN
+          {_meeting_delta('OLD',-1)} {_meeting_delta('NEW',1)} END""",
+  ],
+  [ # 6: full-text search index (prefix tables for 2- and 3-character searches)
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5 (
+         {', '.join(SEARCH_COLS)}, content='records', content_rowid='id',
+         tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    *_FTS_TRIGGERS.values(),
+    "INSERT INTO records_fts (records_fts) VALUES ('rebuild')",
+  ],
+  [ # 7: name and TA filters are case-insensitive prefixes (LIKE 'x%'): only NOCASE indexes serve them
+    "DROP INDEX IF EXISTS ix_records_ta",
+    "CREATE INDEX ix_records_ta ON records(ta COLLATE NOCASE)",
+    "DROP INDEX IF EXISTS ix_records_traveler",
+    "CREATE INDEX ix_records_traveler ON records(traveler COLLATE NOCASE)",
+  ],
+]
+
+def migrate(conn):
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    conn.commit()
+    if conn.execute("PRAGMA user_version").fetchone()[0] < len(MIGRATIONS): _upgrade(conn)
+    # an import stopped before its closing rebuild leaves the search triggers dropped
+    have = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN "
+                        f"({','.join('?'*len(_FTS_TRIGGERS))})", tuple(_FTS_TRIGGERS)).fetchone()[0]
+    if have < len(_FTS_TRIGGERS): rebuild_search(conn)
+    if not ticket_keyed(conn):
+        try:
+            with conn: conn.execute(TICKET_INDEX)
+        except sqlite3.IntegrityError:
+            _log.warning("%d duplicate ticket/invoice row(s) in records; imports are blocked until "
+                         "`python cli.py dedupe` moves them to records_dupes_removed", ticket_dupes(conn))
+
+def _upgrade(conn):
+    conn.execute("BEGIN IMMEDIATE")   # another process may be migrating too
+    try:
+        v = conn.execute("PRAGMA user_version").fetchone()[0]
+        for stmts in MIGRATIONS[v:]:
+            for stmt in stmts: conn.execute(stmt)
+        conn.execute(f"PRAGMA user_version={max(v, len(MIGRATIONS))}")
+        conn.commit()
+    except Exception:
+        conn.rollback(); raise
+
+# --- ticket/invoice duplicates: removed on request only, see `cli.py dedupe` ---
+def ticket_keyed(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='ux_records_ticket'").fetchone() is not None
+
+def ticket_dupes(conn):
+    return conn.execute(f"SELECT COUNT(*) FROM ({_TICKET_DUPES})").fetchone()[0]
+
+def dedupe_tickets(conn):
+    # keeps the newest row of each pair, moves the others to records_dupes_removed and
+    # creates the unique index; returns the number of rows moved
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f"INSERT INTO records_dupes_removed SELECT *, datetime('now') FROM ({_TICKET_DUPES})")
+        n = conn.execute(f"DELETE FROM records WHERE id IN (SELECT id FROM ({_TICKET_DUPES}))").rowcount
+        conn.execute(TICKET_INDEX)
+        conn.commit()
+    except Exception:
+        conn.rollback(); raise
+    return n
+
+def rebuild_summaries(conn):
+    # every trigger-kept total recomputed from its source rows
+    with conn:
+        for stmt in (*_SUMMARY_REBUILD, *_MEETING_REBUILD): conn.execute(stmt)
+
+def rebuild_search(conn):
+    # triggers back (bulk imports drop them) and the index rebuilt from records, in one step
+    with conn:
+        for stmt in _FTS_TRIGGERS.values(): conn.execute(stmt)
+        conn.execute("INSERT INTO records_fts (records_fts) VALUES ('rebuild')")
+
+_conns, _writers = {}, {}
+_lock = threading.RLock()
+
+def init_db(db=DB_PATH):
+    # cached per database file: schema/indexes are created once per process, not per rerun
+    conn = _conns.get(db)
+    if conn is not None: return conn
+    with _lock:
+        if db not in _conns:
+            with metrics.timed("db.init_db"):
+                conn = connect(db); migrate(conn)
+            _conns[db] = conn
+        return _conns[db]
+
+# --- single writer ---
+class Writer(threading.Thread):
+    def __init__(self, db=DB_PATH):
+        super().__init__(name=f"records-writer:{db}", daemon=True)
+        self.db, self.q = db, queue.Queue()
+
+    def submit(self, sql, params=(), many=False):
+        # sql may also be a callable fn(conn) for multi-statement work (grid saves)
+        fut = Future(); self.q.put((sql, params, many, fut))
+        return fut
+
+    def run(self):
+        conn = connect(self.db)
+        while True:
+            batch = [self.q.get()]
+            while len(batch) < BATCH_MAX:
+                try: batch.append(self.q.get_nowait())
+                except queue.Empty: break
+            self._apply(conn, batch)
+
+    def _apply(self, conn, batch):
+        try:
+            with conn:   # one transaction for the whole batch
+                # opened here: sqlite3 only begins one itself before DML, so a grid save's
+                # SAVEPOINT first in the batch would start (and its RELEASE commit) its own
+                conn.execute("BEGIN IMMEDIATE")
+                res = [self._exec(conn, sql, params, many) for sql, params, many, _ in batch]
+        except Exception:
+            # replay one by one so a failing job, whatever it raises, only fails its
+            # own caller; the thread itself must keep running
+            for sql, params, many, fut in batch:
+                try:
+                    with conn:
+                        conn.execute("BEGIN IMMEDIATE")
+                        r = self._exec(conn, sql, params, many)
+                except Exception as e:
+                    fut.set_exception(e)
+                else:
+                    fut.set_result(r)   # after the commit: the caller may read right away
+            return
+        for (_,_,_,fut), r in zip(batch, res):
+            fut.set_result(r)
+
+    @staticmethod
+    def _exec(conn, sql, params, many):
+        if callable(sql): return sql(conn)
+        cur = conn.executemany(sql, params) if many else conn.execute(sql, params)
+        return cur.rowcount if many else cur.lastrowid
+
+# --- bulk writes (imports): set-based instead of row by row ---
+def bulk_upsert(conn, cols, rows, search=True):
+    # call inside a transaction. Rows are staged in a TEMP table and moved into records
+    # with one INSERT..SELECT, upserting on the ticket/invoice pair when cols carry it.
+    # The per-row summary and search triggers are dropped for that statement and the
+    # dashboard tables and search index adjusted per set instead; as the drop and
+    # re-create happen in the same transaction, other connections never see records
+    # without its summary triggers. search=False leaves the search triggers dropped and
+    # the index as it was: the caller runs rebuild_search once after its last chunk.
+    keyed = "eticket_number" in cols and "airplus_invoice" in cols
+    if keyed and not ticket_keyed(conn):
+        raise ValueError("records holds duplicate ticket/invoice rows: run `python cli.py dedupe` first")
+    names = ",".join(cols)
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS import_stage ({','.join(RECORD_COLS)})")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_ids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.import_stage")
+    conn.executemany(f"INSERT INTO temp.import_stage ({names}) VALUES ({','.join('?'*len(cols))})", rows)
+    last = conn.execute("SELECT COALESCE(MAX(id),0) FROM records").fetchone()[0]
+    hit = (f"SELECT id FROM records WHERE {TICKET_KEY} AND (eticket_number, airplus_invoice) IN"
+           " (SELECT eticket_number, airplus_invoice FROM temp.import_stage)")
+    touched = "SELECT * FROM records WHERE id IN temp.import_ids"
+    for name in (*_SUMMARY_TRIGGERS, *_FTS_TRIGGERS): conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DELETE FROM temp.import_ids")
+    sql = f"INSERT INTO records ({names}) SELECT {names} FROM temp.import_stage WHERE true"
+    if keyed:
+        conn.execute(f"INSERT INTO temp.import_ids {hit}")
+        for stmt in _summary_add(touched, -1): conn.execute(stmt)
+        if search: conn.execute(_fts_add(touched, delete=True))
+        # an empty cell in a re-import doesn't wipe a stored value
+        upd = ", ".join(f"{c}=COALESCE(excluded.{c}, {c})" for c in cols
+                        if c not in ("eticket_number", "airplus_invoice"))
+        sql += f" ON CONFLICT(eticket_number, airplus_invoice) WHERE {TICKET_KEY} DO "
+        sql += f"UPDATE SET {upd}" if upd else "NOTHING"
+    conn.execute(sql)
+    conn.execute(f"INSERT OR IGNORE INTO temp.import_ids SELECT id FROM records WHERE id>{last}")
+    for stmt in _summary_add(touched, 1): conn.execute(stmt)
+    if search: conn.execute(_fts_add(touched))
+    for stmt in (*_SUMMARY_TRIGGERS.values(), *(_FTS_TRIGGERS.values() if search else ())): conn.execute(stmt)
+
+def writer(db=DB_PATH):
+    w = _writers.get(db)
+    if w is not None: return w
+    with _lock:
+        if db not in _writers:
+            init_db(db)
+            w = Writer(db); w.start()
+            _writers[db] = w
+        return _writers[db]
+
+def insert_record(rec, db=DB_PATH):
+    # rec: {column: value}; returns a Future with the new row id
+    cols = [c for c in RECORD_COLS if c in rec]
+    sql = f"INSERT INTO records ({','.join(cols)}) VALUES ({','.join('?'*len(cols))})"
+    return writer(db).submit(sql, tuple(rec[c] for c in cols))
+
+EDITABLE = [c for c in RECORD_COLS if c!="created_at"]
+
+def save_edits(shown, state, db=DB_PATH):
+    # data_editor deltas for a page of records (see grid_edits); Future with the rows written,
+    # or grid_edits.Conflict when one of them changed since the page was loaded
+    return writer(db).submit(lambda conn: grid_edits.apply(conn, "records", "id", shown, state, EDITABLE))
+
+# --- records browser: filters, sort and pagination pushed down to SQLite ---
+SORTABLE = {"Newest first":("id","DESC"), "Departure ↓":("departure_date","DESC"),
+            "Departure ↑":("departure_date","ASC"), "Traveler A→Z":("traveler","ASC"),
+            "TA":("ta","ASC"), "Project":("project","ASC")}
+NOCASE = {"traveler", "ta"}   # sorted and compared as their indexes are
+
+def _key(col):
+    return f"{col} COLLATE NOCASE" if col in NOCASE else col
+
+def match_query(text):
+    # search box text -> FTS5 query: every word must match, as a prefix
+    # ("sam gva" finds "Samir ... GVA-BEY-GVA"); None when nothing is searchable
+    terms = [t.replace('"', '') for t in (text or "").split()]
+    terms = [f'"{t}"*' for t in terms if re.search(r"\w", t)]
+    return " ".join(terms) or None
+
+def where_clause(traveler=None, ta=None, project=None, dep_from=None, dep_to=None, q=None, walk=False):
+    # traveler and TA are prefixes on their NOCASE indexes (words inside a name: the search
+    # box). walk=True checks the name on each row instead (see page_records)
+    w, p = [], []
+    if (m := match_query(q)):
+        w.append("id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)"); p.append(m)
+    if traveler: w.append(("+" if walk else "")+"traveler LIKE ?"); p.append(f"{traveler}%")
+    if ta:       w.append("ta LIKE ?");            p.append(f"{ta}%")
+    if project:  w.append("project = ?");          p.append(project)
+    if dep_from: w.append("departure_date >= ?");  p.append(str(dep_from))
+    if dep_to:   w.append("departure_date <= ?");  p.append(str(dep_to))
+    return w, p
+
+@metrics.timed("records.count")
+def count_records(conn, **filters):
+    if (m := match_query(filters.get("q"))) and not any(v for k,v in filters.items() if k!="q"):
+        # search alone: counted on the index, records not touched
+        return conn.execute("SELECT COUNT(*) FROM records_fts WHERE records_fts MATCH ?", (m,)).fetchone()[0]
+    w, p = where_clause(**filters)
+    sql = "SELECT COUNT(*) FROM records" + (" WHERE "+" AND ".join(w) if w else "")
+    return conn.execute(sql, p).fetchone()[0]
+
+def _after(col, direction, key):
+    # keyset condition on (col, id); SQLite puts NULLs first ASC and last DESC
+    val, rid = key
+    if col=="id":
+        return ("id < ?" if direction=="DESC" else "id > ?"), [rid]
+    op, k = ("<" if direction=="DESC" else ">"), _key(col)
+    if val is None:
+        if direction=="DESC": return f"({col} IS NULL AND id < ?)", [rid]
+        return f"(({col} IS NULL AND id > ?) OR {col} IS NOT NULL)", [rid]
+    tail = f" OR {col} IS NULL" if direction=="DESC" else ""
+    return f"({k} {op} ? OR ({k} = ? AND id {op} ?){tail})", [val, val, rid]
+
+def _ranked(filters):
+    # records matching the search text with their bm25 score (lower is better), other filters applied
+    m = match_query(filters.get("q"))
+    w, p = where_clause(**{**filters, "q": None})
+    sql = f"""SELECT * FROM (SELECT records.*, bm25(records_fts, {','.join(map(str, SEARCH_WEIGHTS))}) AS rank
+               FROM records_fts JOIN records ON records.id=records_fts.rowid
+               WHERE records_fts MATCH ?)"""
+    return sql, w, [m]+p
+
+def _walk_names(conn, col, filters):
+    # a name prefix matching a tenth of the records or more ("Sa") is cheaper to check
+    # while walking the sort order than to collect and sort; both counts are index-only.
+    # TA prefixes carry the year, which follows departure order, so they stay on their index
+    name = filters.get("traveler")
+    if not name or col=="traveler" or any(filters.get(k) for k in ("q", "ta", "project")): return False
+    hits = conn.execute("SELECT COUNT(*) FROM records WHERE traveler LIKE ?", (f"{name}%",)).fetchone()[0]
+    return hits*10 >= (conn.execute("SELECT MAX(id) FROM records").fetchone()[0] or 0)
+
+@metrics.timed("records.page")
+def page_records(conn, sort="Newest first", after=None, limit=50, **filters):
+    # returns (columns, rows as dicts, cursor for the next page or None).
+    # BEST_MATCH orders a search by relevance; without search text it is newest first.
+    ranked = sort==BEST_MATCH and match_query(filters.get("q"))
+    col, direction = ("rank", "ASC") if ranked else SORTABLE.get(sort, SORTABLE["Newest first"])
+    if ranked:
+        sql, w, p = _ranked(filters)
+    else:
+        w, p = where_clause(**filters, walk=_walk_names(conn, col, filters)); sql = "SELECT * FROM records"
+    if after is not None:
+        cond, extra = _after(col, direction, after); w.append(cond); p += extra
+    order = f"id {direction}" if col=="id" else f"{_key(col)} {direction}, id {direction}"
+    if w: sql += " WHERE "+" AND ".join(w)
+    cur = conn.execute(sql+f" ORDER BY {order} LIMIT ?", p+[limit+1])
+    cols = [d[0] for d in cur.description]
+    rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    nxt = None
+    if len(rows) > limit:
+        rows = rows[:limit]; nxt = (rows[-1][col], rows[-1]["id"])
+    if ranked:
+        cols.remove("rank")
+        for r in rows: del r["rank"]
+    return cols, rows, nxt
+
+def column_types(conn, table="records"):
+    return {r[1]: r[2] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+def filtered_query(**filters):
+    # full filtered result in display order, for exports
+    w, p = where_clause(**filters)
+    return "SELECT * FROM records" + (" WHERE "+" AND ".join(w) if w else "") + " ORDER BY id DESC", p
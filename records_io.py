@@ -0,0 +1,162 @@
+# Records import: historical CSV/xlsx files (AirPlus invoice exports, old
+# spreadsheets) loaded into the records table outside the UI. Files are read in
+# chunks, headers mapped onto RECORD_COLS, and each chunk upserted in its own
+# transaction (records_db.bulk_upsert): a row whose ticket/invoice pair is already
+# stored updates it instead of adding a duplicate. Progress is committed with
+# each chunk in the imports table, so an interrupted import resumes where it stopped.
+# A large file leaves the search index out of the chunks and rebuilds it once at the
+# end (or the next records_db.migrate does, if the import never got there).
+import os, re
+from datetime import datetime
+import pandas as pd
+import records_db, metrics
+
+CHUNK     = 20000
+CACHE_KIB = 200_000   # page cache of the import connection: the record indexes stay in memory
+
+# header aliases seen in AirPlus exports and older spreadsheets (normalized form)
+ALIASES = {
+    "passenger":"traveler", "passenger_name":"traveler", "traveller":"traveler", "name":"traveler",
+    "ta_number":"ta", "ta_no":"ta", "travel_authorization":"ta",
+    "invoice":"airplus_invoice", "invoice_number":"airplus_invoice", "invoice_no":"airplus_invoice",
+    "ticket":"eticket_number", "ticket_number":"eticket_number", "ticket_no":"eticket_number",
+    "e_ticket":"eticket_number", "eticket":"eticket_number", "document_number":"eticket_number",
+    "routing":"itinerary", "route":"itinerary",
+    "departure":"departure_date", "travel_date":"departure_date", "return":"return_date",
+    "class":"travel_class", "service_class":"travel_class",
+    "fare":"airfare_ticket", "ticket_amount":"airfare_ticket", "total_amount":"final_fare",
+    "co2":"co2_tons", "booker":"booked_by",
+}
+DATE_COLS = ("departure_date", "return_date")
+KEY_COLS  = ("eticket_number", "airplus_invoice")
+
+def _norm(col):
+    return re.sub(r"[^a-z0-9]+", "_", str(col).strip().lower()).strip("_")
+
+def map_columns(cols, extra=None):
+    # {file column: record column} for the columns we can place; extra: user overrides
+    aliases = {**ALIASES, **{_norm(k):v for k,v in (extra or {}).items()}}
+    out, taken = {}, set()
+    for c in cols:
+        n = _norm(c); target = aliases.get(n, n)
+        if target in records_db.RECORD_COLS and target not in taken:
+            out[c] = target; taken.add(target)
+    return out
+
+def _count_lines(path):
+    with open(path, "rb") as f:
+        return sum(buf.count(b"\n") for buf in iter(lambda: f.read(1<<20), b""))
+
+def read_chunks(path, chunk=CHUNK, skip=0):
+    # (total rows, iterator of raw string DataFrames of at most `chunk` rows), first `skip` rows left out
+    if path.lower().endswith(".csv"):
+        total = max(_count_lines(path)-1, 0)
+        return total, pd.read_csv(path, chunksize=chunk, dtype=str, keep_default_na=False,
+                                  skiprows=range(1, skip+1))
+    # xlsx: streamed row by row (openpyxl read-only mode), never the whole sheet in memory
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    ws = wb.worksheets[0]
+    return max((ws.max_row or 1)-1, 0), _xlsx_chunks(wb, ws, chunk, skip)
+
+def _xlsx_chunks(wb, ws, chunk, skip):
+    try:
+        rows = ws.iter_rows(values_only=True)
+        head = next(rows, None)
+        if head is None: return
+        cols = [f"Unnamed: {i}" if h is None else str(h) for i, h in enumerate(head)]
+        part, seen = [], 0
+        for r in rows:
+            if all(v is None or v=="" for v in r): continue   # blank lines, as read_excel drops them
+            seen += 1
+            if seen<=skip: continue
+            part.append(["" if v is None else str(v) for v in r[:len(cols)]])
+            if len(part)==chunk:
+                yield pd.DataFrame(part, columns=cols); part = []
+        if part: yield pd.DataFrame(part, columns=cols)
+    finally:
+        wb.close()
+
+def _iso_dates(s):
+    # ISO and Excel datetimes keep their date part; dd.mm.yyyy and dd/mm/yyyy are parsed
+    # with a fixed format (vectorized), only the rest goes through the slow guesser;
+    # anything unparseable is kept as typed
+    iso = s.str.match(r"\d{4}-\d{2}-\d{2}")
+    out = s.where(~iso, s.str[:10])
+    rest = ~iso & (s!="")
+    if rest.any():
+        d = pd.Series(pd.NaT, index=s.index)
+        for fmt in ("%d.%m.%Y", "%d/%m/%Y"):
+            todo = rest & d.isna()
+            if not todo.any(): break
+            d[todo] = pd.to_datetime(s[todo], format=fmt, errors="coerce")
+        todo = rest & d.isna()
+        if todo.any():
+            d[todo] = pd.to_datetime(s[todo], dayfirst=True, errors="coerce", format="mixed")
+        out = out.where(d.isna(), d.dt.strftime("%Y-%m-%d"))
+    return out
+
+def _clean(part, cols):
+    part = part[list(cols)].rename(columns=cols)
+    for c in part.columns:
+        part[c] = part[c].str.strip()
+    for c in DATE_COLS:
+        if c in part: part[c] = _iso_dates(part[c])
+    if any(c in part for c in KEY_COLS):
+        for c in KEY_COLS:
+            # numbers read back from Excel lose their ".0"; a missing half of the key is ''
+            part[c] = part[c].str.replace(r"\.0$", "", regex=True) if c in part else ""
+    return part
+
+def _rows(part):
+    # empty cells become NULL, except the ticket key which stays '' so the pair stays comparable
+    cols = [part[c].tolist() if c in KEY_COLS else part[c].where(part[c]!="", None).tolist()
+            for c in part.columns]
+    return list(zip(*cols))
+
+def _signature(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def import_file(path, db=records_db.DB_PATH, chunk=CHUNK, columns=None, progress=None, restart=False):
+    # returns (rows processed, rows added); progress(done, total) after each chunk.
+    # A file only part-imported (same size and mtime) continues after its last chunk.
+    source, sig = os.path.abspath(path), _signature(path)
+    conn = records_db.connect(db); records_db.migrate(conn)
+    conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+    try:
+        prev = conn.execute("SELECT signature, rows_done, finished_at FROM imports WHERE source=?",
+                            (source,)).fetchone()
+        done = prev[1] if prev and prev[0]==sig and not prev[2] and not restart else 0
+        with conn:
+            conn.execute("""INSERT INTO imports (source, signature, rows_done, started_at, finished_at)
+                            VALUES (?,?,?,?,NULL) ON CONFLICT(source) DO UPDATE SET
+                            signature=excluded.signature, rows_done=excluded.rows_done,
+                            started_at=excluded.started_at, finished_at=NULL""",
+                         (source, sig, done, datetime.now().isoformat()))
+        before = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        total, parts = read_chunks(path, chunk, skip=done)
+        # the search index is rebuilt once at the end, unless the file is small next to
+        # what is stored: a rebuild reads every record, so then it's kept up per chunk
+        rebuild = total-done >= before
+        cols = None
+        n = 0
+        with metrics.timed("records.import", rows=total-done):
+            for part in parts:
+                if cols is None:
+                    cols = map_columns(part.columns, columns)
+                    if not cols: raise ValueError(f"{path}: no column matches the records table")
+                part = _clean(part, cols)
+                rows = _rows(part)
+                with conn:   # chunk and its checkpoint commit together
+                    records_db.bulk_upsert(conn, list(part.columns), rows, search=not rebuild)
+                    conn.execute("UPDATE imports SET rows_done=? WHERE source=?", (done+n+len(rows), source))
+                n += len(rows)
+                if progress: progress(done+n, total)
+            if rebuild: records_db.rebuild_search(conn)
+        with conn:
+            conn.execute("UPDATE imports SET finished_at=? WHERE source=?", (datetime.now().isoformat(), source))
+        added = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]-before
+    finally:
+        conn.close()
+    return n, added
@@ -0,0 +1,16 @@
+# Tests run against the flat modules at the repository root, from any directory;
+# data files (airports.csv, exchange_rates.csv, the DSA workbook) are read from there.
+import os, sys
+import pytest
+
+os.environ.setdefault("METRICS_LOG", "")   # no metrics.jsonl from test runs
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(autouse=True)
+def _repo_cwd(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path/"records.db")
@@ -0,0 +1,45 @@
+# the Amadeus client against the local stub the benchmarks use
+import os, sys, time
+import pytest
+import amadeus
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import amadeus_stub
+
+@pytest.fixture
+def stub():
+    url, srv = amadeus_stub.start()
+    yield url, amadeus_stub.Handler
+    srv.shutdown(); srv.server_close()
+
+def _client(url, **kw):
+    return amadeus.Client(url, "id", "secret", session=amadeus.make_session(backoff=0), **kw)
+
+def test_token_is_cached_and_refreshed_on_401(stub):
+    url, h = stub
+    c = _client(url)
+    assert c.search_flights("GVA", "BEY", "2026-11-02", "ECONOMY", max=3)
+    assert c.search_flights("GVA", "BEY", "2026-11-03", "ECONOMY", max=3)
+    assert h.hits["token"]==1
+    h.fail.append(401)   # the token was revoked: one new token, the search is repeated
+    assert c.search_flights("GVA", "BEY", "2026-11-04", "ECONOMY", max=3)
+    assert h.hits["token"]==2
+    assert h.auth[-2:]==["Bearer stub-token-1", "Bearer stub-token-2"]
+
+def test_server_errors_are_retried(stub):
+    url, h = stub
+    c = _client(url)
+    h.fail += [503, 502]
+    assert len(c.search_flights("GVA", "CAI", "2026-11-02", "ECONOMY", max=4))==4
+    assert h.hits["search"]==3
+    h.fail += [500]*4   # past the retry budget: no offers, no exception
+    assert c.search_flights("GVA", "CAI", "2026-11-02", "ECONOMY")==[]
+
+def test_requests_are_rate_limited(stub):
+    url, h = stub
+    c = _client(url, limiter=amadeus.TokenBucket(rate=20, burst=1))
+    t0 = time.monotonic()
+    for day in range(1, 6):
+        c.search_flights("GVA", "BEY", f"2026-11-0{day}", "ECONOMY", max=1)
+    assert h.hits["search"]==5
+    assert time.monotonic()-t0 >= 4/20   # the first goes at once, then one per 1/rate
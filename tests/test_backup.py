@@ -0,0 +1,48 @@
+import os
+from datetime import date, timedelta
+import backup, records_db
+
+DAY = date(2026, 3, 2)
+
+def _add(db, *names):
+    conn = records_db.init_db(db)
+    with conn: conn.executemany("INSERT INTO records (traveler) VALUES (?)", [(n,) for n in names])
+
+def _files(bdir):
+    return sorted(f for f in os.listdir(bdir) if f.endswith(".xlsx"))
+
+def test_incrementals_follow_the_watermark_within_a_day(db, tmp_path):
+    bdir = str(tmp_path/"backups")
+    _add(db, "A", "B", "C")
+    assert backup.backup_excel(db, bdir, today=DAY).endswith("travel_records_2026-03-02.xlsx")
+    assert backup.load_state(bdir)["last_id"]==3
+    # later the same day: only the new rows, and nothing at all when there are none
+    _add(db, "D", "E")
+    assert backup.backup_excel(db, bdir, today=DAY).endswith("_incr_4-5.xlsx")
+    assert backup.backup_excel(db, bdir, today=DAY) is None
+    _add(db, "F")
+    assert backup.backup_excel(db, bdir, today=DAY+timedelta(days=1)).endswith("_incr_6-6.xlsx")
+    assert _files(bdir)==["travel_records_2026-03-02.xlsx", "travel_records_2026-03-02_incr_4-5.xlsx",
+                          "travel_records_2026-03-03_incr_6-6.xlsx"]
+    assert backup.load_state(bdir)["last_id"]==6
+
+def test_a_full_snapshot_is_due_every_full_every_days(db, tmp_path):
+    bdir = str(tmp_path/"backups")
+    _add(db, "A")
+    backup.backup_excel(db, bdir, today=DAY)
+    _add(db, "B")
+    later = DAY+timedelta(days=backup.FULL_EVERY)
+    assert backup.backup_excel(db, bdir, today=later).endswith(f"travel_records_{later.isoformat()}.xlsx")
+
+def test_prune_keeps_the_newest_full_snapshots_and_their_incrementals(tmp_path):
+    days = [(DAY+timedelta(days=7*i)).isoformat() for i in range(10)]
+    for i, d in enumerate(days):
+        for f in (f"travel_records_{d}.xlsx", f"travel_records_{d}_incr_{i*10+1}-{i*10+9}.xlsx"):
+            (tmp_path/f).write_bytes(b"")
+    (tmp_path/"notes.txt").write_bytes(b"")
+    backup.prune(str(tmp_path), 8)
+    left = _files(tmp_path)
+    assert [f for f in left if "_incr_" not in f]==[f"travel_records_{d}.xlsx" for d in days[2:]]
+    assert [f for f in left if "_incr_" in f]==[f"travel_records_{d}_incr_{i*10+1}-{i*10+9}.xlsx"
+                                                for i, d in enumerate(days) if i>=2]
+    assert (tmp_path/"notes.txt").exists()
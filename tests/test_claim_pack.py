@@ -0,0 +1,42 @@
+import io
+from fpdf import FPDF
+from PIL import Image
+from PyPDF2 import PdfReader
+import claim_pack, receipts
+
+PACK = {"ta":"TA-1/26", "name":"A. Traveler", "authorization":{"Purpose":"Workshop"},
+        "missions":[{"Country":"Kenya", "City":"Nairobi", "Days":4, "Total DSA":400.0}],
+        "expenses":[{"Submission":"2026-10-10", "Category":"Taxi", "Currency":"EUR", "Amount":20, "CHF":19.0}]}
+
+def _stored(data, store):
+    return receipts.store_file(io.BytesIO(data), store)[0]
+
+def _pdf(pages):
+    pdf = FPDF()
+    for _ in range(pages): pdf.add_page()
+    return pdf.output(dest="S").encode("latin-1")
+
+def _png(color):
+    buf = io.BytesIO(); Image.new("RGB", (20, 20), color).save(buf, "PNG")
+    return buf.getvalue()
+
+def test_pack_merges_receipts_once_and_skips_mail(tmp_path):
+    store = str(tmp_path/"store")
+    hotel, red, blue = _stored(_pdf(2), store), _stored(_png("red"), store), _stored(_png("blue"), store)
+    mail = _stored(b"not a pdf", store)
+    pack = dict(PACK, receipts=[
+        {"sha256":hotel, "name":"hotel.PDF"},
+        {"sha256":hotel, "name":"hotel.pdf"},       # same file linked to two rows
+        {"sha256":red,   "name":"taxi.jpg"},
+        {"sha256":blue,  "name":"lunch.png"},
+        {"sha256":mail,  "name":"approval.msg"},
+        {"sha256":"0"*64, "name":"missing.pdf"}])
+    dest = claim_pack.build_pack(pack, str(tmp_path/"out"), store)
+    assert dest.endswith("claim_pack_TA-1_26.pdf")
+    # 3 content pages + 2 hotel pages + one page per image; .msg and missing files skipped
+    assert len(PdfReader(dest).pages) == 3 + 2 + 2
+    assert not list((tmp_path/"out").glob("*.part"))
+
+def test_pack_without_receipts(tmp_path):
+    dest = claim_pack.build_pack(dict(PACK), str(tmp_path), str(tmp_path/"store"))
+    assert len(PdfReader(dest).pages) == 3
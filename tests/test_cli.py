@@ -0,0 +1,55 @@
+import pandas as pd
+import cli, records_db
+
+MISSIONS = pd.DataFrame([
+    {"Name":"A", "TA":"T1", "Country":"Kenya", "City":"Nairobi", "Dep Date":"2026-03-02", "Dep Time":"08:00",
+     "Ret Date":"2026-03-05", "Ret Time":"20:00"},
+    {"Name":"B", "TA":"T2", "Country":"Nowhere", "City":"Atlantis", "Dep Date":"2026-03-02", "Dep Time":"08:00",
+     "Ret Date":"2026-03-02", "Ret Time":"20:00"}])
+
+def test_dsa_writes_the_computed_file(tmp_path, capsys):
+    src, out = str(tmp_path/"missions.csv"), str(tmp_path/"dsa.csv")
+    MISSIONS.to_csv(src, index=False)
+    assert cli.main(["dsa", src, out, "--workers", "1"])==0
+    res = pd.read_csv(out)
+    assert res["Days"].tolist()==[4, 1] and res["Rate found"].tolist()==[True, False]
+    assert "2 mission(s)" in capsys.readouterr().out
+
+def test_dsa_without_a_workbook_says_so(tmp_path, monkeypatch, capsys):
+    src = str(tmp_path/"missions.csv")
+    MISSIONS.to_csv(src, index=False)
+    monkeypatch.chdir(tmp_path)
+    assert cli.main(["dsa", src, "out.csv"])==1
+    assert "no DSA rate workbook" in capsys.readouterr().err
+    assert not (tmp_path/"out.csv").exists()
+
+def test_bad_input_is_an_error_not_a_traceback(tmp_path, capsys):
+    src = str(tmp_path/"missions.csv")
+    MISSIONS.drop(columns="City").to_csv(src, index=False)
+    assert cli.main(["dsa", src, str(tmp_path/"out.csv")])==1
+    assert "missing column(s): City" in capsys.readouterr().err
+    assert cli.main(["dsa", str(tmp_path/"none.csv"), str(tmp_path/"out.csv")])==1
+
+def test_export_filters(db, tmp_path):
+    conn = records_db.init_db(db)
+    with conn:
+        conn.executemany("INSERT INTO records (traveler, project, departure_date) VALUES (?,?,?)",
+                         [("Ana", "NARD", "2025-01-10"), ("Ben", "NARD", "2024-12-01"), ("Cy", "WASH", "2025-02-01")])
+    out = str(tmp_path/"r.csv")
+    assert cli.main(["--db", db, "export", out, "--project", "NARD", "--from", "2025-01-01"])==0
+    assert pd.read_csv(out)["traveler"].tolist()==["Ana"]
+    assert cli.main(["--db", db, "export", str(tmp_path/"r.txt")])==1
+
+def test_dedupe_reports_what_it_moves(db, capsys):
+    conn = records_db.init_db(db)
+    with conn:
+        conn.execute("DROP INDEX ux_records_ticket")
+        conn.executemany("INSERT INTO records (traveler, eticket_number, airplus_invoice) VALUES (?,?,?)",
+                         [("old", "T1", "I1"), ("new", "T1", "I1")])
+    assert cli.main(["--db", db, "dedupe", "--dry-run"])==0
+    assert capsys.readouterr().out.startswith("1 older duplicate") and records_db.ticket_dupes(conn)==1
+    assert cli.main(["--db", db, "dedupe"])==0
+    assert "1 older duplicate ticket/invoice row(s) moved" in capsys.readouterr().out
+    assert records_db.ticket_keyed(conn)
+    assert cli.main(["--db", db, "dedupe"])==0
+    assert capsys.readouterr().out.startswith("no duplicate")
@@ -0,0 +1,18 @@
+import numpy as np
+import co2
+
+def test_legs_split_on_separators_only():
+    assert co2.legs("gva-bey/gva")==[("GVA","BEY"), ("BEY","GVA")]
+    assert co2.legs("GVA - BEY, CAI-GVA")==[("GVA","BEY"), ("CAI","GVA")]
+    assert co2.legs("GVA-BEY", "Round Trip")==[("GVA","BEY"), ("BEY","GVA")]
+    # words are not airports: they stay in the leg end they belong to
+    assert co2.legs("GVA-BEY via IST")==[("GVA","BEY VIA IST")]
+    assert co2.legs("BUS and GVA")==[] and co2.legs(None)==[]
+
+def test_words_and_unknown_codes_leave_the_trip_unrated():
+    t = co2.emissions(["GVA-BEY-GVA", "GVA-BEY via IST", "GVA-TOZ-BEY", "GVA-ZZZ"], ["Economy"]*4)
+    assert t[0]>0 and np.isnan(t[1:]).all()
+
+def test_unknown_names_the_offending_ends():
+    assert co2.unknown("GVA-BEY-GVA")==[]
+    assert co2.unknown("GVA-BEY via IST-ZZZ")==["BEY VIA IST", "ZZZ"]
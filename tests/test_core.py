@@ -0,0 +1,21 @@
+from datetime import date
+import pandas as pd
+import core, records_db
+
+def test_ta_numbers_count_per_traveler():
+    tas = [{"Name":"Samira Haddad"}, {"Name":"Omar Khalil"}, {"Name":"Samira Haddad"}]
+    assert core.ta_number("Samira Haddad", tas, 2026)=="TA-SHA-26-003"
+    assert core.ta_number("Cher", [], 2026)=="TA-CHE-26-001"
+    assert core.ta_number("  ", tas)==""
+
+def test_trip_record_counts_days_and_co2():
+    rec = core.trip_record("A", "Staff", "T1", "GVA-BEY-GVA", date(2026,3,2), date(2026,3,5), "Economy", 500.0)
+    assert rec["days_travelled"]==4 and rec["departure_date"]=="2026-03-02" and rec["co2_tons"]>0
+    assert set(rec) <= set(records_db.RECORD_COLS)
+    assert core.trip_record("A", "Staff", "T1", "by car", date(2026,3,2), date(2026,3,2), "Economy", 0)["co2_tons"] is None
+
+def test_expense_chf_falls_back_to_the_stored_rate():
+    df = pd.DataFrame({"Amount":[100.0, 50.0], "Currency":["CHF", "XXX"], "Rate":[1.0, 2.0],
+                       "Submission":[date(2026,3,2)]*2})
+    assert core.expense_chf(df).tolist()==[100.0, 100.0]
+    assert core.participants(" Ana \n\nBen\n")==["Ana", "Ben"]
@@ -0,0 +1,29 @@
+from datetime import date
+import numpy as np
+import currency
+
+SEED = "Code,Rate,Effective\nEUR,0.9350,2026-10-01\n"
+
+def test_added_rate_is_read_back(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # the rate files are relative: work on copies
+    (tmp_path/currency.RATE_FILE).write_text(SEED)
+    assert np.isnan(currency.rate("GBP", date(2026,10,10))[0])
+    currency.add_rate("gbp", 1.0625, date(2026,10,5))
+    assert currency.rate("GBP", date(2026,10,10))==(1.0625, date(2026,10,5))
+    assert currency.rate("EUR", date(2026,10,10))[0]==0.935
+    chf = currency.to_chf([100, 100], ["GBP", "GBP"], [date(2026,10,10), date(2026,10,1)])
+    assert chf[0]==106.25 and np.isnan(chf[1])
+
+def test_added_rates_leave_the_seed_alone_and_win_over_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path/currency.RATE_FILE).write_text(SEED)
+    currency.add_rate("EUR", 0.94, "2026-10-01")
+    assert (tmp_path/currency.RATE_FILE).read_text()==SEED
+    assert currency.rate("EUR", date(2026,10,10))==(0.94, date(2026,10,1))
+    assert (currency.rate_table()["Code"]=="EUR").sum()==1
+
+def test_add_rate_creates_the_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    currency.add_rate("USD", 0.8, "2026-01-01")
+    assert currency.rate("USD", date(2026,2,1))==(0.8, date(2026,1,1))
+    assert (tmp_path/currency.USER_RATES).exists() and not list(tmp_path.glob("*.tmp"))
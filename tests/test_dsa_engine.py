@@ -0,0 +1,16 @@
+from datetime import datetime, time
+import pandas as pd
+import dsa_engine, dsa_rates
+
+IDX = dsa_rates.DsaIndex("test", 0, ["Kenya"], {"Kenya":["Nairobi"]}, {("Kenya","Nairobi"):(100.0, 30.0, 40.0)})
+
+def test_datetime_dates_count_whole_days():
+    # dates read from xlsx come as datetimes, often with a time of day
+    missions = pd.DataFrame([
+        {"Country":"Kenya", "City":"Nairobi", "Dep Date":datetime(2026,3,2,18,45), "Dep Time":time(8,0),
+         "Ret Date":datetime(2026,3,5,9,10), "Ret Time":time(20,0)},
+        {"Country":"Kenya", "City":"Nairobi", "Dep Date":"2026-03-02", "Dep Time":"08:00",
+         "Ret Date":"2026-03-05", "Ret Time":"20:00"}])
+    res = dsa_engine.compute_dsa(missions, IDX)
+    assert res["Days"].tolist()==[4, 4]
+    assert res["Total DSA"].tolist()==[400.0, 400.0]
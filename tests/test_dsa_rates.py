@@ -0,0 +1,46 @@
+import os, shutil
+import dsa_rates
+
+WORKBOOK = "Perdiem DSA 2025 par pays.xlsx"
+
+def test_newest_workbook_wins(tmp_path):
+    assert dsa_rates.find_rate_file(tmp_path) is None
+    for year in (2024, 2026, 2025):
+        (tmp_path/f"Perdiem DSA {year} par pays.xlsx").write_bytes(b"")
+    (tmp_path/"Perdiem DSA 2027 brouillon.xlsx").write_bytes(b"")
+    assert dsa_rates.find_rate_file(tmp_path) == str(tmp_path/"Perdiem DSA 2026 par pays.xlsx")
+
+def _compiles(monkeypatch):
+    calls = []
+    real = dsa_rates.compile_index
+    monkeypatch.setattr(dsa_rates, "compile_index", lambda p: calls.append(p) or real(p))
+    return calls
+
+def test_sidecar_reused_then_invalidated(tmp_path, monkeypatch):
+    path = str(tmp_path/WORKBOOK)
+    shutil.copy(WORKBOOK, path)
+    calls = _compiles(monkeypatch)
+    monkeypatch.setattr(dsa_rates, "_cache", {})
+    first = dsa_rates.load_index(path)
+    assert calls == [path] and os.path.exists(dsa_rates._sidecar(path))
+    assert first.countries and first.rates
+
+    # a fresh process: nothing in memory, the sidecar is read back
+    dsa_rates._cache.clear()
+    assert dsa_rates.load_index(path) == first and calls == [path]
+
+    # touched workbook (same size, new mtime): the sidecar is stale
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    dsa_rates._cache.clear()
+    second = dsa_rates.load_index(path)
+    assert len(calls) == 2 and second.stamp != first.stamp
+    assert second.rates == first.rates
+
+    # grown workbook with the mtime put back: size alone invalidates it
+    with open(path, "ab") as f: f.write(b"\0")
+    os.utime(path, ns=(st.st_atime_ns, second.stamp[0]))
+    third = dsa_rates.load_index(path)
+    assert len(calls) == 3 and third.stamp == (second.stamp[0], st.st_size + 1)
+    dsa_rates._cache.clear()
+    assert dsa_rates.load_index(path) == third and len(calls) == 3
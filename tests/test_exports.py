@@ -0,0 +1,34 @@
+import io, zipfile
+import pandas as pd
+import pytest
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+import records_db, exports
+
+def download(build, name):
+    # what st.download_button does with a callable on click: run it, convert the result
+    storage = MemoryMediaFileStorage("/media")
+    mgr = MediaFileManager(storage)
+    fid = mgr.add_deferred(build, None, "test", file_name=name)
+    url = mgr.execute_deferred(fid)
+    return storage.get_file(url.rsplit("/", 1)[-1].split(".")[0]).content
+
+@pytest.mark.parametrize("fmt", exports.formats())
+def test_query_file_downloads(db, fmt):
+    conn = records_db.init_db(db)
+    with conn:
+        conn.executemany("INSERT INTO records (traveler, final_fare) VALUES (?,?)", [("Ana", 10.0), ("Ben", 20.5)])
+    sql, params = records_db.filtered_query()
+    data = download(lambda: exports.query_file(conn, sql, params, fmt, records_db.column_types(conn)), f"r.{fmt}")
+    read = {"xlsx": pd.read_excel, "csv": pd.read_csv, "parquet": pd.read_parquet}[fmt]
+    df = read(io.BytesIO(data))
+    assert sorted(df["traveler"])==["Ana", "Ben"] and df["final_fare"].sum()==30.5
+
+def test_zip_of_temp_files_downloads(tmp_path):
+    # the claim-pack "Download all" zip is built the same way (zip_files in the app)
+    (tmp_path/"a.pdf").write_bytes(b"%PDF-a")
+    def build():
+        path = exports.temp_path(".zip")
+        with zipfile.ZipFile(path, "w") as z: z.write(tmp_path/"a.pdf", "a.pdf")
+        return exports.open_temp(path)
+    assert zipfile.ZipFile(io.BytesIO(download(build, "packs.zip"))).read("a.pdf")==b"%PDF-a"
@@ -0,0 +1,17 @@
+import time
+from flight_cache import FlightCache
+
+def test_hits_stay_in_memory_until_put(tmp_path):
+    c = FlightCache(str(tmp_path/"cache.db"), ttl=60, max_entries=2)
+    c.put("a", [1]); c.put("b", [2])
+    writes = c._db.total_changes
+    assert c.get("a")[0]==[1] and c.get("a")[0]==[1]
+    assert c._db.total_changes==writes          # no disk write per hit
+    # "a" was used after "b": putting a third entry evicts "b" from disk
+    time.sleep(0.01); c.put("c", [3])
+    assert {k for k, in c._db.execute("SELECT key FROM offers")}=={"a","c"}
+
+def test_expired_entry_is_dropped(tmp_path):
+    c = FlightCache(str(tmp_path/"cache.db"), ttl=0)
+    c.put("a", [1]); time.sleep(0.01)
+    assert c.get("a") is None
@@ -0,0 +1,31 @@
+import time, threading
+from concurrent.futures import ThreadPoolExecutor
+import flight_search
+
+def _slow_search(monkeypatch, delay):
+    # one worker, a search that takes `delay`: returns the list of legs that actually ran
+    calls, lock = [], threading.Lock()
+    def search(o, d, dt, cls):
+        with lock: calls.append((o, d, dt))
+        time.sleep(delay)
+        return [], None
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(flight_search, "_pool", pool)
+    monkeypatch.setattr(flight_search, "cached_search", search)
+    return pool, calls
+
+def test_search_trip_cancels_queued_legs(monkeypatch):
+    pool, calls = _slow_search(monkeypatch, 0.3)
+    legs = [("GVA","BEY","2026-11-02"), ("BEY","CAI","2026-11-05"), ("CAI","GVA","2026-11-09")]
+    res, _ = flight_search.search_trip(legs, "ECONOMY", timeout=0.1)
+    pool.shutdown(wait=True)
+    assert [r["status"] for r in res]==["timeout"]*3
+    assert len(calls)==1   # only the leg already running went on
+
+def test_closed_calendar_cancels_the_rest(monkeypatch):
+    pool, calls = _slow_search(monkeypatch, 0.05)
+    q = [("GVA","BEY",f"2026-11-{d:02d}") for d in range(1, 11)]
+    gen = flight_search.stream_calendar(q, "ECONOMY", timeout=5)
+    next(gen); gen.close()
+    pool.shutdown(wait=True)
+    assert len(calls) < len(q)
@@ -0,0 +1,58 @@
+import copy, sqlite3
+import pandas as pd
+import pytest
+import grid_edits
+
+ITEMS = [{"name":n, "amount":float(i)} for i, n in enumerate("abcd")]
+
+def test_edits_made_over_a_kept_view_merge_into_one_state():
+    # edits kept while the grid was hidden, then more made in the editor drawn over them
+    base  = {"edited_rows": {1: {"amount": 10.0}}, "added_rows": [{"name":"x", "amount":5.0}], "deleted_rows": [2]}
+    shown = grid_edits.view(pd.DataFrame(ITEMS), base)
+    assert shown["name"].tolist()==["a", "b", "d", "x"] and shown["amount"].tolist()==[0.0, 10.0, 3.0, 5.0]
+    state = {"edited_rows": {2: {"name":"D"}, 3: {"amount": 6.0}}, "added_rows": [{"name":"y", "amount":1.0}],
+             "deleted_rows": [0]}
+    merged = grid_edits.merge(len(ITEMS), base, state)
+    assert merged=={"edited_rows": {1: {"amount": 10.0}, 3: {"name":"D"}},
+                    "added_rows": [{"name":"x", "amount":6.0}, {"name":"y", "amount":1.0}], "deleted_rows": [0, 2]}
+    once = grid_edits.apply_list(copy.deepcopy(ITEMS), merged)
+    assert once==grid_edits.apply_list(grid_edits.apply_list(copy.deepcopy(ITEMS), base), state)
+
+def test_deleting_a_kept_added_row_drops_it():
+    base = {"added_rows": [{"name":"x", "amount":5.0}]}
+    merged = grid_edits.merge(len(ITEMS), base, {"deleted_rows": [4]})
+    assert grid_edits.count(merged)==0
+
+# --- optimistic saves to a table: only cells the save touches are checked ---
+def _loaded():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT, amount REAL)")
+    conn.executemany("INSERT INTO t (name, amount) VALUES (?,?)", [(r["name"], r["amount"]) for r in ITEMS])
+    shown = [dict(zip(("id", "name", "amount"), r)) for r in conn.execute("SELECT * FROM t ORDER BY id")]
+    return conn, shown
+
+def _rows(conn):
+    return conn.execute("SELECT name, amount FROM t ORDER BY id").fetchall()
+
+def test_stale_update_is_refused_whole():
+    conn, shown = _loaded()
+    conn.execute("UPDATE t SET amount=99 WHERE id=2")   # another session, after the grid loaded
+    before = _rows(conn)
+    state = {"edited_rows": {0: {"name":"A"}, 1: {"amount": 7.0}}, "added_rows": [{"name":"x", "amount":1.0}]}
+    with pytest.raises(grid_edits.Conflict) as e:
+        grid_edits.apply(conn, "t", "id", shown, state, ["name", "amount"])
+    assert e.value.keys==[2] and _rows(conn)==before
+
+def test_stale_delete_is_refused():
+    conn, shown = _loaded()
+    conn.execute("UPDATE t SET name='C' WHERE id=3")
+    with pytest.raises(grid_edits.Conflict) as e:
+        grid_edits.apply(conn, "t", "id", shown, {"deleted_rows": [2, 3]}, ["name", "amount"])
+    assert e.value.keys==[3] and len(_rows(conn))==4
+
+def test_edits_to_other_columns_both_stand():
+    conn, shown = _loaded()
+    conn.execute("UPDATE t SET amount=99 WHERE id=2")
+    state = {"edited_rows": {1: {"name":"B"}}, "deleted_rows": [0]}
+    assert grid_edits.apply(conn, "t", "id", shown, state, ["name"])==2
+    assert _rows(conn)==[("B", 99.0), ("c", 2.0), ("d", 3.0)]
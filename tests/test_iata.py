@@ -0,0 +1,20 @@
+import iata
+
+def test_bundled_codes_and_cities_resolve():
+    assert iata.resolve("gva")==("GVA",) and iata.resolve("geneva")==("GVA",)
+    # regional airports are listed too, not just the hubs
+    assert iata.resolve("gvx")==("GVX",) and iata.resolve("TOE")==("TOE",)
+
+def test_codes_that_are_no_airport_are_rejected():
+    assert iata.resolve("toz") is None and iata.resolve(" TOZ ", metro=True) is None
+
+def test_city_names_prefer_the_metro_code():
+    # Paris, Texas doesn't make "paris" ambiguous; two Portlands in the US do
+    assert iata.resolve("paris")==("BVA", "CDG", "ORY")
+    assert iata.resolve("portland") is None
+
+def test_text_that_is_no_code_stays_unresolved():
+    assert iata.resolve("genva") is None and iata.resolve("G1A") is None
+
+def test_typos_suggest_the_closest_names_first():
+    assert "GVA" in [c for c,_ in iata.suggest("genva", 3)]
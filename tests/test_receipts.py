@@ -0,0 +1,30 @@
+import io, os
+import records_db, receipts
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    store = str(tmp_path/"store")
+    a = receipts.store_file(io.BytesIO(b"taxi receipt"), store)
+    b = receipts.store_file(io.BytesIO(b"taxi receipt"), store)
+    assert a==b and a[1]==12
+    files = [f for _,_,fs in os.walk(store) for f in fs]
+    assert files==[a[0]]   # no .part left behind
+    with receipts.open_receipt(a[0], store) as f: assert f.read()==b"taxi receipt"
+
+def test_linking_twice_keeps_one_row(db, tmp_path):
+    conn = records_db.init_db(db)
+    up = io.BytesIO(b"%PDF hotel"); up.name = "hotel.pdf"
+    h = receipts.add_receipts([up], "T1", "expense", 0, db, str(tmp_path/"store"))
+    receipts.link(h, "T1", "expense", 0, db)
+    assert len(receipts.list_receipts(conn, ta="T1"))==1
+
+def test_list_receipts_filters_by_ta_kind_and_row(db):
+    conn = records_db.init_db(db)
+    h = [{"sha256":"ab"*32, "name":"r.pdf", "size":1}]
+    receipts.link(h, "T1", "expense", 0, db)
+    receipts.link(h, "T1", "expense", 1, db)
+    receipts.link(h, "T1", "dsa", 0, db)
+    receipts.link(h, "T2", "expense", 0, db)
+    assert len(receipts.list_receipts(conn, ta="T1"))==3
+    assert [r["row_ref"] for r in receipts.list_receipts(conn, ta="T1", kind="expense")]==[0, 1]
+    assert [r["kind"] for r in receipts.list_receipts(conn, ta="T1", row_ref=0)]==["expense", "dsa"]
+    assert receipts.list_receipts(conn, ta="T3")==[]
@@ -0,0 +1,173 @@
+import sqlite3
+import pytest
+import grid_edits, records_db
+
+class _BadRows:
+    # rows that fail half-way with something other than an sqlite3.Error, every time
+    def __iter__(self):
+        yield ("A",)
+        raise ValueError("not a database error")
+
+def _boom(w):
+    return w.submit("INSERT INTO records (traveler) VALUES (?)", _BadRows(), many=True)
+
+def test_writer_survives_a_raising_job(db):
+    w = records_db.writer(db)
+    with pytest.raises(ValueError):
+        _boom(w).result(timeout=10)
+    rid = records_db.insert_record({"traveler":"A"}, db).result(timeout=10)
+    assert records_db.init_db(db).execute("SELECT traveler FROM records WHERE id=?", (rid,)).fetchone()==("A",)
+
+def test_raising_job_fails_only_itself_in_a_batch(db):
+    records_db.init_db(db)
+    w = records_db.Writer(db)   # not started: the three jobs land in one batch
+    ok1 = w.submit("INSERT INTO records (traveler) VALUES (?)", ("A",))
+    bad = _boom(w)
+    ok2 = w.submit("INSERT INTO records (traveler) VALUES (?)", ("B",))
+    w.start()
+    with pytest.raises(ValueError):
+        bad.result(timeout=10)
+    assert ok1.result(timeout=10) and ok2.result(timeout=10)
+    assert records_db.init_db(db).execute("SELECT COUNT(*) FROM records").fetchone()[0]==2
+
+def test_grid_save_first_in_a_failed_batch_is_written_once(db):
+    # the grid's SAVEPOINT must nest in the batch transaction: if it committed on its
+    # own, replaying the batch after a later job fails would insert its rows twice
+    records_db.init_db(db)
+    w = records_db.Writer(db)
+    grid = w.submit(lambda conn: grid_edits.apply(
+        conn, "records", "id", [], {"added_rows": [{"traveler":"G"}]}, records_db.EDITABLE))
+    bad = _boom(w)
+    w.start()
+    with pytest.raises(ValueError):
+        bad.result(timeout=10)
+    assert grid.result(timeout=10)==1
+    assert records_db.init_db(db).execute("SELECT COUNT(*) FROM records").fetchone()[0]==1
+
+def test_duplicate_ticket_names_the_pair(db):
+    records_db.insert_record({"traveler":"A", "eticket_number":"123", "airplus_invoice":"INV1"}, db).result(timeout=10)
+    state = {"added_rows": [{"traveler":"B", "eticket_number":"123", "airplus_invoice":"INV1"}]}
+    with pytest.raises(sqlite3.IntegrityError) as e:
+        records_db.save_edits([], state, db).result(timeout=10)
+    assert grid_edits.duplicates(e.value, state)==(["eticket_number", "airplus_invoice"], ["123 / INV1"])
+
+# --- records browser: keyset paging ---
+ROWS = [("sam", "2025-03-01"), ("Sam", "2025-03-01"), ("Ali", None), ("Sam", "2025-01-15"),
+        (None, "2025-03-01"), ("ali", "2025-01-15"), ("Zed", None), ("sam", "2025-02-10")]
+
+def _browser_db(db):
+    conn = records_db.init_db(db)
+    with conn:
+        conn.executemany("INSERT INTO records (traveler, departure_date) VALUES (?,?)", ROWS)
+    return conn
+
+def _all_pages(conn, sort, limit=2, **filters):
+    ids, after = [], None
+    while True:
+        _, rows, after = records_db.page_records(conn, sort, after, limit, **filters)
+        ids += [r["id"] for r in rows]
+        if after is None: return ids
+
+def _expected(sort):
+    col, direction = records_db.SORTABLE[sort]
+    col = {"id":None, "traveler":0, "departure_date":1}[col]
+    rows = [(i, i if col is None else r[col].lower() if col==0 and r[col] else r[col])
+            for i, r in enumerate(ROWS, 1)]
+    # NULLs first ascending, last descending; ties by id in the same direction
+    key = lambda r: (r[1] is not None, "" if r[1] is None else r[1], r[0])
+    return [i for i, _ in sorted(rows, key=key, reverse=direction=="DESC")]
+
+@pytest.mark.parametrize("sort", ["Traveler A→Z", "Departure ↑", "Departure ↓", "Newest first"])
+def test_pages_follow_the_sort_through_ties_and_nulls(db, sort):
+    conn = _browser_db(db)
+    for limit in (1, 2, 3):
+        assert _all_pages(conn, sort, limit)==_expected(sort)
+
+def test_name_filter_is_a_case_insensitive_prefix(db):
+    conn = _browser_db(db)
+    assert records_db.count_records(conn, traveler="SA")==4
+    assert _all_pages(conn, "Traveler A→Z", traveler="sa")==[1, 2, 4, 8]
+    # half the records match: the name is checked while walking departure order, same pages
+    assert records_db._walk_names(conn, "departure_date", {"traveler":"sa"})
+    assert _all_pages(conn, "Departure ↓", traveler="sa")==[2, 1, 8, 4]
+
+# --- trigger-kept totals agree with a rebuild from the source rows ---
+SUMMARIES = {"sum_project_month":3, "sum_traveler":1, "sum_class":1, "sum_meeting_fund":2}   # table: key columns
+
+def _totals(conn):
+    # rows emptied by deletes stay behind in the trigger-kept tables; a rebuild doesn't write them
+    out = {}
+    for t, k in SUMMARIES.items():
+        rows = [tuple(round(v, 6) if isinstance(v, float) else v for v in r)
+                for r in conn.execute(f"SELECT * FROM {t}")]
+        out[t] = sorted(r for r in rows if any(r[k:]))
+    out["meetings"] = conn.execute("SELECT mf, ROUND(authorised_chf,6), ROUND(effective_chf,6) FROM meetings ORDER BY mf").fetchall()
+    return out
+
+def _agrees(conn):
+    kept = _totals(conn)
+    records_db.rebuild_summaries(conn)
+    assert _totals(conn)==kept
+    return kept
+
+TRIPS = [("Sam", "NARD", "F1", "2025-03-01", "2025-03-04", 410.5, None, "Economy", "T1", "I1"),
+         ("Ali", "NARD", "F2", "2025-03-20", None, None, 2, "Business", "T2", "I1"),
+         ("Sam", "WASH", "F1", "2025-04-02", "2025-04-01", 120.0, None, None, None, None),
+         (None, None, None, None, None, 99.9, None, "Economy", "", "")]
+TRIP_COLS = ["traveler","project","fund","departure_date","return_date","final_fare",
+             "days_travelled","travel_class","eticket_number","airplus_invoice"]
+
+def test_trip_summaries_follow_inserts_updates_deletes(db):
+    conn = records_db.init_db(db)
+    with conn:
+        conn.executemany(f"INSERT INTO records ({','.join(TRIP_COLS)}) VALUES ({','.join('?'*len(TRIP_COLS))})", TRIPS)
+    assert _agrees(conn)["sum_traveler"][0][:2]==("", 1)
+    with conn:
+        conn.execute("UPDATE records SET project='WASH', fund='F9', final_fare=500 WHERE traveler='Ali'")
+        conn.execute("UPDATE records SET departure_date='2025-05-30', travel_class='First' WHERE id=1")
+        conn.execute("UPDATE records SET traveler='Samira', remarks='moved' WHERE id=3")
+    kept = _agrees(conn)
+    assert ("WASH", "F9", "2025-03", 1, 500.0, 2) in kept["sum_project_month"]
+    assert [r[:3] for r in kept["sum_project_month"] if r[0]=="NARD"]==[("NARD", "F1", "2025-05")]
+    with conn:
+        conn.execute("DELETE FROM records WHERE traveler LIKE 'Sam%'")
+    assert [r[0] for r in _agrees(conn)["sum_traveler"]]==["", "Ali"]
+
+def test_trip_summaries_follow_bulk_upserts(db):
+    conn = records_db.init_db(db)
+    with conn:
+        records_db.bulk_upsert(conn, TRIP_COLS, TRIPS)
+    _agrees(conn)
+    # one pair re-imported under another project and fare, one new trip, no ticket on a third
+    again = [("Sam", "WASH", "F3", "2025-03-01", None, 99.0, 5, "Economy", "T1", "I1"),
+             ("Omar", "NARD", "F1", "2025-06-01", "2025-06-03", 50.0, None, "Economy", "T3", "I1"),
+             ("Lea", "NARD", "F1", "2025-06-01", None, None, None, None, None, None)]
+    with conn:
+        records_db.bulk_upsert(conn, TRIP_COLS, again)
+    kept = _agrees(conn)
+    assert conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]==6
+    assert ("WASH", "F3", "2025-03", 1, 99.0, 5) in kept["sum_project_month"]
+    with conn:
+        records_db.bulk_upsert(conn, ["traveler", "final_fare"], [("Zoe", 10.0)], search=False)
+    _agrees(conn)
+
+def test_meeting_totals_follow_lines_and_meetings(db):
+    conn = records_db.init_db(db)
+    line = "INSERT INTO meeting_lines (mf, kind, chf) VALUES (?,?,?)"
+    with conn:
+        conn.executemany("INSERT INTO meetings (mf, project, fund) VALUES (?,?,?)",
+                         [("MF1", "NARD", "F1"), ("MF2", "NARD", "F1"), ("MF3", None, None)])
+        conn.executemany(line, [("MF1", "authorised", 1000.0), ("MF1", "effective", 640.25),
+                                ("MF2", "authorised", 300.0), ("MF3", "effective", None)])
+    assert _agrees(conn)["sum_meeting_fund"]==[("", "", 1, 0.0, 0.0), ("NARD", "F1", 2, 1300.0, 640.25)]
+    with conn:
+        conn.execute("UPDATE meeting_lines SET chf=chf+10 WHERE mf='MF1'")
+        conn.execute("UPDATE meeting_lines SET kind='effective' WHERE mf='MF2'")
+        conn.execute("UPDATE meetings SET project='WASH' WHERE mf='MF2'")
+        conn.execute("INSERT INTO meeting_lines (mf, kind, chf) VALUES ('MF3', 'authorised', 75)")
+    assert _agrees(conn)["sum_meeting_fund"]==[("", "", 1, 75.0, 0.0), ("NARD", "F1", 1, 1010.0, 650.25),
+                                               ("WASH", "F1", 1, 0.0, 300.0)]
+    with conn:
+        conn.execute("DELETE FROM meeting_lines WHERE mf='MF1' AND kind='effective'")
+        conn.execute("DELETE FROM meetings WHERE mf='MF2'")
+    assert _agrees(conn)["meetings"]==[("MF1", 1010.0, 0.0), ("MF3", 75.0, 0.0)]
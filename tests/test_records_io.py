@@ -0,0 +1,67 @@
+import logging
+import pytest
+import pandas as pd
+import records_db, records_io
+
+def test_duplicates_wait_for_explicit_dedupe(db, tmp_path, caplog):
+    conn = records_db.connect(db)
+    for stmt in records_db.SCHEMA: conn.execute(stmt)
+    for stmts in records_db.MIGRATIONS[:2]:
+        for stmt in stmts: conn.execute(stmt)
+    conn.execute("PRAGMA user_version=2")
+    conn.executemany("INSERT INTO records (traveler, eticket_number, airplus_invoice) VALUES (?,?,?)",
+                     [("old", "T1", "I1"), ("new", "T1", "I1"), ("other", "T2", "I1")])
+    conn.commit()
+    with caplog.at_level(logging.WARNING, "records_db"):
+        records_db.migrate(conn)
+    # startup deletes nothing: it reports, and imports refuse to run
+    assert conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]==3
+    assert "1 duplicate" in caplog.text and not records_db.ticket_keyed(conn)
+    path = str(tmp_path/"trips.csv")
+    pd.DataFrame({"Passenger":["x"], "Ticket":["T3"], "Invoice":"I1"}).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="cli.py dedupe"):
+        records_io.import_file(path, db)
+
+    assert records_db.dedupe_tickets(conn)==1
+    assert conn.execute("SELECT traveler FROM records ORDER BY id").fetchall()==[("new",), ("other",)]
+    assert conn.execute("SELECT traveler FROM records_dupes_removed").fetchall()==[("old",)]
+    assert records_db.ticket_keyed(conn) and records_db.ticket_dupes(conn)==0
+    assert records_io.import_file(path, db, restart=True)==(1, 1)
+
+def test_xlsx_import_in_chunks_resumes(db, tmp_path):
+    path = str(tmp_path/"trips.xlsx")
+    pd.DataFrame({"Passenger":[f"P{i}" for i in range(5)], "Ticket":[1000+i for i in range(5)],
+                  "Invoice":"INV", "Departure":pd.Timestamp("2026-03-02 10:30")}).to_excel(path, index=False)
+    total, parts = records_io.read_chunks(path, chunk=2, skip=1)
+    parts = list(parts)
+    assert total==5 and [len(p) for p in parts]==[2, 2] and parts[0]["Passenger"].tolist()==["P1", "P2"]
+    assert records_io.import_file(path, db, chunk=2)==(5, 5)
+    rows = records_db.connect(db).execute(
+        "SELECT traveler, eticket_number, departure_date FROM records ORDER BY id").fetchall()
+    assert rows[0]==("P0", "1000", "2026-03-02") and len(rows)==5
+
+def _found(conn, q):
+    return conn.execute("SELECT COUNT(*) FROM records_fts WHERE records_fts MATCH ?", (q,)).fetchone()[0]
+
+def test_import_search_index_rebuilt_once(db, tmp_path):
+    path = str(tmp_path/"trips.csv")
+    pd.DataFrame({"Passenger":["Samira Haddad", "Omar Khalil", "Sami Bey"], "Ticket":["1", "2", "3"],
+                  "Invoice":"INV"}).to_csv(path, index=False)
+    records_io.import_file(path, db, chunk=2)
+    conn = records_db.connect(db)
+    assert _found(conn, "sami*")==2
+    # small next to what is stored: kept up per chunk, triggers in place throughout
+    pd.DataFrame({"Passenger":["Samuel Roth"], "Ticket":["4"], "Invoice":"INV"}).to_csv(path, index=False)
+    records_io.import_file(path, db)
+    assert _found(conn, "sam*")==3
+    assert conn.execute("INSERT INTO records_fts (records_fts) VALUES ('integrity-check')")
+
+def test_migrate_repairs_search_after_an_interrupted_import(db):
+    conn = records_db.init_db(db)
+    with conn:
+        records_db.bulk_upsert(conn, ["traveler"], [("Nadia Aziz",)], search=False)
+    assert _found(conn, "nadia")==0
+    records_db.migrate(conn)
+    assert _found(conn, "nadia")==1
+    conn.execute("INSERT INTO records (traveler) VALUES ('Nadia Saleh')")
+    assert _found(conn, "nadia")==2
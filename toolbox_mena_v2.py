@@ -1,23 +1,9 @@
-import os, sys, subprocess
-import sqlite3
+import os, zipfile
 import streamlit as st
-import pandas as pd
-import datetime
 from datetime import date, time
-from io import BytesIO
-from fpdf import FPDF
-from PyPDF2 import PdfMerger
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
-import requests
-
-# ──────────────────────────────────────────────────────────────────────────────
-# Auto-install xlrd for Excel support
-try:
-    import xlrd
-except ImportError:
-    subprocess.run([sys.executable, "-m", "pip", "install", "xlrd>=2.0.1"], check=True)
-    import xlrd
-# ──────────────────────────────────────────────────────────────────────────────
+import deps, metrics
+# pandas, the PDF/grid libraries and the feature modules are imported inside the
+# tab that needs them, so the login form comes up without loading any of them
 
 # --- Page config & CSS ---
 st.set_page_config(page_title="MENA Team Logistics Toolbox", layout="wide")
@@ -32,8 +18,17 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- Startup check: missing packages are reported, never installed at runtime ---
+_missing = deps.missing()
+if any(req for *_,req in _missing):
+    st.error("❌ Required package(s) missing: "+", ".join(p for _,p,_,req in _missing if req)
+             +". Install them with `pip install -r requirements.txt` and restart the app.")
+    st.stop()
+
 # --- Authentication ---
 LOGIN, PASSWORD = "MTR", "MTR38"
+# admin login adds the performance panel; disabled unless the password is set
+ADMIN_LOGIN, ADMIN_PASSWORD = "MTR-ADMIN", os.environ.get("TOOLBOX_ADMIN_PASSWORD","")
 if "auth" not in st.session_state:
     st.session_state.auth = False
 
@@ -53,110 +48,227 @@ if not st.session_state.auth:
                 if user==LOGIN and pwd==PASSWORD:
                     st.session_state.auth=True
                     st.success("✅ Logged in")
+                elif ADMIN_PASSWORD and user==ADMIN_LOGIN and pwd==ADMIN_PASSWORD:
+                    st.session_state.auth=st.session_state.admin=True
+                    st.success("✅ Logged in (admin)")
                 else:
                     st.error("❌ Invalid credentials")
     st.stop()
 
+# an armed profile covers this whole rerun, except the one the toggle itself caused
+_prof = (metrics.start_profile()
+         if st.session_state.get("prof_next") and not st.session_state.pop("_prof_skip", False) else None)
+
 # --- Helpers ---
-def calculate_days(dep, ret):
-    try: return max((ret-dep).days+1,1) if ret else 1
-    except: return 1
-
-def init_db(db="travel_records.db"):
-    conn = sqlite3.connect(db, check_same_thread=False)
-    c = conn.cursor()
-    c.execute("""
-      CREATE TABLE IF NOT EXISTS records (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        traveler TEXT, position TEXT, ta TEXT,
-        project TEXT, fund TEXT, activity TEXT,
-        budget_line TEXT, airfare_ticket REAL,
-        change_fare REAL, final_fare REAL,
-        airplus_invoice TEXT, eticket_number TEXT,
-        itinerary TEXT, departure_date TEXT,
-        return_date TEXT, travel_class TEXT,
-        trip_type TEXT, co2_tons REAL,
-        days_travelled INTEGER, booked_by TEXT,
-        remarks TEXT, created_at TEXT
-      )
-    """)
-    conn.commit()
-    return conn
-
-def backup_excel(conn, backup_dir="backups"):
-    os.makedirs(backup_dir, exist_ok=True)
-    today = date.today().isoformat()
-    dest = os.path.join(backup_dir, f"travel_records_{today}.xlsx")
-    if os.path.exists(dest): return
-    df = pd.read_sql_query("SELECT * FROM records", conn)
-    buf = BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as w:
-        df.to_excel(w, sheet_name="Records", index=False)
-        wb, ws = w.book, w.sheets["Records"]
-        fmt = wb.add_format({
-            "bold":True, "text_wrap":True, "valign":"center",
-            "fg_color":"#DC2626","color":"white","border":1
-        })
-        for i,col in enumerate(df.columns):
-            ws.write(0, i, col, fmt)
-            width = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            ws.set_column(i, i, width)
-    with open(dest,"wb") as f:
-        f.write(buf.getvalue())
-
-# --- Amadeus flight lookup ---
-CLIENT_ID     = "idd7hl95bnBrW4AR2gvyKwskc6GiKTep"
-CLIENT_SECRET = "Wf6Lm0qOAxzhDavO"
-def get_token():
-    r = requests.post(
-        "https://test.api.amadeus.com/v1/security/oauth2/token",
-        data={"grant_type":"client_credentials",
-              "client_id":CLIENT_ID,
-              "client_secret":CLIENT_SECRET}
-    )
-    return r.json().get("access_token")
-
-def search_flights(o,d,dt,cls):
-    tok = get_token()
-    if not tok: return []
-    r = requests.get(
-        "https://test.api.amadeus.com/v2/shopping/flight-offers",
-        headers={"Authorization":f"Bearer {tok}"},
-        params={"originLocationCode":o,
-                "destinationLocationCode":d,
-                "departureDate":dt,
-                "adults":1,
-                "travelClass":cls,
-                "max":10}
-    )
-    return r.json().get("data",[]) if r.status_code==200 else []
-
-def show_flights(ofs):
-    if not ofs:
+PAGE_SIZE = 50
+CLAIM_DIR = "claim_packs"
+
+def admin_panel():
+    # rolling p50/p95 of the timed hot paths (this server process, all sessions)
+    import pandas as pd
+    with st.sidebar.expander("🛠️ Performance"):
+        rows = metrics.stats()
+        if rows: st.dataframe(pd.DataFrame(rows), hide_index=True)
+        else:    st.caption("No timings yet.")
+        st.button("🔄 Reset timings", key="met_reset", on_click=metrics.reset)
+        st.toggle("📸 Profile next rerun", key="prof_next",
+                  on_change=lambda: st.session_state.update(_prof_skip=True))
+        if st.session_state.get("prof_out"):
+            prof, report = st.session_state.prof_out
+            c1,c2 = st.columns(2)
+            c1.download_button("⬇️ .prof", prof, "rerun.prof", key="prof_dl")
+            c2.download_button("⬇️ .txt", report, "rerun_profile.txt", key="prof_txt")
+
+def keep_inputs(keys):
+    # Streamlit drops the state of widgets a rerun doesn't draw (another tab or section);
+    # written back, a value is plain session state and the widget picks it up when drawn
+    # again. Value widgets only: buttons and uploaders can't be set (edit_grid keeps its own)
+    for k in keys:
+        if k in st.session_state: st.session_state[k] = st.session_state[k]
+
+def tab_bar(labels, key, inputs=()):
+    # st.tabs runs the code of every tab on each rerun; this renders only the chosen one.
+    # inputs: widget keys per tab, kept while another tab is shown
+    tab = st.segmented_control("Tab", labels, default=labels[0], required=True,
+                               key=key, label_visibility="collapsed") or labels[0]
+    for label, keys in zip(labels, inputs):
+        if label!=tab: keep_inputs(keys)
+    return tab
+
+# input widgets of each tab (tab_bar order)
+RECORD_INPUTS = [
+    ["rec_tr2","rec_pos2","rec_ta3b","rec_it2b","rec_dp2b","rec_rt2b","rec_cls2b","rec_fare2b"],
+    ["rb_q","rb_tr","rb_ta","rb_pj","rb_df","rb_dt","rb_sort"],
+    ["dash_pj"],
+]
+MISSION_INPUTS = [
+    ["flt_tp","flt_cl","flt_metro","flt_nseg","flt_o","flt_d","flt_dt","flt_rd","flt_cal","flt_span",
+     "flt_dir","flt_ref","flt_bag", *(f"flt_{k}{i}" for i in range(1,7) for k in ("o","d","dt"))],
+    ["ta_nm","ta_tp","ta_proj","ta_fund","ta_act","ta_bd","ta_mgr","ta_fp","ta_ofc"],
+    ["dsa_nm2","dsa_ta2","dsa_ct2","dsa_city2","dsa_dd2","dsa_dt2","dsa_rd2","dsa_rt2"],
+    ["exp_trav2","exp_ta2b","exp_sub2","exp_off2","exp_cat2b","exp_desc2b","exp_pj2b","exp_fd2b",
+     "exp_ac2b","exp_bd2b","exp_cur2b","exp_amt2b","exp_rate2b","fx_code","fx_rate","fx_eff"],
+    ["rec_tab", *(k for keys in RECORD_INPUTS for k in keys)],
+]
+MEETING_INPUTS = [
+    ["mtg_name","mtg_mf","mtg_loc","mtg_proj","mtg_fund","mtg_pax","mtg_parts",
+     *(f"{c}_{k}" for c in ("fi","r","ae","hotel","cat") for k in ("cur","pp","det")),
+     "gt_tr","gt_cur","gt_pp","gt_det","oe_name","oe_cur","oe_amt","oe_det"],
+    ["eff_mf", *(f"eff_{c}_{k}" for c in ("flights","hotel","gt","dsa","cat","ae") for k in ("cur","amt"))],
+    ["mtg_detail"],
+    ["po_mf_mtg","po_no_mtg","po_date_mtg","po_status_mtg"],
+]
+
+def _bump(key, step):
+    st.session_state[key] = max(st.session_state.get(key,0)+step, 0)
+
+@st.fragment
+def deduction_counters():
+    # +/- buttons rerun this group only; Save Mission reads the counts from session state
+    for col,(label,key) in zip(st.columns(3), [("Lunch","ded_lunch"),("Dinner","ded_dinner"),("Full","ded_full")]):
+        with col:
+            st.write(f"{label} Ded: {st.session_state.get(key,0)}")
+            st.button(f"+ {label}", key=f"dsa_a{label[0].lower()}2", on_click=_bump, args=(key,1))
+            st.button(f"- {label}", key=f"dsa_s{label[0].lower()}2", on_click=_bump, args=(key,-1))
+
+def receipt_handles(files, ta, kind, row):
+    # streams new uploads to the receipt store once; reruns reuse the handle
+    from receipts import add_receipts
+    seen = st.session_state.setdefault("rcpt_seen", {})
+    keys = [(getattr(f,"file_id",f.name), ta, kind, row) for f in files]
+    new = [(k,f) for k,f in zip(keys,files) if k not in seen]
+    for (k,_),h in zip(new, add_receipts([f for _,f in new], ta, kind, row)):
+        seen[k] = h
+    return [seen[k] for k in keys]
+
+def uploader_key(key):
+    # a file_uploader can't be reset through session state; a new key starts it empty
+    return f"{key}_{st.session_state.get('up_gen',{}).get(key,0)}"
+
+def clear_uploader(key):
+    gen = st.session_state.setdefault("up_gen", {})
+    gen[key] = gen.get(key,0)+1
+
+def flash(key, msg=None):
+    # with msg: rerun so cleared widgets redraw empty, msg shown by the next flash(key)
+    if msg:
+        st.session_state.setdefault("flash", {})[key] = msg; st.rerun()
+    msg = st.session_state.get("flash", {}).pop(key, None)
+    if msg: st.success(msg)
+
+def export_buttons(label, data, name, key):
+    # data: a DataFrame, or a callable fmt -> bytes/file; nothing is serialized until a click
+    import exports
+    build = data if callable(data) else (lambda fmt: exports.frame_bytes(data, fmt))
+    fmts = exports.formats()
+    for c,fmt in zip(st.columns([3]+[1]*(len(fmts)-1)+[5]), fmts):
+        c.download_button(label if fmt=="xlsx" else fmt.upper(), lambda fmt=fmt: build(fmt),
+                          f"{name}.{fmt}", mime=exports.MIME[fmt], key=f"{key}_{fmt}")
+
+def grid_key(key):
+    # widget key of an edit_grid; the generation changes after a save, a discard or
+    # a reload, so stale edit positions are never replayed over other rows
+    return f"{key}_{st.session_state.get(key+'_gen',0)}"
+
+def regrid(key):
+    for s in ("_base", "_edits"): st.session_state.pop(grid_key(key)+s, None)
+    st.session_state[key+"_gen"] = st.session_state.get(key+"_gen",0)+1
+
+def grid_rows(key, load):
+    # rows behind an edit_grid, reloaded on each rerun except while it has unsaved
+    # edits: those are positions in the rows as loaded, and the save checks their values
+    import grid_edits
+    if key+"_rows" not in st.session_state or not grid_edits.count(st.session_state.get(grid_key(key)+"_edits")):
+        st.session_state[key+"_rows"] = load()
+    return st.session_state[key+"_rows"]
+
+def edit_grid(df, key, save, disabled=(), num_rows="dynamic"):
+    # data_editor whose changes stay deltas (grid_edits) until saved; save(state) writes them.
+    # Unsaved edits outlive a rerun that doesn't draw the grid (another tab): see grid_edits.view
+    import sqlite3, grid_edits
+    k = grid_key(key)
+    if k not in st.session_state:   # first drawn, or dropped while hidden
+        st.session_state[k+"_base"] = st.session_state.get(k+"_edits") or {}
+    base = st.session_state[k+"_base"]
+    st.data_editor(grid_edits.view(df, base) if grid_edits.count(base) else df,
+                   num_rows=num_rows, key=k, disabled=list(disabled))
+    edits = st.session_state[k+"_edits"] = grid_edits.merge(len(df), base, st.session_state.get(k) or {})
+    n = grid_edits.count(edits)
+    if not n: return
+    c1,c2,_ = st.columns([2,1,5])
+    if c1.button(f"💾 Save {n} change(s)", key=key+"_save"):
+        try: save(edits)
+        except grid_edits.Conflict as e:
+            st.error(f"Not saved: {e}. Discard to reload the current values."); return
+        except sqlite3.IntegrityError as e:
+            # e.g. a ticket/invoice pair another record already has
+            cols, vals = grid_edits.duplicates(e, edits)
+            what = f"{' / '.join(cols)} {', '.join(vals)}" if cols else str(e)
+            st.error(f"Not saved: another row already has {what}. Change or discard the edit."); return
+        regrid(key); st.rerun()
+    if c2.button("↩️ Discard", key=key+"_undo"):
+        regrid(key); st.rerun()
+
+def chf_total(lines, on=None):
+    # lines: [(amount, currency)]; one vectorized conversion, warns on missing rates
+    from core import meeting_total
+    total, missing = meeting_total(lines, on)
+    if missing: st.warning(f"No exchange rate in force for {', '.join(missing)}; those amounts are left out of the CHF total.")
+    return total
+
+def zip_files(paths):
+    # packs are already compressed PDFs; store them and spool the zip to disk,
+    # handed back read-only the way exports does (download_button takes that)
+    import exports
+    path = exports.temp_path(".zip")
+    try:
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as z:
+            for p in paths:
+                if os.path.exists(p): z.write(p, os.path.basename(p))
+    except Exception:
+        os.remove(path); raise
+    return exports.open_temp(path)
+
+# --- Amadeus flight lookup (pooled session + cached token live in amadeus.py) ---
+def show_flights(df, key="flt"):
+    if df.empty:
         st.warning("No flights available.")
         return
-    rows=[]
-    for i,f in enumerate(ofs,1):
-        seg = f["itineraries"][0]["segments"]
-        bags = f["travelerPricings"][0]["fareDetailsBySegment"][0]\
-                  .get("includedCheckedBags",{}).get("quantity",0)
-        rows.append({
-            "Option":i,
-            "From":seg[0]["departure"]["iataCode"],
-            "To":seg[-1]["arrival"]["iataCode"],
-            "Depart":seg[0]["departure"]["at"],
-            "Arrive":seg[-1]["arrival"]["at"],
-            "Price (CHF)":float(f["price"]["total"]),
-            "Refundable":f["pricingOptions"].get("refundable",False),
-            "Bags":bags,
-            "Stops":len(seg)-1})
-    df=pd.DataFrame(rows)
+    from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
     gb=GridOptionsBuilder.from_dataframe(df)
     gb.configure_default_column(editable=True)
-    AgGrid(df,gridOptions=gb.build(),update_mode=GridUpdateMode.MODEL_CHANGED)
-    buf=BytesIO(); df.to_excel(buf,index=False)
-    st.download_button("⬇️ Export Flights",buf.getvalue(),"flights.xlsx",
-                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    AgGrid(df,gridOptions=gb.build(),update_mode=GridUpdateMode.MODEL_CHANGED,key=f"{key}_grid")
+    export_buttons("⬇️ Export Flights",df,"flights",f"{key}_exp")
+
+def show_trip(results, d_only, r_only, bag):
+    import pandas as pd
+    from flight_search import offers_table, filter_table, cheapest_total
+    status = {"timeout":"⏱️ timed out, partial results", "error":"❌ search failed"}
+    df = pd.concat([offers_table(r["offers"], Leg=r["leg"]) for r in results], ignore_index=True)
+    df = filter_table(df, d_only, r_only, bag)
+    counts = df["Leg"].value_counts()
+    for r in results:
+        src = status.get(r["status"]) or ("🌐 live" if r["age"] is None else f"⚡ cached · {int(r['age']//60)} min old")
+        st.caption(f"Leg {r['leg']}: {r['from']} → {r['to']} on {r['date']} · {src} · {counts.get(r['leg'],0)} offer(s)")
+    tot = cheapest_total(df, len(results))
+    if len(results)>1 and tot is not None:
+        st.metric("Cheapest itinerary (CHF)", f"{tot:,.2f}")
+    show_flights(df if len(results)>1 else df.drop(columns="Leg"))
+
+def airport_input(label, key, metro=False):
+    # free text (code, metro code or city) checked against the offline airport index
+    # as it is entered; returns the airport codes, or None while it doesn't resolve
+    import iata
+    text = st.text_input(label, key=key)
+    if not text.strip(): return None
+    codes = iata.resolve(text, metro)
+    if codes:
+        st.caption("✓ "+(iata.label(codes[0]) if len(codes)==1 else " / ".join(codes)))
+    else:
+        hint = iata.suggest(text, 5)
+        st.caption("❓ "+("Did you mean: "+" · ".join(c for c,_ in hint) if hint
+                          else f"No airport matches “{text.strip()}”"))
+    return codes
 
 # --- HEADER ---
 h1,h2,h3 = st.columns([1,6,1])
@@ -172,70 +284,101 @@ section = st.sidebar.radio(
     ["🚀 Mission","📅 Meeting"],
     index=0
 )
+if _missing:
+    st.sidebar.warning("⚠️ Not installed: "+"; ".join(f"{p} ({feat})" for _,p,feat,_ in _missing))
+
+@st.fragment
+def flight_results():
+    # filters are re-applied to the stored offers: toggling them reruns this group
+    # only and never hits the API
+    from flight_search import filter_table, fare_grid
+    d_only = st.checkbox("Direct only", key="flt_dir")
+    r_only = st.checkbox("Refundable only", key="flt_ref")
+    bag    = st.checkbox("Include baggage", key="flt_bag")
+    if "flt_res" in st.session_state:
+        show_trip(st.session_state.flt_res, d_only, r_only, bag)
+    if "flt_cal_res" in st.session_state:
+        cal_df=filter_table(st.session_state.flt_cal_res, d_only, r_only, bag)
+        st.write("**Cheapest fare per day (CHF)**")
+        st.dataframe(fare_grid(cal_df))
+        show_flights(cal_df, key="flt_cal")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # MISSION
 # ──────────────────────────────────────────────────────────────────────────────
 def render_mission():
+    import pandas as pd
+    from grid_edits import apply_list
     st.header("01. Mission")
-    tabs = st.tabs([
+    tabs = [
         "🛫 Flight Lookup",
         "🧾 Travel Authorization",
         "💼 DSA Declaration",
         "💳 Other Expenses",
         "🗄️ Travel Records"
-    ])
+    ]
+    tab = tab_bar(tabs, "mission_tab", MISSION_INPUTS)
 
     # Flight Lookup
-    with tabs[0]:
+    if tab==tabs[0]:
+        from flight_search import (plan_legs, search_trip, filter_table, calendar_queries,
+                                   stream_calendar, fare_grid)
         st.subheader("🔍 Flight Lookup")
         tp = st.radio("Trip Type",["One-way","Round-trip","Multi-destination"], key="flt_tp")
         cl = st.selectbox("Class",["ECONOMY","BUSINESS","FIRST"], key="flt_cl")
-        d_only = st.checkbox("Direct only", key="flt_dir")
-        r_only = st.checkbox("Refundable only", key="flt_ref")
-        bag    = st.checkbox("Include baggage", key="flt_bag")
+        # codes, metro codes (PAR) or city names; metro areas search every airport pair at once
+        mt = st.checkbox("🏙️ All airports of the city (e.g. IST + SAW)", key="flt_metro")
+        segs=[]
         if tp=="Multi-destination":
-            o1=st.text_input("Seg1 From (IATA)",key="flt_o1"); d1=st.text_input("Seg1 To",key="flt_d1")
-            dt1=st.date_input("Seg1 Date",key="flt_dt1")
-            o2=st.text_input("Seg2 From (IATA)",key="flt_o2"); d2=st.text_input("Seg2 To",key="flt_d2")
-            dt2=st.date_input("Seg2 Date",key="flt_dt2")
+            n_seg=st.number_input("Segments",min_value=2,max_value=6,value=2,step=1,key="flt_nseg")
+            for i in range(1,n_seg+1):
+                so=airport_input(f"Seg{i} From (IATA)",f"flt_o{i}",mt); sd=airport_input(f"Seg{i} To",f"flt_d{i}",mt)
+                segs.append((so,sd,st.date_input(f"Seg{i} Date",key=f"flt_dt{i}")))
+            o1=d1=dt1=dt2=None
         else:
-            o1=st.text_input("Origin IATA",key="flt_o"); d1=st.text_input("Destination IATA",key="flt_d")
+            o1=airport_input("Origin IATA","flt_o",mt); d1=airport_input("Destination IATA","flt_d",mt)
             dt1=st.date_input("Depart on",date.today(),key="flt_dt"); dt2=None
             if tp=="Round-trip":
                 dt2=st.date_input("Return on",date.today(),key="flt_rd")
+        cal=False
+        if tp!="Multi-destination":
+            cal=st.checkbox("📅 Fare calendar (flexible dates)", key="flt_cal")
+            span=st.slider("± days around the departure date",1,7,3,key="flt_span") if cal else 0
+        ends=[(o1,d1)] if tp!="Multi-destination" else [(so,sd) for so,sd,_ in segs]
         if st.button("Search Flights",key="flt_go"):
-            if tp=="Multi-destination":
-                show_flights(search_flights(o1,d1,str(dt1),cl))
-                show_flights(search_flights(o2,d2,str(dt2),cl))
+            # nothing goes to Amadeus until every airport is known
+            if not all(o and d for o,d in ends):
+                st.error("Enter a known airport code, metro code or city for every origin and destination.")
+            elif any(set(o)==set(d) for o,d in ends):
+                st.error("Origin and destination are the same airport(s).")
+            elif cal:
+                stay=(dt2-dt1).days if dt2 else None
+                grid_ph=st.empty(); parts=[]
+                # results stream into the grid as each date comes back
+                flt = [st.session_state.get(k,False) for k in ("flt_dir","flt_ref","flt_bag")]
+                for _,_,_,part in stream_calendar(calendar_queries(o1,d1,dt1,span,stay), cl):
+                    parts.append(part)
+                    grid_ph.dataframe(fare_grid(filter_table(pd.concat(parts), *flt)))
+                grid_ph.empty()
+                st.session_state.flt_cal_res=pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+                st.session_state.pop("flt_res",None)
             else:
-                offers = search_flights(o1,d1,str(dt1),cl)
-                filt=[]
-                for f in offers:
-                    seg=f["itineraries"][0]["segments"]
-                    if d_only and len(seg)>1: continue
-                    if r_only and not f["pricingOptions"].get("refundable"): continue
-                    if bag and f["travelerPricings"][0]["fareDetailsBySegment"][0]\
-                              .get("includedCheckedBags",{}).get("quantity",0)==0: continue
-                    filt.append(f)
-                show_flights(filt)
+                # all legs run concurrently; a slow leg shows up as partial results
+                st.session_state.flt_res,_ = search_trip(plan_legs(tp,o1,d1,dt1,dt2,segs), cl)
+                st.session_state.pop("flt_cal_res",None)
+        flight_results()
 
     # Travel Authorization
-    with tabs[1]:
+    if tab==tabs[1]:
         st.subheader("🧾 Travel Authorization")
         if "ta_list" not in st.session_state:
             st.session_state.ta_list=[]
         # auto-generate TA#
+        from core import ta_number
         nm = st.text_input("Traveler's Name", key="ta_nm")
-        ta_no=""
-        if nm:
-            parts=nm.split()
-            code=parts[0][0].upper()+ (parts[1][:2].upper() if len(parts)>1 else parts[0][1:3].upper())
-            yy=datetime.datetime.now().year%100
-            cnt=sum(1 for ta in st.session_state.ta_list if ta["Name"]==nm)+1
-            ta_no=f"TA-{code}-{yy:02d}-{cnt:03d}"
+        ta_no=ta_number(nm, st.session_state.ta_list)
         st.text_input("TA Number", value=ta_no, disabled=True, key="ta_no")
-        tt = st.radio("Trip Type",["One-way","Round-trip","Multi-destination"], key="ta_tp")
+        st.radio("Trip Type",["One-way","Round-trip","Multi-destination"], key="ta_tp")
         # project/fund/activity/budget
         p1,p2,p3,p4 = st.columns(4)
         proj = p1.text_input("Project Code", key="ta_proj")
@@ -257,28 +400,26 @@ def render_mission():
             st.success("Travel Authorization saved")
         if st.session_state.ta_list:
             df = pd.DataFrame(st.session_state.ta_list)
-            st.data_editor(df, num_rows="dynamic")
-            buf = BytesIO(); df.to_excel(buf,index=False)
-            st.download_button("⬇️ Export Authorizations",buf.getvalue(),"tas.xlsx")
+            edit_grid(df, "ta_grid", lambda e: apply_list(st.session_state.ta_list, e))
+            export_buttons("⬇️ Export Authorizations",df,"tas","ta_exp")
 
     # DSA Declaration
-    with tabs[2]:
+    if tab==tabs[2]:
+        import dsa_rates
+        from dsa_engine import MISSION_COLS, compute_dsa, mission_dsa, read_missions
+        from core import mission_rows
         st.subheader("💼 DSA Declaration")
-        # load local file only
-        if os.path.exists("Perdiem DSA 2025 par pays.xlsx"):
-            tmp=pd.read_excel("Perdiem DSA 2025 par pays.xlsx",sheet_name="Feuil1",skiprows=4)
-            tmp=tmp[['Country','Area','Full DSA.1','Lunch only.1','Dinner only.1']].dropna(subset=['Country'])
-            tmp.columns=['Country','Area','Full_DSA','Lunch_Only','Dinner_Only']
-            dsa_df=tmp
-        else:
+        # load local file only (compiled index, reloaded when the file changes)
+        dsa_idx = dsa_rates.load_index()
+        if dsa_idx is None:
             st.error("DSA file missing"); return
 
         if "missions" not in st.session_state:
             st.session_state.missions=[]
         nm2=st.text_input("Traveler's Name", key="dsa_nm2")
         ta2=st.text_input("TA Number", key="dsa_ta2")
-        country=st.selectbox("Country", sorted(dsa_df['Country']), key="dsa_ct2")
-        city=st.selectbox("City", sorted(dsa_df[dsa_df['Country']==country]['Area']), key="dsa_city2")
+        country=st.selectbox("Country", dsa_idx.countries, key="dsa_ct2")
+        city=st.selectbox("City", dsa_idx.areas[country], key="dsa_city2")
         d1,t1 = st.columns(2)
         dep_d = d1.date_input("Dep Date", date.today(), key="dsa_dd2")
         dep_t = d1.time_input("Dep Time", time(8,0),      key="dsa_dt2")
@@ -286,59 +427,65 @@ def render_mission():
         ret_t = t1.time_input("Ret Time", time(20,0),    key="dsa_rt2")
 
         # Deductions
-        dl,dm,dfc = st.columns(3)
         if 'ded_lunch' not in st.session_state: st.session_state.ded_lunch=0
         if 'ded_dinner' not in st.session_state: st.session_state.ded_dinner=0
         if 'ded_full'   not in st.session_state: st.session_state.ded_full=0
-        with dl:
-            st.write(f"Lunch Ded: {st.session_state.ded_lunch}")
-            if st.button("+ Lunch", key="dsa_al2"): st.session_state.ded_lunch+=1
-            if st.button("- Lunch", key="dsa_sl2") and st.session_state.ded_lunch>0: st.session_state.ded_lunch-=1
-        with dm:
-            st.write(f"Dinner Ded: {st.session_state.ded_dinner}")
-            if st.button("+ Dinner", key="dsa_ad2"): st.session_state.ded_dinner+=1
-            if st.button("- Dinner", key="dsa_sd2") and st.session_state.ded_dinner>0: st.session_state.ded_dinner-=1
-        with dfc:
-            st.write(f"Full Ded: {st.session_state.ded_full}")
-            if st.button("+ Full", key="dsa_af2"): st.session_state.ded_full+=1
-            if st.button("- Full", key="dsa_sf2") and st.session_state.ded_full>0: st.session_state.ded_full-=1
+        deduction_counters()
 
         receipts = st.file_uploader(
             "Upload receipts (pdf,jpg,png,msg,eml)",
             type=['pdf','jpg','jpeg','png','msg','eml'],
             accept_multiple_files=True,
-            key="dsa_recv2"
+            key=uploader_key("dsa_recv2")
         )
         if st.button("✅ Save Mission", key="dsa_save2"):
-            taux = dsa_df[(dsa_df['Country']==country)&(dsa_df['Area']==city)].iloc[0]
-            full,lun,din = map(float, (taux['Full_DSA'], taux['Lunch_Only'], taux['Dinner_Only']))
-            dt_dep = datetime.datetime.combine(dep_d, dep_t)
-            dt_ret = datetime.datetime.combine(ret_d, ret_t)
-            days = (dt_ret.date()-dt_dep.date()).days+1
-            d_dep = full if dep_t<time(10,0) else (din if dep_t<=time(14,0) else 0)
-            d_ret = full if ret_t>time(19,0) else (lun if ret_t>=time(13,0) else 0)
-            mid   = max(days-2,0)
-            tot   = d_dep + d_ret + mid*full
-            ded   = st.session_state.ded_lunch*lun + st.session_state.ded_dinner*din + st.session_state.ded_full*full
-            final = tot - ded
+            receipt_handles(receipts or [], ta2, "dsa", len(st.session_state.missions))
+            days,final = mission_dsa(country, city, dep_d, dep_t, ret_d, ret_t,
+                                     st.session_state.ded_lunch, st.session_state.ded_dinner,
+                                     st.session_state.ded_full, dsa_idx)
             st.session_state.missions.append({
                 "Name":nm2, "TA":ta2,
                 "Country":country, "City":city,
                 "Days":days, "Total DSA":final,
                 "Attachments":len(receipts or [])
             })
-            st.success("DSA mission saved.")
+            clear_uploader("dsa_recv2")
+            flash("dsa", "DSA mission saved.")
+        flash("dsa")
         if st.session_state.missions:
             dfm = pd.DataFrame(st.session_state.missions)
-            st.data_editor(dfm, num_rows="dynamic")
-            buf = BytesIO(); dfm.to_excel(buf,index=False)
-            st.download_button("⬇️ Export Missions",buf.getvalue(),"dsa_missions.xlsx")
+            edit_grid(dfm, "dsa_grid", lambda e: apply_list(st.session_state.missions, e))
+            export_buttons("⬇️ Export Missions",dfm,"dsa_missions","dsa_exp")
+
+        # Bulk import: a whole file of missions through the vectorized engine
+        with st.expander("📥 Bulk DSA calculation (CSV/xlsx)"):
+            st.caption("Columns: "+", ".join(MISSION_COLS)+" (deductions optional)")
+            bulk=st.file_uploader("Missions file", type=["csv","xlsx"], key="dsa_bulk")
+            if bulk is not None:
+                try:
+                    res=compute_dsa(read_missions(bulk), dsa_idx)
+                except (ValueError, TypeError) as e:   # missing columns, unreadable dates
+                    st.error(f"❌ {e}")
+                else:
+                    if not res["Rate found"].all():
+                        st.warning(f"{(~res['Rate found']).sum()} mission(s) with no DSA rate for their Country/City.")
+                    st.metric("Total DSA (CHF)", f"{res['Total DSA'].sum():,.2f}")
+                    st.dataframe(res, hide_index=True)
+                    export_buttons("⬇️ Export Computed DSA",res,"dsa_bulk","dsa_bulk_exp")
+                    if st.button("➕ Add to missions", key="dsa_bulk_add"):
+                        st.session_state.missions += mission_rows(res)
+                        st.success(f"{len(res)} mission(s) added.")
 
     # Other Expenses
-    with tabs[3]:
+    if tab==tabs[3]:
+        import currency
+        from core import ACCOUNT_CODES, expense_chf
+        from records_db import init_db
+        from receipts import list_receipts, open_receipt
+        from claim_pack import group_packs, build_packs
         st.subheader("💳 Other Expenses")
         if 'expenses' not in st.session_state: st.session_state.expenses=[]
-        if 'exp_files' not in st.session_state: st.session_state.exp_files={}
+        if 'exp_files' not in st.session_state: st.session_state.exp_files={}   # row -> receipt handles
 
         # Traveler’s Name, TA Number, Submission Date
         c1,c2,c3 = st.columns(3)
@@ -349,9 +496,8 @@ def render_mission():
         # then existing fields
         e1,e2,e3 = st.columns(3)
         office    = e1.selectbox("Office", ["Geneva","Tunis","Beirut","Amman","Cairo","Other"], key="exp_off2")
-        codes     = {"Consultancy fee":"60100","Taxi Fare":"62000","Room fees":"63000","Other":"60990"}
-        category  = e2.selectbox("Category", list(codes.keys()), key="exp_cat2b")
-        acct_code = codes[category]
+        category  = e2.selectbox("Category", list(ACCOUNT_CODES), key="exp_cat2b")
+        acct_code = ACCOUNT_CODES[category]
         e2.markdown(f"📘 Code: **{acct_code}**")
         desc      = e3.text_input("Description", key="exp_desc2b")
 
@@ -361,23 +507,37 @@ def render_mission():
         act       = a4.text_input("Activity Code", key="exp_ac2b")
         bd        = st.text_input("Budget Line",   key="exp_bd2b")
 
-        cur  = st.selectbox("Currency", ["CHF","EUR","USD"], key="exp_cur2b")
+        cur  = st.selectbox("Currency", currency.options(), key="exp_cur2b")
         amt  = st.number_input("Amount", min_value=0.0, key="exp_amt2b")
-        rate = st.number_input("Exchange Rate", value=1.0, key="exp_rate2b")
+        rate, eff = currency.rate(cur, sub_date)
+        if not eff:
+            st.warning(f"No {cur} rate in force on {sub_date}; enter it manually or add it under 💱 Exchange rates.")
+            rate = st.number_input("Exchange Rate", value=1.0, key="exp_rate2b")
+        elif cur!=currency.BASE:
+            st.caption(f"Rate {rate:,.4f} CHF/{cur}, effective {eff}")
         chf  = round(amt*rate,2)
         st.markdown(f"💰 In CHF: **{chf}**")
+        with st.expander("💱 Exchange rates"):
+            st.dataframe(currency.rate_table().sort_values(["Code","Effective"]), hide_index=True)
+            x1,x2,x3,x4 = st.columns([2,2,2,1])
+            fx_code = x1.selectbox("Currency", currency.options(rated_only=False), key="fx_code")
+            fx_rate = x2.number_input(f"CHF per 1 {fx_code}", min_value=0.0, format="%.6f", key="fx_rate")
+            fx_eff  = x3.date_input("Effective from", date.today(), key="fx_eff")
+            if x4.button("➕ Add", key="fx_add") and fx_rate>0:
+                currency.add_rate(fx_code, fx_rate, fx_eff)
+                st.success(f"{fx_code} rate from {fx_eff} saved.")
 
         ups = st.file_uploader(
             "Upload receipts (pdf,jpg,png,msg,eml)",
             type=['pdf','jpg','jpeg','png','msg','eml'],
             accept_multiple_files=True,
-            key="exp_up2b"
+            key=uploader_key("exp_up2b")
         )
-        if ups:
-            st.session_state.exp_files[len(st.session_state.expenses)] = [(f.name,f.getvalue()) for f in ups]
-            st.success(f"{len(ups)} file(s) attached.")
 
         if st.button("➕ Add Entry", key="exp_add2b"):
+            # receipts are linked to the row only once it exists
+            row = len(st.session_state.expenses)
+            files = st.session_state.exp_files[row] = receipt_handles(ups or [], ta_num, "expense", row)
             st.session_state.expenses.append({
                 "Traveler":   traveler,
                 "TA Number":  ta_num,
@@ -394,87 +554,317 @@ def render_mission():
                 "Amount":     amt,
                 "Rate":       rate,
                 "CHF":        chf,
-                "Files":      "; ".join(n for n,_ in st.session_state.exp_files.get(len(st.session_state.expenses),[]))
+                "Files":      "; ".join(h["name"] for h in files)
             })
-            st.success("Expense added.")
+            clear_uploader("exp_up2b")
+            flash("exp", f"Expense added with {len(files)} file(s)." if files else "Expense added.")
+        flash("exp")
+        if ta_num:
+            on_file=list_receipts(init_db(), ta=ta_num)
+            if on_file:
+                with st.expander(f"📎 Receipts on file for {ta_num} ({len(on_file)})"):
+                    for i,r in enumerate(on_file):
+                        st.download_button(f"{r['name']} · {r['kind']} row {r['row_ref']} · {r['size']/1024:,.0f} KB",
+                                           lambda sha=r["sha256"]: open_receipt(sha), r["name"], key=f"rcpt_{i}")
         if st.session_state.expenses:
             dfe = pd.DataFrame(st.session_state.expenses)
-            st.data_editor(dfe, num_rows="dynamic")
-            buf = BytesIO(); dfe.to_excel(buf,index=False)
-            st.download_button("⬇️ Export Expenses",buf.getvalue(),"expenses.xlsx")
+            dfe["CHF"] = expense_chf(dfe)
+            edit_grid(dfe, "exp_grid", lambda e: apply_list(st.session_state.expenses, e), disabled=["CHF"])
+            st.metric("Total expenses (CHF)", f"{dfe['CHF'].sum():,.2f}")
+            export_buttons("⬇️ Export Expenses",dfe,"expenses","exp_exp")
+
+        # Claim packs: TA, DSA and expense pages plus receipts, one PDF per TA
+        packs = group_packs(st.session_state.get("ta_list",[]), st.session_state.get("missions",[]),
+                            st.session_state.expenses)
+        if packs:
+            with st.expander(f"📦 Claim packs ({len(packs)} TA)"):
+                if st.button("🛠️ Build claim packs", key="cp_build"):
+                    conn = init_db()
+                    for p in packs: p["receipts"] = list_receipts(conn, ta=p["ta"])
+                    bar = st.progress(0.0, "Building claim packs…"); paths = []
+                    for done,total,path in build_packs(packs, CLAIM_DIR):
+                        paths.append(path); bar.progress(done/total, f"{done}/{total} packs")
+                    st.session_state.cp_paths = sorted(paths)
+                if st.session_state.get("cp_paths"):
+                    st.download_button("⬇️ Download all (zip)", lambda: zip_files(st.session_state.cp_paths),
+                                       "claim_packs.zip", "application/zip", key="cp_zip")
+                    for i,p in enumerate(st.session_state.cp_paths):
+                        if os.path.exists(p):
+                            st.download_button(os.path.basename(p), lambda p=p: open(p,"rb"),
+                                               os.path.basename(p), "application/pdf", key=f"cp_{i}")
 
     # Travel Records
-    with tabs[4]:
+    if tab==tabs[4]:
+        import dashboard, exports
+        from records_db import (init_db, insert_record, SORTABLE, BEST_MATCH, RANK_MAX, count_records, page_records,
+                                filtered_query, column_types, save_edits, ticket_keyed, ticket_dupes)
+        from backup import start_scheduler
+        from core import trip_record
+        from co2 import unknown
         st.subheader("🗄️ Travel Records")
-        conn = init_db(); backup_excel(conn)
-        s1,s2,s3 = st.tabs(["📝 New Trip","📊 Records","📈 Dashboard"])
-        with s1:
+        conn = init_db(); start_scheduler()   # daily Excel backup runs in the background
+        if not ticket_keyed(conn):
+            st.warning(f"{ticket_dupes(conn)} older duplicate ticket/invoice row(s) in the records; "
+                       "record imports are blocked until `python cli.py dedupe` moves them to records_dupes_removed.")
+        subs = ["📝 New Trip","📊 Records","📈 Dashboard"]
+        sub = tab_bar(subs, "rec_tab", RECORD_INPUTS)
+        if sub==subs[0]:
             st.write("**Record a New Trip**")
             a1,a2,a3=st.columns(3)
             tr=a1.text_input("Traveler",key="rec_tr2")
             ps=a2.selectbox("Position",["Staff","Consultant","Guest"],key="rec_pos2")
             tn=a3.text_input("TA Number",key="rec_ta3b")
-            it=st.text_input("Itinerary",key="rec_it2b")
+            it=st.text_input("Itinerary",key="rec_it2b",placeholder="GVA-BEY-GVA")
             dp=st.date_input("Depart",date.today(),key="rec_dp2b")
             rt=st.date_input("Return",date.today(),key="rec_rt2b")
             cls=st.selectbox("Class",["Economy","Business"],key="rec_cls2b")
             fare=st.number_input("Fare (CHF)",min_value=0.0,key="rec_fare2b")
             if st.button("Save Trip",key="rec_save2b"):
-                conn.execute("""
-                  INSERT INTO records (
-                    traveler,position,ta,itinerary,departure_date,return_date,
-                    travel_class,final_fare,created_at
-                  ) VALUES (?,?,?,?,?,?,?,?,?)
-                """,(
-                    tr,ps,tn,it,dp.isoformat(),rt.isoformat(),
-                    cls,fare,datetime.datetime.now().isoformat()
-                ))
-                conn.commit(); st.success("Trip saved")
-        with s2:
-            df=pd.read_sql_query("SELECT * FROM records ORDER BY id DESC",conn)
-            if df.empty:
+                # queued to the shared writer thread, grouped with other sessions' inserts
+                rec=trip_record(tr, ps, tn, it, dp, rt, cls, fare)
+                insert_record(rec).result(timeout=30)
+                co2=rec["co2_tons"]
+                bad = unknown(it) if co2 is None else []
+                st.success("Trip saved" + (f" · {co2:,.3f} t CO2e" if co2 is not None else
+                                           f" · CO2 not computed (not airport codes: {', '.join(bad)})" if bad else
+                                           " · CO2 not computed (no flight legs in the itinerary)"))
+        if sub==subs[1]:
+            # filters/sort run in SQLite, one page at a time (keyset pagination);
+            # the search box goes through the full-text index, best matches first
+            q=st.text_input("🔎 Search",key="rb_q",placeholder="name, TA, route, e-ticket, invoice or remark – e.g. sami bey")
+            f1,f2,f3,f4,f5 = st.columns(5)
+            flt = dict(q=q,
+                       traveler=f1.text_input("Traveler",key="rb_tr",help="Start of the name; any word of it: 🔎 Search"),
+                       ta=f2.text_input("TA",key="rb_ta",help="Start of the TA number"),
+                       project=f3.text_input("Project",key="rb_pj"),
+                       dep_from=f4.date_input("Departs from",value=None,key="rb_df"),
+                       dep_to=f5.date_input("Departs to",value=None,key="rb_dt"))
+            if st.session_state.get("rb_searching")!=bool(q.strip()):
+                # a new search starts ranked; clearing it goes back to the plain list
+                st.session_state.rb_searching=bool(q.strip())
+                if q.strip() or st.session_state.get("rb_sort")==BEST_MATCH:
+                    st.session_state.rb_sort=BEST_MATCH if q.strip() else "Newest first"
+            sort=st.selectbox("Sort by",([BEST_MATCH] if q.strip() else [])+list(SORTABLE),key="rb_sort")
+            sig=(tuple(flt.items()),sort)
+            if st.session_state.get("rb_sig")!=sig:
+                st.session_state.rb_sig=sig; st.session_state.rb_pages=[None]; regrid("rb_grid")
+            pages=st.session_state.rb_pages
+            total=count_records(conn,**flt)
+            if not total:
                 st.info("No records.")
             else:
-                st.data_editor(df, num_rows="dynamic")
-                buf=BytesIO(); df.to_excel(buf,index=False)
-                st.download_button("⬇️ Export Records",buf.getvalue(),"records.xlsx")
-        with s3:
-            df=pd.read_sql_query("SELECT * FROM records",conn)
-            st.metric("Total Trips",len(df))
+                order=sort
+                if sort==BEST_MATCH and total>RANK_MAX: order="Newest first"
+                cols,rows,nxt=grid_rows("rb_grid", lambda: page_records(conn,order,pages[-1],PAGE_SIZE,**flt))
+                st.caption(f"{total:,} trip(s) · page {len(pages)} of {-(-total//PAGE_SIZE)}"
+                           +(" · too many matches to rank, newest first – add a word to narrow the search" if order!=sort else ""))
+                edit_grid(pd.DataFrame(rows,columns=cols), "rb_grid",
+                          lambda e: save_edits(rows, e).result(timeout=30), disabled=["id","created_at"])
+                b1,b2,_=st.columns([1,1,6])
+                if b1.button("◀ Prev",disabled=len(pages)==1,key="rb_prev"):
+                    pages.pop(); regrid("rb_grid"); st.rerun()
+                if b2.button("Next ▶",disabled=nxt is None,key="rb_next"):
+                    pages.append(nxt); regrid("rb_grid"); st.rerun()
+                # streamed from SQLite in chunks, only when a button is clicked
+                sql,params=filtered_query(**flt)
+                export_buttons("⬇️ Export Records",
+                               lambda fmt: exports.query_file(conn,sql,params,fmt,column_types(conn)),
+                               "records","rb_exp")
+        if sub==subs[2]:
+            # pre-aggregated by triggers on records, never scans the full history
+            tot=dashboard.totals(conn)
+            m1,m2,m3=st.columns(3)
+            m1.metric("Total Trips",f"{tot['trips']:,}")
+            m2.metric("Total Spend (CHF)",f"{tot['spend']:,.2f}")
+            m3.metric("Days Travelled",f"{tot['days']:,}")
+            pj=st.selectbox("Project",["All"]+dashboard.projects(conn),key="dash_pj")
+            sm=dashboard.spend_by_month(conn, None if pj=="All" else pj)
+            if not sm.empty:
+                st.bar_chart(sm.set_index("Month")["Spend"])
+            d1,d2=st.columns(2)
+            d1.write("**Spend by project / fund**"); d1.dataframe(dashboard.spend_by_project(conn),hide_index=True)
+            d2.write("**Average fare by class**");  d2.dataframe(dashboard.avg_fare_by_class(conn),hide_index=True)
+            st.write("**Trips per traveler**");    st.dataframe(dashboard.trips_per_traveler(conn),hide_index=True)
+
+# --- Meeting cost groups ---
+@st.fragment
+def meeting_costs(num_pax, meta, participants):
+    # cost blocks and their CHF total rerun on their own; pax comes from the form above
+    import pandas as pd
+    import currency
+    from grid_edits import apply_list
+    from meetings import save_meeting
+    ledger = []  # (category, currency, qty, unit amount, amount, details) of every cost line
+
+    # --- Flight International ---
+    st.markdown("### Flight Intl")
+    f1, f2, f3, f4 = st.columns([2, 1, 1, 4])
+    fi_cur = f1.selectbox("Currency", currency.options(), key="fi_cur")
+    fi_pp  = f2.number_input("Amt/Pax", min_value=0.0, key="fi_pp")
+    fi_tot = fi_pp * num_pax
+    f3.metric("Total", f"{fi_tot:,.2f} {fi_cur}")
+    fi_det = f4.text_input("Details", key="fi_det")
+    ledger.append(("Flight Intl", fi_cur, num_pax, fi_pp, fi_tot, fi_det))
+
+    # --- Reimbursement (same form) ---
+    st.markdown("### Reimbursement")
+    r1, r2, r3, r4 = st.columns([2,1,1,4])
+    r_cur = r1.selectbox("Currency", currency.options(), key="r_cur")
+    r_pp  = r2.number_input("Amt/Pax", min_value=0.0, key="r_pp")
+    r_tot = r_pp * num_pax
+    r1.metric("Total", f"{r_tot:,.2f} {r_cur}")
+    r_det = r4.text_input("Details", key="r_det")
+    ledger.append(("Reimbursement", r_cur, num_pax, r_pp, r_tot, r_det))
+
+    # --- Audio Equipment (same form) ---
+    st.markdown("### Audio Equipment")
+    a1, a2, a3, a4 = st.columns([2,1,1,4])
+    ae_cur = a1.selectbox("Currency", currency.options(), key="ae_cur")
+    ae_pp  = a2.number_input("Amt/Pax", min_value=0.0, key="ae_pp")
+    ae_tot = ae_pp * num_pax
+    a1.metric("Total", f"{ae_tot:,.2f} {ae_cur}")
+    ae_det = a4.text_input("Details", key="ae_det")
+    ledger.append(("Audio Equipment", ae_cur, num_pax, ae_pp, ae_tot, ae_det))
+
+    # --- Expenses – Subject to PO ---
+    st.markdown("### Expenses – Subject to PO")
+    # Hotel
+    h1, h2, h3, h4 = st.columns([2,1,1,4])
+    hotel_cur = h1.selectbox("Hotel – Currency", currency.options(), key="hotel_cur")
+    hotel_pp  = h2.number_input("Amt/Pax", min_value=0.0, key="hotel_pp")
+    hotel_tot = hotel_pp * num_pax
+    h3.metric("Total", f"{hotel_tot:,.2f} {hotel_cur}")
+    hotel_det = h4.text_input("Details", key="hotel_det")
+    ledger.append(("Hotel", hotel_cur, num_pax, hotel_pp, hotel_tot, hotel_det))
+
+    # Catering
+    c1, c2, c3, c4 = st.columns([2,1,1,4])
+    cat_cur = c1.selectbox("Catering – Currency", currency.options(), key="cat_cur")
+    cat_pp  = c2.number_input("Amt/Pax", min_value=0.0, key="cat_pp")
+    cat_tot = cat_pp * num_pax
+    c3.metric("Total", f"{cat_tot:,.2f} {cat_cur}")
+    cat_det = c4.text_input("Details", key="cat_det")
+    ledger.append(("Catering", cat_cur, num_pax, cat_pp, cat_tot, cat_det))
+
+    # Ground Transportation
+    g1, g2, g3, g4 = st.columns([1,1,1,4])
+    gt_transfers = g1.number_input("# Transfers", min_value=0, step=1, key="gt_tr")
+    gt_cur       = g2.selectbox("Currency", currency.options(), key="gt_cur")
+    gt_pp        = g3.number_input("Amt/Transfer", min_value=0.0, key="gt_pp")
+    gt_tot       = gt_transfers * gt_pp
+    g3.metric("Total", f"{gt_tot:,.2f} {gt_cur}")
+    gt_det       = g4.text_input("Details", key="gt_det")
+    ledger.append(("Ground Transportation", gt_cur, gt_transfers, gt_pp, gt_tot, gt_det))
+
+    # --- Additional Expenses dynamic ---
+    st.markdown("### Other Expenses")
+    if "other_expenses" not in st.session_state:
+        st.session_state.other_expenses = []
+    oe1, oe2, oe3, oe4 = st.columns([3,1,1,4])
+    oe_name = oe1.text_input("Expense", key="oe_name")
+    oe_cur  = oe2.selectbox("", currency.options(), key="oe_cur", label_visibility="collapsed")
+    oe_amt  = oe3.number_input("", min_value=0.0, key="oe_amt", label_visibility="collapsed")
+    oe_det  = oe4.text_input("", key="oe_det", label_visibility="collapsed")
+    if st.button("➕ Add Other Expense"):
+        st.session_state.other_expenses.append({
+            "Expense": oe_name,
+            "Currency": oe_cur,
+            "Amount": oe_amt,
+            "Details": oe_det
+        })
+        st.success("Other expense added.")
+    if st.session_state.other_expenses:
+        df_oe = pd.DataFrame(st.session_state.other_expenses)
+        edit_grid(df_oe, "oe_grid", lambda e: apply_list(st.session_state.other_expenses, e))
+        ledger += [("Other", r["Currency"], 1, r["Amount"], r["Amount"],
+                    ": ".join(x for x in (r["Expense"], r["Details"]) if x))
+                   for r in st.session_state.other_expenses]
+
+    # --- Total Meeting Authorisation ---
+    st.markdown("---")
+    total_meeting = chf_total([(l[4], l[1]) for l in ledger])
+    st.markdown(f"## 🧾 Total Meeting Authorisation: {total_meeting:,.2f} CHF")
+    if st.button("💾 Save to Meetings Ledger", key="mtg_save"):
+        mf = meta.get("MF #","").strip()
+        if not mf:
+            st.warning("Save the meeting details with an MF # first.")
+        else:
+            n = save_meeting(meta, participants, num_pax, ledger).result(timeout=30)
+            st.success(f"{mf} saved with {n} authorised cost line(s).")
+
+@st.fragment
+def effective_costs():
+    import currency
+    from records_db import init_db
+    from meetings import mf_numbers, save_effective
+    conn = init_db()
+    mfs = mf_numbers(conn)
+    if not mfs:
+        st.info("Save a meeting from the Meeting Form first; effective costs are recorded against its MF #.")
+        return
+    mf = st.selectbox("MF #", mfs, key="eff_mf")
+    lines = []
+    components = [
+        ("Flights", "eff_flights"),
+        ("Hotel",   "eff_hotel"),
+        ("Ground Transportation", "eff_gt"),
+        ("DSA",     "eff_dsa"),
+        ("Catering","eff_cat"),
+        ("Audio Equipment","eff_ae")
+    ]
+    for label, key in components:
+        c1, c2 = st.columns([3,1])
+        with c1:
+            cur = st.selectbox(f"{label} – Currency", currency.options(), key=f"{key}_cur")
+        with c2:
+            amt = st.number_input(f"{label} – Total Amount", min_value=0.0, value=0.0, key=f"{key}_amt")
+        lines.append((label, cur, None, None, amt, ""))
+        st.write("")
+    st.markdown("---")
+    total_eff = chf_total([(l[4], l[1]) for l in lines])
+    st.markdown(f"## 💰 Total Effective Meeting Cost: {total_eff:,.2f} CHF")
+    auth = conn.execute("SELECT authorised_chf FROM meetings WHERE mf=?", (mf,)).fetchone()[0]
+    st.caption(f"Authorised {auth:,.2f} CHF · variance {total_eff-auth:+,.2f} CHF")
+    if st.button("💾 Save Effective Costs", key="eff_save"):
+        n = save_effective(mf, lines).result(timeout=30)
+        st.success(f"{n} effective cost line(s) saved for {mf}.")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # MEETING
 # ──────────────────────────────────────────────────────────────────────────────
 def render_meeting():
     import pandas as pd
-    from io import BytesIO
+    from records_db import init_db
+    import meetings
+    conn = init_db()
 
     st.header("02. Meeting")
 
-    tabs = st.tabs([
+    tabs = [
         "📝 Meeting Form",
         "📈 Effective Cost",
         "📋 Meeting List",
         "🛒 PO Follow-up"
-    ])
+    ]
+    tab = tab_bar(tabs, "meeting_tab", MEETING_INPUTS)
 
     # ──────────────────────────────────────────────────────────────────────────
     # TAB 1: Meeting Form
     # ──────────────────────────────────────────────────────────────────────────
-    with tabs[0]:
+    if tab==tabs[0]:
         st.subheader("Meeting Form")
 
         # --- Metadata form ---
         with st.form("meeting_meta"):
             c1, c2, c3 = st.columns([3, 2, 3])
-            meeting_name = c1.text_input("Event Name", placeholder="e.g. MF08 NARD meeting in Glion 06–07 MAY")
-            mf_number    = c2.text_input("MF #",       placeholder="e.g. MF-NARD-25-008")
-            meeting_loc  = c3.text_input("Location",   placeholder="e.g. Glion")
+            meeting_name = c1.text_input("Event Name", placeholder="e.g. MF08 NARD meeting in Glion 06–07 MAY", key="mtg_name")
+            mf_number    = c2.text_input("MF #",       placeholder="e.g. MF-NARD-25-008", key="mtg_mf")
+            meeting_loc  = c3.text_input("Location",   placeholder="e.g. Glion", key="mtg_loc")
 
             c4, c5, c6 = st.columns(3)
-            proj_code    = c4.text_input("Project Code", placeholder="e.g. NARD")
-            fund_code    = c5.text_input("Fund Code",    placeholder="e.g. CHE150")
-            manual_pax   = c6.number_input("Number of Pax", min_value=1, value=1)
+            proj_code    = c4.text_input("Project Code", placeholder="e.g. NARD", key="mtg_proj")
+            fund_code    = c5.text_input("Fund Code",    placeholder="e.g. CHE150", key="mtg_fund")
+            manual_pax   = c6.number_input("Number of Pax", min_value=1, value=1, key="mtg_pax")
 
             if st.form_submit_button("✔ Save Meeting Details"):
                 st.session_state._meeting_meta = {
@@ -490,167 +880,86 @@ def render_meeting():
         meta = st.session_state.get("_meeting_meta", {})
 
         # --- Participants & auto pax count ---
-        parts_text = st.text_area("List of Participants (one per line)", height=150)
-        participants = [p.strip() for p in parts_text.splitlines() if p.strip()]
+        from core import participants as split_names
+        parts_text = st.text_area("List of Participants (one per line)", height=150, key="mtg_parts")
+        participants = split_names(parts_text)
         computed_pax = len(participants)
         st.markdown(f"**Computed Pax:** {computed_pax}")
         num_pax = computed_pax or meta.get("Manual Pax", 1)
 
-        total_meeting = 0.0
-
-        # --- Flight International ---
-        st.markdown("### Flight Intl")
-        f1, f2, f3, f4 = st.columns([2, 1, 1, 4])
-        fi_cur = f1.selectbox("Currency", ["CHF","EUR","USD"], key="fi_cur")
-        fi_pp  = f2.number_input("Amt/Pax", min_value=0.0, key="fi_pp")
-        fi_tot = fi_pp * num_pax
-        f3.metric("Total", f"{fi_tot:,.2f} {fi_cur}")
-        fi_det = f4.text_input("Details", key="fi_det")
-        total_meeting += fi_tot
-
-        # --- Reimbursement (same form) ---
-        st.markdown("### Reimbursement")
-        r1, r2, r3, r4 = st.columns([2,1,1,4])
-        r_cur = r1.selectbox("Currency", ["CHF","EUR","USD"], key="r_cur")
-        r_pp  = r2.number_input("Amt/Pax", min_value=0.0, key="r_pp")
-        r_tot = r_pp * num_pax
-        r1.metric("Total", f"{r_tot:,.2f} {r_cur}")
-        r_det = r4.text_input("Details", key="r_det")
-        total_meeting += r_tot
-
-        # --- Audio Equipment (same form) ---
-        st.markdown("### Audio Equipment")
-        a1, a2, a3, a4 = st.columns([2,1,1,4])
-        ae_cur = a1.selectbox("Currency", ["CHF","EUR","USD"], key="ae_cur")
-        ae_pp  = a2.number_input("Amt/Pax", min_value=0.0, key="ae_pp")
-        ae_tot = ae_pp * num_pax
-        a1.metric("Total", f"{ae_tot:,.2f} {ae_cur}")
-        ae_det = a4.text_input("Details", key="ae_det")
-        total_meeting += ae_tot
-
-        # --- Expenses – Subject to PO ---
-        st.markdown("### Expenses – Subject to PO")
-        # Hotel
-        h1, h2, h3, h4 = st.columns([2,1,1,4])
-        hotel_cur = h1.selectbox("Hotel – Currency", ["CHF","EUR","USD"], key="hotel_cur")
-        hotel_pp  = h2.number_input("Amt/Pax", min_value=0.0, key="hotel_pp")
-        hotel_tot = hotel_pp * num_pax
-        h3.metric("Total", f"{hotel_tot:,.2f} {hotel_cur}")
-        hotel_det = h4.text_input("Details", key="hotel_det")
-        total_meeting += hotel_tot
-
-        # Catering
-        c1, c2, c3, c4 = st.columns([2,1,1,4])
-        cat_cur = c1.selectbox("Catering – Currency", ["CHF","EUR","USD"], key="cat_cur")
-        cat_pp  = c2.number_input("Amt/Pax", min_value=0.0, key="cat_pp")
-        cat_tot = cat_pp * num_pax
-        c3.metric("Total", f"{cat_tot:,.2f} {cat_cur}")
-        cat_det = c4.text_input("Details", key="cat_det")
-        total_meeting += cat_tot
-
-        # Ground Transportation
-        g1, g2, g3, g4 = st.columns([1,1,1,4])
-        gt_transfers = g1.number_input("# Transfers", min_value=0, step=1, key="gt_tr")
-        gt_cur       = g2.selectbox("Currency", ["CHF","EUR","USD"], key="gt_cur")
-        gt_pp        = g3.number_input("Amt/Transfer", min_value=0.0, key="gt_pp")
-        gt_tot       = gt_transfers * gt_pp
-        g3.metric("Total", f"{gt_tot:,.2f} {gt_cur}")
-        gt_det       = g4.text_input("Details", key="gt_det")
-        total_meeting += gt_tot
-
-        # --- Additional Expenses dynamic ---
-        st.markdown("### Other Expenses")
-        if "other_expenses" not in st.session_state:
-            st.session_state.other_expenses = []
-        oe1, oe2, oe3, oe4 = st.columns([3,1,1,4])
-        oe_name = oe1.text_input("Expense", key="oe_name")
-        oe_cur  = oe2.selectbox("", ["CHF","EUR","USD"], key="oe_cur", label_visibility="collapsed")
-        oe_amt  = oe3.number_input("", min_value=0.0, key="oe_amt", label_visibility="collapsed")
-        oe_det  = oe4.text_input("", key="oe_det", label_visibility="collapsed")
-        if st.button("➕ Add Other Expense"):
-            st.session_state.other_expenses.append({
-                "Expense": oe_name,
-                "Currency": oe_cur,
-                "Amount": oe_amt,
-                "Details": oe_det
-            })
-            st.success("Other expense added.")
-        if st.session_state.other_expenses:
-            df_oe = pd.DataFrame(st.session_state.other_expenses)
-            st.data_editor(df_oe, num_rows="dynamic")
-            oe_total = df_oe["Amount"].sum()
-            total_meeting += oe_total
-
-        # --- Total Meeting Authorisation ---
-        st.markdown("---")
-        st.markdown(f"## 🧾 Total Meeting Authorisation: {total_meeting:,.2f} CHF")
+        meeting_costs(num_pax, meta, participants)
 
     # ──────────────────────────────────────────────────────────────────────────
     # TAB 2: Effective Cost (manual zeros)
     # ──────────────────────────────────────────────────────────────────────────
-    with tabs[1]:
+    if tab==tabs[1]:
         st.subheader("📈 Effective Cost")
-        total_eff = 0.0
-        components = [
-            ("Flights", "eff_flights"),
-            ("Hotel",   "eff_hotel"),
-            ("Ground Transportation", "eff_gt"),
-            ("DSA",     "eff_dsa"),
-            ("Catering","eff_cat"),
-            ("Audio Equipment","eff_ae")
-        ]
-        for label, key in components:
-            c1, c2 = st.columns([3,1])
-            with c1:
-                st.selectbox(f"{label} – Currency", ["CHF","EUR","USD"], key=f"{key}_cur")
-            with c2:
-                amt = st.number_input(f"{label} – Total Amount", min_value=0.0, value=0.0, key=f"{key}_amt")
-            total_eff += amt
-            st.write("")
-        st.markdown("---")
-        st.markdown(f"## 💰 Total Effective Meeting Cost: {total_eff:,.2f} CHF")
+        effective_costs()
 
     # ──────────────────────────────────────────────────────────────────────────
     # TAB 3: Meeting List
     # ──────────────────────────────────────────────────────────────────────────
-    with tabs[2]:
+    if tab==tabs[2]:
         st.subheader("📋 Meeting List")
-        dfm = pd.DataFrame(st.session_state.get("meetings", []))
-        if dfm.empty:
+        rows = grid_rows("mtg_grid", lambda: meetings.meeting_rows(conn))
+        if not rows:
             st.info("No meetings saved yet.")
         else:
-            st.data_editor(dfm, num_rows="dynamic")
+            # totals and variance come from the trigger-maintained columns; deleting a meeting drops its lines and POs
+            edit_grid(pd.DataFrame(rows), "mtg_grid", lambda e: meetings.save_edits(rows, e).result(timeout=30),
+                      disabled=["mf","authorised_chf","effective_chf","variance_chf"], num_rows="delete")
+            st.write("**Portfolio by project / fund**")
+            st.dataframe(meetings.portfolio(conn), hide_index=True)
+            mf = st.selectbox("Cost lines of", [r["mf"] for r in rows], key="mtg_detail")
+            l1, l2 = st.columns(2)
+            l1.write("**Authorised**"); l1.dataframe(meetings.lines(conn, mf, "authorised"), hide_index=True)
+            l2.write("**Effective**");  l2.dataframe(meetings.lines(conn, mf, "effective"), hide_index=True)
+            if (cur := meetings.unrated(conn, mf)):
+                st.warning(f"No exchange rate was in force for {', '.join(cur)} when saved; those lines are not in the totals.")
 
     # ──────────────────────────────────────────────────────────────────────────
     # TAB 4: PO Follow-up
     # ──────────────────────────────────────────────────────────────────────────
-    with tabs[3]:
+    if tab==tabs[3]:
         st.subheader("🛒 Purchase Order Follow-up")
-        if "po" not in st.session_state:
-            st.session_state.po = []
-        last_mf = st.session_state.get("meetings", [{}])[-1].get("MF #", "")
+        mfs = meetings.mf_numbers(conn)
+        if not mfs:
+            st.info("Save a meeting from the Meeting Form first; POs are filed under its MF #.")
+            return
+        mf    = st.selectbox("MF #", mfs, key="po_mf_mtg")
         po_no = st.text_input("PO Number", key="po_no_mtg")
         po_dt = st.date_input("Order Date", date.today(), key="po_date_mtg")
-        status= st.selectbox("Status", ["Open","In Progress","Closed"], key="po_status_mtg")
+        status= st.selectbox("Status", meetings.PO_STATUS, key="po_status_mtg")
         if st.button("💾 Save PO Follow-up"):
-            st.session_state.po.append({
-                "MF #": last_mf,
-                "PO": po_no,
-                "Date": str(po_dt),
-                "Status": status
-            })
-            st.success("PO follow-up saved.")
-        dfp = pd.DataFrame(st.session_state.po)
-        if not dfp.empty:
-            st.data_editor(dfp, num_rows="dynamic")
+            if not po_no.strip():
+                st.warning("Enter the PO number.")
+            else:
+                meetings.save_po(mf, po_no.strip(), po_dt, status).result(timeout=30)
+                regrid("po_grid")
+                st.success("PO follow-up saved.")
+        rows = grid_rows("po_grid", lambda: meetings.po_rows(conn, mf))
+        if rows:
+            edit_grid(pd.DataFrame(rows), "po_grid", lambda e: meetings.save_po_edits(rows, e).result(timeout=30),
+                      disabled=["id","mf"], num_rows="delete")
 
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Dispatch
-if section.startswith("🚀"):
-    render_mission()
-else:
-    render_meeting()
+try:
+    with metrics.timed("rerun."+("mission" if section.startswith("🚀") else "meeting")):
+        # the other section's inputs are kept as an undrawn tab's are
+        if section.startswith("🚀"):
+            keep_inputs(["meeting_tab", *(k for keys in MEETING_INPUTS for k in keys)])
+            render_mission()
+        else:
+            keep_inputs(["mission_tab", *(k for keys in MISSION_INPUTS for k in keys)])
+            render_meeting()
+finally:
+    if _prof:
+        st.session_state.prof_out = metrics.stop_profile(_prof)
+        st.session_state.prof_next = False
 
 st.markdown("<div style='text-align:center;color:gray;margin-top:2rem;'>© All rights reserved MTR</div>", unsafe_allow_html=True)
+if st.session_state.get("admin"):
+    admin_panel()